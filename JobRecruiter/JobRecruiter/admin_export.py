@@ -11,6 +11,7 @@ from django.contrib.auth.models import User
 from accounts.models import Profile, JobSeekerProfile, EmployerProfile, SavedSearch
 from jobpostings.models import JobPosting, Application, PipelineStage
 from messaging.models import Message, EmailMessage, Conversation, MessageNotification
+from messaging.unread import annotate_read_state
 
 
 def export_all_data_view(request):
@@ -171,7 +172,7 @@ def export_all_data_view(request):
         messages_csv = io.StringIO()
         writer = csv.writer(messages_csv)
         writer.writerow(['ID', 'Sender', 'Content Preview', 'Is Read', 'Timestamp'])
-        for msg in Message.objects.all().select_related('sender', 'conversation'):
+        for msg in annotate_read_state(Message.objects.all()).select_related('sender', 'conversation'):
             writer.writerow([
                 msg.id,
                 msg.sender.username,
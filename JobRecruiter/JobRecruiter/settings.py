@@ -88,6 +88,56 @@ DATABASES = {
     }
 }
 
+# Full-text search backend for job postings. When unset, SQLite uses FTS5 and
+# PostgreSQL uses a tsvector index (see jobpostings/search.py).
+# JOB_SEARCH_BACKEND = 'jobpostings.search.PostgresSearchBackend'
+# Same for the search over chat messages and emails (see messaging/search.py).
+# MESSAGE_SEARCH_BACKEND = 'messaging.search.PostgresMessageSearchBackend'
+
+# Geocoder used to fill in coordinates for job postings and job seeker
+# profiles (see jobpostings/geocoding.py). The offline gazetteer resolves
+# ZIP codes, cities and states; NominatimGeocoder resolves street addresses
+# but is rate limited. Locations are geocoded in a background thread after a
+# save unless GEOCODE_IN_BACKGROUND is False.
+GEOCODER_BACKEND = 'jobpostings.gazetteer.GazetteerGeocoder'
+# GEOCODER_BACKEND = 'jobpostings.geocoding.NominatimGeocoder'
+GEOCODER_USER_AGENT = 'JobRecruiter/1.0'
+GEOCODE_IN_BACKGROUND = True
+
+# Recruiters get at most one digest of new candidates matching their saved
+# searches per interval. Digests are sent by the send_saved_search_digests
+# management command, which should be run (e.g. from cron) at least this often.
+SAVED_SEARCH_DIGEST_INTERVAL_MINUTES = 60
+
+# New and edited job postings are matched against job seekers' job alerts in
+# a background thread unless JOB_ALERTS_IN_BACKGROUND is False (see
+# jobpostings/job_alerts.py). Seekers get at most one digest of the matches
+# per interval, sent by the send_job_alert_digests management command.
+JOB_ALERTS_IN_BACKGROUND = True
+JOB_ALERT_DIGEST_INTERVAL_MINUTES = 24 * 60
+
+# Open conversations get new messages and read receipts through an event
+# stream (see messaging/events.py). The broker wakes streams up when their
+# conversation changes; the local one only sees changes made in the same
+# process, so streams also check the database every few seconds. Served over
+# WSGI the streams don't stay open and the browser polls at that interval.
+MESSAGING_EVENT_BROKER = 'messaging.events.LocalBroker'
+MESSAGING_EVENT_POLL_SECONDS = 5
+
+# Emails between users are queued and delivered by the send_queued_emails
+# management command (see messaging/outbox.py). Failed deliveries are retried
+# after EMAIL_OUTBOX_RETRY_SECONDS, doubling each time, up to
+# EMAIL_OUTBOX_MAX_ATTEMPTS attempts.
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_SECONDS = 60
+
+# The email composer's recipient typeahead is answered from an index of the
+# users kept in each process's memory (see messaging/typeahead.py), built in
+# a background thread unless USER_TYPEAHEAD_IN_BACKGROUND is False. With
+# USER_TYPEAHEAD_IN_MEMORY = False it queries the user directory instead.
+USER_TYPEAHEAD_IN_MEMORY = True
+USER_TYPEAHEAD_IN_BACKGROUND = True
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -0,0 +1,106 @@
+"""
+Digests of new candidates matching recruiters' saved searches.
+
+Saving a job seeker profile only records a SavedSearchMatch for each saved
+search it matches. The send_saved_search_digests management command then
+sends every recruiter one CareerifyBot message summarizing their unsent
+matches, at most once per SAVED_SEARCH_DIGEST_INTERVAL_MINUTES, creating the
+messages and notifications for all recruiters in bulk (send_bot_messages,
+which job alert digests use too).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from messaging.bulk import send_messages_in_bulk
+from .models import SavedSearch, SavedSearchMatch
+
+BOT_USERNAME = 'CareerifyBot'
+
+# Most candidates listed for one saved search in a digest
+DIGEST_CANDIDATE_LIMIT = 10
+
+
+def get_bot_user():
+    """Get or Create the Bot User that sends the digests."""
+    bot_user, _ = User.objects.get_or_create(username=BOT_USERNAME)
+    if bot_user.password == '':
+        bot_user.set_unusable_password()
+        bot_user.save()
+    return bot_user
+
+
+def send_bot_messages(contents, now=None):
+    """
+    Send CareerifyBot messages to many users at once, from {user id: text}.
+    Messages, conversations and notifications are all written in bulk.
+    """
+    if not contents:
+        return
+    send_messages_in_bulk(get_bot_user(), contents, now)
+
+
+def _describe_candidate(candidate):
+    try:
+        jobseeker_profile = candidate.profile.jobseekerprofile
+    except ObjectDoesNotExist:
+        return candidate.username
+    name = jobseeker_profile.full_name or candidate.username
+    location = jobseeker_profile.get_location_display()
+    return f"{name} ({location})" if location else name
+
+
+def build_digest(matches_by_search):
+    """The text of one recruiter's digest, from {SavedSearch: [SavedSearchMatch]}."""
+    total = sum(len(matches) for matches in matches_by_search.values())
+    lines = [f"{total} New Match{'es' if total != 1 else ''} Found!"]
+    for search, matches in matches_by_search.items():
+        lines.append("")
+        lines.append(f"'{search.name}': {len(matches)} new candidate{'s' if len(matches) != 1 else ''}")
+        for match in matches[:DIGEST_CANDIDATE_LIMIT]:
+            profile_link = settings.BASE_URL + reverse('accounts.public_profile', args=[match.candidate_id])
+            lines.append(f"- {_describe_candidate(match.candidate)}: {profile_link}")
+        if len(matches) > DIGEST_CANDIDATE_LIMIT:
+            lines.append(f"...and {len(matches) - DIGEST_CANDIDATE_LIMIT} more")
+    return "\n".join(lines)
+
+
+def send_saved_search_digests(now=None):
+    """
+    Send each recruiter who is due one a digest of their saved searches' new
+    matches. Returns the number of digests sent.
+    """
+    now = now or timezone.now()
+    interval = timedelta(minutes=getattr(settings, 'SAVED_SEARCH_DIGEST_INTERVAL_MINUTES', 60))
+
+    # Recruiters who got a digest within the interval wait for the next one
+    recently_notified = SavedSearch.objects.filter(last_notified__gt=now - interval).values('recruiter')
+    pending = SavedSearchMatch.objects.filter(notified_at__isnull=True).exclude(search__recruiter__in=recently_notified)
+    matches = list(
+        pending.select_related('search__recruiter__profile', 'candidate__profile__jobseekerprofile')
+        .order_by('search_id', 'matched_at', 'id')
+    )
+
+    digests = {}
+    for match in matches:
+        recruiter_id = match.search.recruiter.profile.user_id
+        digests.setdefault(recruiter_id, {}).setdefault(match.search, []).append(match)
+    if not digests:
+        return 0
+
+    with transaction.atomic():
+        send_bot_messages({
+            recruiter_id: build_digest(matches_by_search) for recruiter_id, matches_by_search in digests.items()
+        }, now)
+
+        # Matches recorded since they were read wait for the next digest
+        pending.filter(id__lte=max(match.id for match in matches)).update(notified_at=now)
+        SavedSearch.objects.filter(
+            id__in=SavedSearchMatch.objects.filter(notified_at=now).values('search_id')
+        ).update(last_notified=now)
+    return len(digests)
@@ -53,8 +53,9 @@ class UserEmailForm(forms.ModelForm):
 class JobSeekerProfileForm(forms.ModelForm):
     class Meta:
         model = JobSeekerProfile
-        # Exclude the profile link, as we'll set it in the view
-        exclude = ('profile',)
+        # Exclude the profile link, as we'll set it in the view, and the
+        # coordinates, which the geocoder fills in from the location fields
+        exclude = ('profile', 'latitude', 'longitude', 'geohash')
         widgets = {
             'full_name': forms.TextInput(attrs={'class': 'form-control'}),
             'preferred_name': forms.TextInput(attrs={'class': 'form-control'}),
@@ -15,6 +15,7 @@ from django.contrib.auth.models import User
 from accounts.models import Profile, JobSeekerProfile, EmployerProfile
 from jobpostings.models import JobPosting, Application
 from messaging.models import Message, EmailMessage, Conversation
+from messaging.unread import annotate_read_state
 
 
 class Command(BaseCommand):
@@ -296,7 +297,7 @@ class Command(BaseCommand):
                 ])
 
             # Export Messages (from conversations)
-            messages = Message.objects.all().select_related('sender', 'conversation')
+            messages = annotate_read_state(Message.objects.all()).select_related('sender', 'conversation')
             for msg in messages:
                 # Get recipient from conversation
                 recipient = msg.conversation.get_other_participant(msg.sender)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from accounts.digests import send_saved_search_digests
+
+
+class Command(BaseCommand):
+    help = "Send recruiters a digest of the new candidates matching their saved searches"
+
+    def handle(self, *args, **options):
+        sent = send_saved_search_digests()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Sent {sent} saved search digest{"s" if sent != 1 else ""}.')
+        )
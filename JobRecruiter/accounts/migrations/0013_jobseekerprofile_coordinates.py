@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_merge_0011_savedsearch_0011_split_location_field'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobseekerprofile',
+            name='latitude',
+            field=models.FloatField(blank=True, help_text='Set by the geocoder from the address, city and state', null=True),
+        ),
+        migrations.AddField(
+            model_name='jobseekerprofile',
+            name='longitude',
+            field=models.FloatField(blank=True, help_text='Set by the geocoder from the address, city and state', null=True),
+        ),
+    ]
@@ -35,6 +35,9 @@ class JobSeekerProfile(models.Model):
     address = models.CharField(max_length=200, blank=True, help_text="Street address")
     city = models.CharField(max_length=100, blank=True)
     state = models.CharField(max_length=50, blank=True)
+    latitude = models.FloatField(null=True, blank=True, help_text="Set by the geocoder from the address, city and state")
+    longitude = models.FloatField(null=True, blank=True, help_text="Set by the geocoder from the address, city and state")
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, help_text="Geohash of the coordinates, used to bucket applicants on the map")
     phone = models.CharField(max_length=20, blank=True)
     linkedin = models.URLField(blank=True)
     profile_picture = models.ImageField(upload_to='profile_pics/jobseekers/', blank=True, null=True)
@@ -146,4 +149,22 @@ class SavedSearch(models.Model):
     def __str__(self):
         return f"{self.name} for {self.recruiter.company_name}"
 
-    
\ No newline at end of file
+
+class SavedSearchMatch(models.Model):
+    """
+    A candidate who matched a saved search. Each candidate matches a search
+    at most once; matches are sent to the recruiter in a periodic digest.
+    """
+    search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name='matches')
+    candidate = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saved_search_matches')
+    matched_at = models.DateTimeField(auto_now_add=True)
+    notified_at = models.DateTimeField(null=True, blank=True, help_text="When the match was sent in a digest")
+
+    class Meta:
+        unique_together = ['search', 'candidate']
+        indexes = [
+            models.Index(fields=['notified_at', 'search'], name='searchmatch_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.candidate_id} matches saved search {self.search_id}"
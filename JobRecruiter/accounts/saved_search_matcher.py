@@ -0,0 +1,199 @@
+"""
+Matches job seeker profiles against every employer's saved searches at once.
+
+A saved search matches a candidate when its keywords appear in the
+candidate's skills and summary and its location appears in the candidate's
+address, city and state (both case-insensitive substring checks, and an
+empty keywords or location matches anyone). Rather than checking each saved
+search in turn, the keywords and the locations of all saved searches are
+compiled into two Aho-Corasick automata, so one pass over a profile's text
+finds every saved search it matches: O(profile text + matches) however many
+saved searches there are.
+
+The matcher is built from the database once per process and then kept up to
+date as saved searches are created, edited and deleted. A version number
+kept in the database (an IndexVersion row) tells other processes that their
+copy is out of date, in which case they rebuild it on their next match.
+"""
+import threading
+from collections import deque
+
+from jobpostings.models import IndexVersion
+from .models import SavedSearch
+
+VERSION_NAME = 'saved_search_matcher'
+
+
+class PatternAutomaton:
+    """
+    An Aho-Corasick automaton over a changing set of patterns, each tagged
+    with the ids of the saved searches that use it. Patterns can be added and
+    removed at any time; the failure links are rebuilt before the next search
+    if the set of patterns changed.
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        # Nearest node down the failure chain that ends a pattern
+        self._output = [0]
+        self._pattern = [None]
+        self._ids = {}
+        self._dirty = False
+
+    def add(self, pattern, search_id):
+        ids = self._ids.get(pattern)
+        if ids is None:
+            ids = self._ids[pattern] = set()
+            node = 0
+            for char in pattern:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(0)
+                    self._pattern.append(None)
+                node = next_node
+            self._pattern[node] = pattern
+            self._dirty = True
+        ids.add(search_id)
+
+    def remove(self, pattern, search_id):
+        ids = self._ids.get(pattern)
+        if ids is None:
+            return
+        ids.discard(search_id)
+        if not ids:
+            # The trie nodes stay behind, they just no longer end a pattern
+            del self._ids[pattern]
+            self._dirty = True
+
+    def _build(self):
+        queue = deque()
+        for node in self._goto[0].values():
+            self._fail[node] = 0
+            self._output[node] = 0
+            queue.append(node)
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[child] = fail
+                self._output[child] = fail if self._pattern[fail] in self._ids else self._output[fail]
+                queue.append(child)
+        self._dirty = False
+
+    def search(self, text):
+        """Return the ids of the saved searches whose pattern occurs in text."""
+        if self._dirty:
+            self._build()
+        found = set()
+        matched = set()
+        node = 0
+        for char in text:
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            output = node if self._pattern[node] in self._ids else self._output[node]
+            while output and output not in matched:
+                matched.add(output)
+                found |= self._ids[self._pattern[output]]
+                output = self._output[output]
+        return found
+
+
+class SavedSearchMatcher:
+    """The compiled form of every saved search."""
+
+    def __init__(self, version=None):
+        self.version = version
+        self.keywords = PatternAutomaton()
+        self.locations = PatternAutomaton()
+        # Saved searches with no keywords or no location match anyone on that count
+        self.any_keywords = set()
+        self.any_location = set()
+        self.searches = {}
+
+    def add(self, search):
+        self.remove(search.id)
+        keywords = (search.keywords or '').lower()
+        location = (search.location or '').lower()
+        self.searches[search.id] = (keywords, location)
+        if keywords:
+            self.keywords.add(keywords, search.id)
+        else:
+            self.any_keywords.add(search.id)
+        if location:
+            self.locations.add(location, search.id)
+        else:
+            self.any_location.add(search.id)
+
+    def remove(self, search_id):
+        keywords, location = self.searches.pop(search_id, ('', ''))
+        self.keywords.remove(keywords, search_id)
+        self.locations.remove(location, search_id)
+        self.any_keywords.discard(search_id)
+        self.any_location.discard(search_id)
+
+    def match(self, candidate):
+        """Return the ids of the saved searches a JobSeekerProfile matches."""
+        candidate_text = f"{candidate.technical_skills} {candidate.soft_skills} {candidate.summary}".lower()
+        candidate_location = f"{candidate.address or ''} {candidate.city or ''} {candidate.state or ''}".lower()
+        keyword_matches = self.keywords.search(candidate_text) | self.any_keywords
+        if not keyword_matches:
+            return set()
+        location_matches = self.locations.search(candidate_location) | self.any_location
+        return keyword_matches & location_matches
+
+
+_matcher = None
+_lock = threading.Lock()
+
+
+def _build_matcher(version):
+    matcher = SavedSearchMatcher(version)
+    for search in SavedSearch.objects.only('id', 'keywords', 'location').iterator():
+        matcher.add(search)
+    return matcher
+
+
+def match_saved_searches(candidate):
+    """Return the ids of the saved searches a JobSeekerProfile matches."""
+    global _matcher
+    version = IndexVersion.get(VERSION_NAME)
+    with _lock:
+        if _matcher is None or _matcher.version != version:
+            _matcher = _build_matcher(version)
+        return _matcher.match(candidate)
+
+
+def _apply_change(change):
+    global _matcher
+    version = IndexVersion.bump(VERSION_NAME)
+    with _lock:
+        if _matcher is None:
+            return
+        if _matcher.version != version - 1:
+            # Missed another change, so rebuild on the next match
+            _matcher = None
+            return
+        change(_matcher)
+        _matcher.version = version
+
+
+def saved_search_changed(search):
+    """
+    Apply a created or edited saved search to this process's matcher and
+    tell other processes to rebuild theirs.
+    """
+    _apply_change(lambda matcher: matcher.add(search))
+
+
+def saved_search_deleted(search_id):
+    """Drop a deleted saved search, like saved_search_changed."""
+    _apply_change(lambda matcher: matcher.remove(search_id))
@@ -1,3 +1,137 @@
-from django.test import TestCase
+import random
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+
+from jobpostings.models import IndexVersion
+from . import saved_search_matcher
+from .models import EmployerProfile, JobSeekerProfile, Profile, SavedSearch, SavedSearchMatch
+from .saved_search_matcher import PatternAutomaton, SavedSearchMatcher
+
+
+def make_candidate(**fields):
+    fields = {
+        'technical_skills': '', 'soft_skills': '', 'summary': '',
+        'address': '', 'city': '', 'state': '', **fields,
+    }
+    return SimpleNamespace(**fields)
+
+
+class PatternAutomatonTests(SimpleTestCase):
+    def test_overlapping_patterns(self):
+        automaton = PatternAutomaton()
+        for search_id, pattern in enumerate(['he', 'she', 'his', 'hers']):
+            automaton.add(pattern, search_id)
+        self.assertEqual(automaton.search('ushers'), {0, 1, 3})
+        self.assertEqual(automaton.search('this'), {2})
+        self.assertEqual(automaton.search('xyz'), set())
+
+    def test_shared_pattern(self):
+        automaton = PatternAutomaton()
+        automaton.add('python', 1)
+        automaton.add('python', 2)
+        self.assertEqual(automaton.search('python developer'), {1, 2})
+        automaton.remove('python', 1)
+        self.assertEqual(automaton.search('python developer'), {2})
+
+    def test_changes_after_search(self):
+        automaton = PatternAutomaton()
+        automaton.add('data', 1)
+        self.assertEqual(automaton.search('big data'), {1})
+        automaton.add('big data', 2)
+        automaton.add('ta', 3)
+        self.assertEqual(automaton.search('big data'), {1, 2, 3})
+        automaton.remove('data', 1)
+        # The removed pattern's nodes stay in the trie but no longer match
+        self.assertEqual(automaton.search('big data'), {2, 3})
+        automaton.remove('data', 1)
+        automaton.remove('unknown', 1)
+        self.assertEqual(automaton.search('data'), {3})
+
+    def test_matches_substring_search(self):
+        rng = random.Random(0)
+        patterns = {''.join(rng.choices('abc', k=rng.randint(1, 4))) for _ in range(30)}
+        automaton = PatternAutomaton()
+        for pattern in patterns:
+            automaton.add(pattern, pattern)
+        for _ in range(200):
+            text = ''.join(rng.choices('abcd', k=rng.randint(0, 12)))
+            self.assertEqual(automaton.search(text), {pattern for pattern in patterns if pattern in text})
+
+
+class SavedSearchMatcherTests(SimpleTestCase):
+    def setUp(self):
+        self.matcher = SavedSearchMatcher()
+        for search_id, keywords, location in [
+            (1, 'Python', 'Atlanta'),
+            (2, 'python', ''),
+            (3, '', 'GA'),
+            (4, 'Django', 'Boston'),
+        ]:
+            self.matcher.add(SimpleNamespace(id=search_id, keywords=keywords, location=location))
+
+    def test_match(self):
+        candidate = make_candidate(technical_skills='Python, Django', city='Atlanta', state='GA')
+        self.assertEqual(self.matcher.match(candidate), {1, 2, 3})
+
+    def test_empty_fields_match_anyone(self):
+        self.assertEqual(self.matcher.match(make_candidate()), set())
+        self.assertEqual(self.matcher.match(make_candidate(summary='Writes python')), {2})
+        self.assertEqual(self.matcher.match(make_candidate(state='ga')), {3})
+
+    def test_edit_and_remove(self):
+        self.matcher.add(SimpleNamespace(id=1, keywords='Go', location='Atlanta'))
+        candidate = make_candidate(technical_skills='python', city='atlanta')
+        self.assertEqual(self.matcher.match(candidate), {2})
+        self.matcher.remove(2)
+        self.assertEqual(self.matcher.match(candidate), set())
+
+
+class SavedSearchMatchTests(TestCase):
+    def setUp(self):
+        # Another test may have left a matcher built from rolled back rows
+        saved_search_matcher._matcher = None
+        recruiter = User.objects.create_user('recruiter')
+        profile = Profile.objects.create(user=recruiter, account_type='employer')
+        self.employer = EmployerProfile.objects.create(profile=profile, company_name='Acme')
+
+    def make_search(self, keywords, location=''):
+        with self.captureOnCommitCallbacks(execute=True):
+            return SavedSearch.objects.create(recruiter=self.employer, keywords=keywords, location=location)
+
+    def make_seeker(self, username, **fields):
+        user = User.objects.create_user(username)
+        profile = Profile.objects.create(user=user, account_type='jobseeker')
+        return JobSeekerProfile.objects.create(profile=profile, full_name=username.title(), **fields)
+
+    def matched_searches(self, seeker):
+        return set(SavedSearchMatch.objects.filter(candidate=seeker.profile.user).values_list('search_id', flat=True))
+
+    def test_profile_save_records_matches(self):
+        python = self.make_search('python', 'atlanta')
+        self.make_search('rust')
+        seeker = self.make_seeker('seeker', technical_skills='Python', city='Atlanta')
+        self.assertEqual(self.matched_searches(seeker), {python.id})
+        # Saving again doesn't record the match twice
+        seeker.save()
+        self.assertEqual(SavedSearchMatch.objects.count(), 1)
+
+    def test_edited_and_deleted_searches(self):
+        search = self.make_search('python')
+        search.keywords = 'rust'
+        with self.captureOnCommitCallbacks(execute=True):
+            search.save()
+        self.assertEqual(self.matched_searches(self.make_seeker('pythonista', technical_skills='python')), set())
+        self.assertEqual(self.matched_searches(self.make_seeker('rustacean', technical_skills='rust')), {search.id})
+        with self.captureOnCommitCallbacks(execute=True):
+            search.delete()
+        self.assertEqual(self.matched_searches(self.make_seeker('rustacean2', technical_skills='rust')), set())
+
+    def test_change_in_another_process(self):
+        self.make_search('python')
+        self.make_seeker('first', technical_skills='python')
+        # Another process adds a search; this one only sees the version move
+        search = SavedSearch.objects.bulk_create([SavedSearch(recruiter=self.employer, keywords='rust')])[0]
+        IndexVersion.bump(saved_search_matcher.VERSION_NAME)
+        self.assertEqual(self.matched_searches(self.make_seeker('rustacean', technical_skills='rust')), {search.id})
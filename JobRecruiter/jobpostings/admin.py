@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import JobPosting, Application, PipelineStage
+from .models import JobPosting, Application, PipelineStage, Skill, GeocodeCache, JobAlert
 
 
 @admin.register(JobPosting)
@@ -23,4 +23,25 @@ class ApplicationAdmin(admin.ModelAdmin):
 	list_filter = ("status", "pipeline_stage", "applied_at", "stage_updated_at")
 	search_fields = ("applicant__username", "applicant__email", "job_posting__title", "job_posting__company_name")
 	readonly_fields = ("applied_at", "updated_at", "stage_updated_at")
-	ordering = ("-applied_at",)
\ No newline at end of file
+	ordering = ("-applied_at",)
+
+
+@admin.register(Skill)
+class SkillAdmin(admin.ModelAdmin):
+	list_display = ("name",)
+	search_fields = ("name",)
+
+
+@admin.register(GeocodeCache)
+class GeocodeCacheAdmin(admin.ModelAdmin):
+	list_display = ("query", "latitude", "longitude", "provider", "updated_at")
+	list_filter = ("provider",)
+	search_fields = ("query",)
+
+
+@admin.register(JobAlert)
+class JobAlertAdmin(admin.ModelAdmin):
+	list_display = ("name", "seeker", "keywords", "location", "employment_type", "pay_min", "delivery", "last_notified")
+	list_filter = ("delivery", "employment_type")
+	search_fields = ("name", "keywords", "location", "seeker__username")
+	readonly_fields = ("term_count", "last_notified")
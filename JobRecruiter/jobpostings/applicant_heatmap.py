@@ -0,0 +1,148 @@
+"""
+Aggregated applicant locations for the applicant map.
+
+Rather than one marker per application, the map asks for the number of
+applicants in each bucket, where a bucket is a geohash grid cell (sized by
+the zoom level, like the job map's clusters), a city or a state. Counting is
+done by the database, so the payload only grows with the number of buckets.
+The applicants in a bucket are only loaded when the employer opens it.
+
+Only applicants who share their location with recruiters and whose location
+has been geocoded are included.
+"""
+from django.db.models import Avg, Count, Min
+from django.db.models.functions import Lower, Substr
+from django.urls import reverse
+
+from .map_clusters import get_cluster_precision
+from .models import Application
+from .spatial import geohash_cells, geohash_prefilter
+
+BUCKET_MODES = (
+    ('grid', 'Map grid'),
+    ('city', 'City'),
+    ('state', 'State'),
+)
+# Densest buckets returned for one request
+MAX_BUCKETS = 500
+
+# Lookup path from an application to its applicant's job seeker profile
+SEEKER = 'applicant__profile__jobseekerprofile__'
+
+
+def get_mapped_applications(employer, job_id='', stage_id=''):
+    """
+    Return the applications to an employer's active jobs whose applicant can
+    be placed on the map, optionally for one job and one pipeline stage
+    ('none' for applications without a stage).
+    """
+    applications = Application.objects.filter(
+        job_posting__posted_by=employer,
+        job_posting__is_active=True,
+        applicant__profile__account_type='jobseeker',
+        **{
+            f'{SEEKER}show_location_to_recruiters': True,
+            f'{SEEKER}latitude__isnull': False,
+            f'{SEEKER}longitude__isnull': False,
+        },
+    )
+    if job_id.isdigit():
+        applications = applications.filter(job_posting_id=int(job_id))
+    if stage_id == 'none':
+        applications = applications.filter(pipeline_stage__isnull=True)
+    elif stage_id.isdigit():
+        applications = applications.filter(pipeline_stage_id=int(stage_id))
+    return applications
+
+
+def _bucket_feature(group, label, bucket_filter):
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [group['center_longitude'], group['center_latitude']]},
+        'properties': {
+            'count': group['count'],
+            'label': label,
+            'filter': bucket_filter,
+        },
+    }
+
+
+def get_applicant_buckets(applications, mode, bbox=None, zoom=None):
+    """
+    Return a GeoJSON FeatureCollection with the number of distinct applicants
+    in each bucket. Grid buckets need the map's (south, west, north, east)
+    bounding box and zoom level, and only cover that box.
+    """
+    if mode == 'grid':
+        precision = get_cluster_precision(zoom)
+        cells = geohash_cells(*bbox, max_precision=precision)
+        applications = applications.filter(geohash_prefilter(cells, field=f'{SEEKER}geohash'))
+        keys = {'cell': Substr(f'{SEEKER}geohash', 1, precision)}
+    elif mode == 'city':
+        keys = {'city_key': Lower(f'{SEEKER}city'), 'state_key': Lower(f'{SEEKER}state')}
+    else:
+        keys = {'state_key': Lower(f'{SEEKER}state')}
+
+    groups = (
+        applications.order_by()
+        .annotate(**keys)
+        .values(*keys)
+        .annotate(
+            count=Count('applicant', distinct=True),
+            center_latitude=Avg(f'{SEEKER}latitude'),
+            center_longitude=Avg(f'{SEEKER}longitude'),
+            city_name=Min(f'{SEEKER}city'),
+            state_name=Min(f'{SEEKER}state'),
+        )
+        .order_by('-count')[:MAX_BUCKETS]
+    )
+
+    features = []
+    for group in groups:
+        if mode == 'grid':
+            bucket_filter = {'cell': group['cell']}
+            label = f"{group['count']} applicant{'s' if group['count'] != 1 else ''} in this area"
+        elif mode == 'city':
+            bucket_filter = {'city': group['city_key'], 'state': group['state_key']}
+            label = ', '.join(part for part in (group['city_name'], group['state_name']) if part) or 'Unknown city'
+        else:
+            bucket_filter = {'state': group['state_key']}
+            label = group['state_name'] or 'Unknown state'
+        features.append(_bucket_feature(group, label, bucket_filter))
+    return {
+        'type': 'FeatureCollection',
+        'features': features,
+        'max_count': max((feature['properties']['count'] for feature in features), default=0),
+    }
+
+
+def filter_bucket(applications, cell='', city=None, state=None):
+    """Narrow applications down to one bucket from get_applicant_buckets."""
+    if cell:
+        applications = applications.filter(geohash_prefilter([cell], field=f'{SEEKER}geohash'))
+    if city is not None:
+        applications = applications.filter(**{f'{SEEKER}city__iexact': city})
+    if state is not None:
+        applications = applications.filter(**{f'{SEEKER}state__iexact': state})
+    return applications
+
+
+def applicant_detail(application):
+    """The details shown for one application on the applicant map."""
+    jobseeker_profile = application.applicant.profile.jobseekerprofile
+    return {
+        'id': application.applicant.id,
+        'application_id': application.id,
+        'name': application.get_applicant_name(),
+        'email': application.get_applicant_email(),
+        'location': jobseeker_profile.get_location_display(),
+        'latitude': jobseeker_profile.latitude,
+        'longitude': jobseeker_profile.longitude,
+        'job_title': application.job_posting.title,
+        'company': application.job_posting.company_name,
+        'applied_at': application.applied_at.strftime('%Y-%m-%d'),
+        'pipeline_stage': application.pipeline_stage.name if application.pipeline_stage else 'Unassigned',
+        'pipeline_stage_color': application.pipeline_stage.color if application.pipeline_stage else '#6B7280',
+        'profile_url': reverse('accounts.public_profile', args=[application.applicant.id]),
+        'application_url': reverse('jobpostings:view_applicants', args=[application.job_posting.id]),
+    }
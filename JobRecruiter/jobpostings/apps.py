@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class JobpostingsConfig(AppConfig):
 	default_auto_field = 'django.db.models.BigAutoField'
 	name = 'jobpostings'
+
+	def ready(self):
+		# This import registers the signals
+		import jobpostings.signals
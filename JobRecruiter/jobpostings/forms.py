@@ -1,5 +1,6 @@
 from django import forms
-from .models import JobPosting, Application
+from .models import JobPosting, Application, JobAlert, PipelineStage
+from .broadcasts import EMAIL, MESSAGE, PLACEHOLDERS, find_unknown_placeholders
 
 
 class JobPostingForm(forms.ModelForm):
@@ -52,4 +53,66 @@ class ApplicationForm(forms.ModelForm):
         }
         help_texts = {
             'cover_letter': 'Write a personalized cover letter for this specific job application.'
-        } 
\ No newline at end of file
+        } 
+
+
+class JobAlertForm(forms.ModelForm):
+    class Meta:
+        model = JobAlert
+        fields = ['name', 'keywords', 'location', 'employment_type', 'pay_min', 'delivery']
+        widgets = {
+            'keywords': forms.TextInput(attrs={'placeholder': 'e.g., Python Django'}),
+            'location': forms.TextInput(attrs={'placeholder': 'City, State or just a state'}),
+        }
+        labels = {
+            'pay_min': 'Minimum Pay',
+            'delivery': 'Send Matches By',
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['employment_type'].choices = [('', 'Any Type')] + list(JobPosting.EMPLOYMENT_TYPE_CHOICES)
+        for field in self.fields.values():
+            field.widget.attrs.setdefault('class', 'form-select' if isinstance(field.widget, forms.Select) else 'form-control')
+
+
+class BroadcastForm(forms.Form):
+    stage = forms.ModelChoiceField(
+        queryset=PipelineStage.objects.order_by('order'),
+        empty_label=None,
+        label='Send To Applicants In',
+    )
+    channel = forms.ChoiceField(
+        choices=[(MESSAGE, 'Message'), (EMAIL, 'Email')],
+        widget=forms.RadioSelect,
+        initial=MESSAGE,
+        label='Send As',
+    )
+    subject = forms.CharField(
+        max_length=200,
+        required=False,
+        help_text='Only used for emails.',
+    )
+    body = forms.CharField(
+        widget=forms.Textarea(attrs={'rows': 8, 'placeholder': 'Hi {first_name}, thank you for applying to {job_title}...'}),
+        label='Message',
+        help_text='Placeholders: ' + ', '.join('{%s}' % name for name in PLACEHOLDERS),
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name, field in self.fields.items():
+            if name != 'channel':
+                field.widget.attrs.setdefault('class', 'form-select' if isinstance(field.widget, forms.Select) else 'form-control')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get("channel") == EMAIL and not cleaned_data.get("subject"):
+            self.add_error("subject", "Emails need a subject.")
+        for name in ("subject", "body"):
+            unknown = find_unknown_placeholders(cleaned_data.get(name) or "")
+            if unknown:
+                self.add_error(name, "Unknown placeholder%s: %s" % (
+                    "s" if len(unknown) > 1 else "", ", ".join("{%s}" % placeholder for placeholder in unknown)
+                ))
+        return cleaned_data
@@ -0,0 +1,227 @@
+"""
+Offline US gazetteer geocoder.
+
+Resolves ZIP codes, "city, state" pairs and states to centroids from a
+bundled data file, with no network access. Street addresses resolve to the
+centroid of their city.
+
+The file (data/us_gazetteer.bin, built by the build_gazetteer management
+command) holds two tables of fixed-width records sorted by key: one for ZIP
+codes and one for places, where a place key is either "city,st" or a bare
+state code "st". The file is memory-mapped and searched with bisect, so a
+lookup reads a handful of pages and nothing is parsed up front. The bundled
+file was built from the ZIP code data in the MIT licensed zipcodes package
+(October 2021 release); city and state centroids are the median of their
+ZIP code centroids, counting a city's ZIP codes only where it is the primary
+city.
+
+File layout (little-endian):
+    header: b'USGZ', version (H), then key size (H) and record count (I)
+            for the ZIP table followed by the place table
+    record: key (NUL padded), latitude (f), longitude (f), zip count (H)
+"""
+import bisect
+import mmap
+import os
+import re
+import struct
+import unicodedata
+
+from django.conf import settings
+
+from .geocoding import BaseGeocoder, US_STATE_NAMES
+
+MAGIC = b'USGZ'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIHI')
+VALUE = struct.Struct('<ffH')
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), 'data', 'us_gazetteer.bin')
+
+COUNTRY_NAMES = {'us', 'usa', 'united states', 'united states of america'}
+STATE_CODES = {name.lower(): code.lower() for code, name in US_STATE_NAMES.items()}
+# Spellings that USPS city names use inconsistently
+WORD_ALIASES = {'st': 'saint', 'ste': 'sainte', 'ft': 'fort', 'mt': 'mount'}
+
+ZIP_RE = re.compile(r'(?:(.*?)\s+)?(\d{5})(?:\s*-\s*\d{4})?')
+
+
+def normalize_place(text):
+    """ASCII-fold, lowercase and tidy a place name for use as a key."""
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode()
+    words = re.sub(r'[^a-z0-9]+', ' ', text.lower()).split()
+    return ' '.join(WORD_ALIASES.get(word, word) for word in words)
+
+
+def get_state_code(text):
+    """Return the two-letter code for a state name or code, or ''."""
+    text = normalize_place(text)
+    if len(text) == 2:
+        return text
+    return STATE_CODES.get(text, '')
+
+
+class _KeyView:
+    """A sequence of the keys in a table, so bisect can search it in place."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return self.table.count
+
+    def __getitem__(self, index):
+        return self.table.key_at(index)
+
+
+class _Table:
+    def __init__(self, buffer, offset, key_size, count):
+        self.buffer = buffer
+        self.offset = offset
+        self.key_size = key_size
+        self.count = count
+        self.record_size = key_size + VALUE.size
+        self.keys = _KeyView(self)
+
+    @property
+    def end(self):
+        return self.offset + self.record_size * self.count
+
+    def _encode(self, key):
+        return key.encode('ascii')[:self.key_size]
+
+    def key_at(self, index):
+        start = self.offset + index * self.record_size
+        return self.buffer[start:start + self.key_size].rstrip(b'\0')
+
+    def value_at(self, index):
+        return VALUE.unpack_from(self.buffer, self.offset + index * self.record_size + self.key_size)
+
+    def find(self, key):
+        """Return (latitude, longitude, zip count) for an exact key, or None."""
+        key = self._encode(key)
+        index = bisect.bisect_left(self.keys, key)
+        if index < self.count and self.key_at(index) == key:
+            return self.value_at(index)
+        return None
+
+    def find_prefix(self, prefix):
+        """Yield the values of every key starting with prefix."""
+        prefix = self._encode(prefix)
+        index = bisect.bisect_left(self.keys, prefix)
+        while index < self.count and self.key_at(index).startswith(prefix):
+            yield self.value_at(index)
+            index += 1
+
+
+def _coordinates(value):
+    # Stored as float32, so anything past five decimal places is noise
+    return round(value[0], 5), round(value[1], 5)
+
+
+class Gazetteer:
+    """A memory-mapped gazetteer file."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, zip_key_size, zip_count, place_key_size, place_count = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path} is not a version {VERSION} gazetteer file')
+        self.zips = _Table(self.buffer, HEADER.size, zip_key_size, zip_count)
+        self.places = _Table(self.buffer, self.zips.end, place_key_size, place_count)
+
+    def find_zip(self, zip_code):
+        return self.zips.find(zip_code)
+
+    def find_city(self, city, state=''):
+        city = normalize_place(city)
+        if state:
+            return self.places.find(f'{city},{state}')
+        # Without a state, go with the best known city of that name
+        return max(self.places.find_prefix(f'{city},'), key=lambda value: value[2], default=None)
+
+    def find_state(self, state):
+        return self.places.find(state)
+
+    def lookup(self, query):
+        """
+        Return (latitude, longitude) for a comma separated query such as
+        "1 Main St, Atlanta, GA 30303, USA", "Atlanta, Georgia" or "30303".
+        """
+        parts = [part.strip() for part in (query or '').lower().split(',')]
+        parts = [part for part in parts if part]
+        while parts and normalize_place(parts[-1]) in COUNTRY_NAMES:
+            parts.pop()
+        if not parts:
+            return None
+
+        # A ZIP code after the state, or on its own
+        zip_match = ZIP_RE.fullmatch(parts[-1])
+        if zip_match:
+            value = self.find_zip(zip_match.group(2))
+            if value:
+                return _coordinates(value)
+            parts[-1] = zip_match.group(1) or ''
+            parts = [part for part in parts if part]
+            if not parts:
+                return None
+
+        state = get_state_code(parts[-1])
+        if state:
+            parts.pop()
+        elif ' ' in parts[-1]:
+            # "Atlanta GA" without a comma
+            city, _, last_word = parts[-1].rpartition(' ')
+            state = get_state_code(last_word)
+            if state:
+                parts[-1] = city
+
+        if not parts:
+            value = self.find_state(state) if state else None
+        else:
+            # Anything before the city is a street address, which falls back
+            # to the city centroid
+            value = self.find_city(parts[-1], state)
+        return _coordinates(value) if value else None
+
+
+_gazetteers = {}
+
+
+def get_gazetteer(path=None):
+    """Return the gazetteer for a file, opening and mapping it on first use."""
+    path = path or getattr(settings, 'GEOCODER_GAZETTEER_PATH', DEFAULT_PATH)
+    if path not in _gazetteers:
+        _gazetteers[path] = Gazetteer(path)
+    return _gazetteers[path]
+
+
+class GazetteerGeocoder(BaseGeocoder):
+    """
+    Geocodes from the bundled US gazetteer. Lookups are local and cheaper
+    than a cache query, so answers aren't stored in GeocodeCache.
+    """
+    name = 'gazetteer'
+    use_cache = False
+
+    def geocode(self, query):
+        return get_gazetteer().lookup(query)
+
+
+def write_gazetteer(path, zips, places):
+    """
+    Write a gazetteer file. zips and places map keys to
+    (latitude, longitude, zip count); place keys are "city,st" or "st".
+    """
+    tables = []
+    for entries in (zips, places):
+        records = sorted((key.encode('ascii'), value) for key, value in entries.items())
+        key_size = max((len(key) for key, _ in records), default=1)
+        tables.append((key_size, records))
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, tables[0][0], len(tables[0][1]), tables[1][0], len(tables[1][1])))
+        for key_size, records in tables:
+            for key, (latitude, longitude, zip_count) in records:
+                f.write(key.ljust(key_size, b'\0'))
+                f.write(VALUE.pack(latitude, longitude, min(zip_count, 0xFFFF)))
@@ -0,0 +1,270 @@
+"""
+Server-side geocoding for job postings and job seeker profiles.
+
+Coordinates are stored on JobPosting and JobSeekerProfile so the maps can
+plot them straight away. When a row is saved with a new location it's
+geocoded in a background thread once the transaction commits. Every lookup
+goes through GeocodeCache, keyed by the normalized query, so an address is
+only ever sent to the geocoder once; addresses that can't be found are
+cached too.
+
+The geocoder backend is picked with the GEOCODER_BACKEND setting. The
+default is the offline US gazetteer in gazetteer.py; NominatimGeocoder
+resolves full street addresses but is rate limited.
+"""
+import json
+import logging
+import re
+import threading
+import time
+from urllib.error import URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.dispatch import Signal
+from django.utils.module_loading import import_string
+
+from .models import GeocodeCache
+from .spatial import encode_geohash
+
+logger = logging.getLogger(__name__)
+
+LOCATION_FIELDS = ('address', 'city', 'state')
+
+# Sent with sender=model and pk after the geocoder stores a row's coordinates
+coordinates_updated = Signal()
+
+US_STATE_NAMES = {
+    "AL": "Alabama",
+    "AK": "Alaska",
+    "AZ": "Arizona",
+    "AR": "Arkansas",
+    "CA": "California",
+    "CO": "Colorado",
+    "CT": "Connecticut",
+    "DE": "Delaware",
+    "DC": "District of Columbia",
+    "FL": "Florida",
+    "GA": "Georgia",
+    "HI": "Hawaii",
+    "ID": "Idaho",
+    "IL": "Illinois",
+    "IN": "Indiana",
+    "IA": "Iowa",
+    "KS": "Kansas",
+    "KY": "Kentucky",
+    "LA": "Louisiana",
+    "ME": "Maine",
+    "MD": "Maryland",
+    "MA": "Massachusetts",
+    "MI": "Michigan",
+    "MN": "Minnesota",
+    "MS": "Mississippi",
+    "MO": "Missouri",
+    "MT": "Montana",
+    "NE": "Nebraska",
+    "NV": "Nevada",
+    "NH": "New Hampshire",
+    "NJ": "New Jersey",
+    "NM": "New Mexico",
+    "NY": "New York",
+    "NC": "North Carolina",
+    "ND": "North Dakota",
+    "OH": "Ohio",
+    "OK": "Oklahoma",
+    "OR": "Oregon",
+    "PA": "Pennsylvania",
+    "RI": "Rhode Island",
+    "SC": "South Carolina",
+    "SD": "South Dakota",
+    "TN": "Tennessee",
+    "TX": "Texas",
+    "UT": "Utah",
+    "VT": "Vermont",
+    "VA": "Virginia",
+    "WA": "Washington",
+    "WV": "West Virginia",
+    "WI": "Wisconsin",
+    "WY": "Wyoming",
+}
+
+
+def get_state_full_name(state_value: str) -> str:
+    if not state_value:
+        return ''
+    state_value = state_value.strip()
+    if len(state_value) == 2:
+        return US_STATE_NAMES.get(state_value.upper(), state_value)
+    return state_value
+
+
+class GeocodingError(Exception):
+    """The geocoder couldn't be reached; the query should be retried later."""
+
+
+def normalize_address(query):
+    """Lowercase a query and tidy its punctuation and spacing for use as a cache key."""
+    query = re.sub(r'[^\w\s,#-]', ' ', (query or '').lower())
+    parts = (' '.join(part.split()) for part in query.split(','))
+    return ', '.join(part for part in parts if part)[:255]
+
+
+def build_geocode_queries(address='', city='', state=''):
+    """
+    Return the queries to try for a location, most specific first, falling
+    back from the street address to the city and state.
+    """
+    address, city, state = (value.strip() if value else '' for value in (address, city, state))
+    state = get_state_full_name(state)
+    region = [part for part in (city, state) if part]
+    queries = []
+    if address:
+        queries.append(', '.join([address] + region))
+    if region:
+        queries.append(', '.join(region))
+    return [f"{query}, USA" for query in queries]
+
+
+class BaseGeocoder:
+    name = ''
+    # Whether answers should be stored in GeocodeCache. Local backends that
+    # answer faster than a database query can skip it.
+    use_cache = True
+
+    def geocode(self, query):
+        """
+        Return (latitude, longitude) for a query, or None when the place can't
+        be found. Raise GeocodingError when the service can't be reached.
+        """
+        raise NotImplementedError
+
+
+class NominatimGeocoder(BaseGeocoder):
+    """
+    OpenStreetMap's Nominatim search API. Requests are spaced out to respect
+    its limit of one request per second.
+    """
+    name = 'nominatim'
+    url = 'https://nominatim.openstreetmap.org/search'
+    min_interval = 1.0
+    timeout = 10
+
+    _lock = threading.Lock()
+    _last_request = 0.0
+
+    def geocode(self, query):
+        request = Request(
+            f"{self.url}?{urlencode({'format': 'json', 'limit': 1, 'countrycodes': 'us', 'q': query})}",
+            headers={'User-Agent': getattr(settings, 'GEOCODER_USER_AGENT', 'JobRecruiter')},
+        )
+        with NominatimGeocoder._lock:
+            wait = NominatimGeocoder._last_request + self.min_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                with urlopen(request, timeout=self.timeout) as response:
+                    results = json.load(response)
+            except (URLError, OSError, ValueError) as e:
+                raise GeocodingError(str(e)) from e
+            finally:
+                NominatimGeocoder._last_request = time.monotonic()
+        if not results:
+            return None
+        return float(results[0]['lat']), float(results[0]['lon'])
+
+
+def get_geocoder():
+    """Return the configured geocoder backend."""
+    backend_path = getattr(settings, 'GEOCODER_BACKEND', 'jobpostings.gazetteer.GazetteerGeocoder')
+    return import_string(backend_path)()
+
+
+def geocode(queries, geocoder=None):
+    """
+    Return (latitude, longitude) for the first of the queries that resolves,
+    or None. Cached answers are used when available; only the misses are
+    sent to the geocoder.
+    """
+    geocoder = geocoder or get_geocoder()
+    keys = [key for key in dict.fromkeys(normalize_address(query) for query in queries) if key]
+    if not geocoder.use_cache:
+        for key in keys:
+            coordinates = geocoder.geocode(key)
+            if coordinates:
+                return coordinates
+        return None
+    cached = GeocodeCache.objects.in_bulk(keys, field_name='query')
+    for key in keys:
+        entry = cached.get(key)
+        # A miss from a different geocoder is worth asking the current one about
+        if entry is None or (not entry.is_found() and entry.provider != geocoder.name):
+            try:
+                coordinates = geocoder.geocode(key)
+            except GeocodingError as e:
+                logger.warning('Geocoding %r failed: %s', key, e)
+                return None
+            latitude, longitude = coordinates or (None, None)
+            entry, _ = GeocodeCache.objects.update_or_create(
+                query=key,
+                defaults={'latitude': latitude, 'longitude': longitude, 'provider': geocoder.name},
+            )
+        if entry.is_found():
+            return entry.latitude, entry.longitude
+    return None
+
+
+def get_location(instance):
+    """Return the (address, city, state) of a job posting or job seeker profile."""
+    return tuple(getattr(instance, field) or '' for field in LOCATION_FIELDS)
+
+
+def get_coordinate_values(model, coordinates):
+    """
+    Return the field values to store for a row's coordinates, including the
+    geohash on models that have one.
+    """
+    latitude, longitude = coordinates or (None, None)
+    values = {'latitude': latitude, 'longitude': longitude}
+    if any(field.name == 'geohash' for field in model._meta.concrete_fields):
+        values['geohash'] = encode_geohash(latitude, longitude) if coordinates else ''
+    return values
+
+
+def geocode_location(model, pk, geocoder=None):
+    """
+    Geocode a job posting or job seeker profile and store its coordinates.
+    The row is only updated if its location hasn't changed in the meantime.
+    """
+    location = model._default_manager.filter(pk=pk).values_list(*LOCATION_FIELDS).first()
+    if location is None:
+        return None
+    coordinates = geocode(build_geocode_queries(*location), geocoder) if any(location) else None
+    updated = model._default_manager.filter(pk=pk, **dict(zip(LOCATION_FIELDS, location))).update(
+        **get_coordinate_values(model, coordinates)
+    )
+    if updated:
+        coordinates_updated.send(sender=model, pk=pk)
+    return coordinates
+
+
+def _geocode_in_thread(model, pk):
+    try:
+        geocode_location(model, pk)
+    except Exception:
+        logger.exception('Geocoding %s %s failed', model.__name__, pk)
+    finally:
+        connection.close()
+
+
+def schedule_geocode(instance):
+    """
+    Geocode a row's location once the current transaction commits, in a
+    background thread unless the GEOCODE_IN_BACKGROUND setting is False.
+    """
+    model, pk = type(instance), instance.pk
+    if getattr(settings, 'GEOCODE_IN_BACKGROUND', True):
+        transaction.on_commit(lambda: threading.Thread(target=_geocode_in_thread, args=(model, pk), daemon=True).start())
+    else:
+        transaction.on_commit(lambda: geocode_location(model, pk))
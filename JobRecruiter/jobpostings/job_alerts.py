@@ -0,0 +1,224 @@
+"""
+Job alerts: job searches saved by job seekers.
+
+Each alert is indexed as the set of terms a job must have to match it, one
+JobAlertTerm row per term: a word of its keywords, its city and/or state,
+and its employment type, or just '*' when it has none of those. A job's
+terms are worked out the same way from the words of its title, company,
+description and benefits, its city, state and employment type, plus '*'.
+The alerts a job matches are those whose terms are all among the job's
+terms, which one GROUP BY over the (term, alert) index finds by counting
+each alert's matched terms. The work grows with the number of alerts that
+share terms with the job, not with the total number of alerts. The pay
+floor is checked in the same query.
+
+Keywords match whole words, without the stemming the job search uses.
+
+Jobs are matched against the alerts once they're saved, in a background
+thread unless the JOB_ALERTS_IN_BACKGROUND setting is False. Matches are
+recorded as JobAlertMatch rows and sent to seekers by the
+send_job_alert_digests management command, as an in-app message or an
+email depending on the alert, at most once per JOB_ALERT_DIGEST_INTERVAL_MINUTES.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage as MailMessage, get_connection
+from django.db import connection, transaction
+from django.db.models import Count, F, Q
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.digests import send_bot_messages
+from .gazetteer import get_state_code, normalize_place
+from .models import JobAlert, JobAlertMatch, JobAlertTerm, JobPosting
+from .search import SEARCH_FIELDS, get_query_terms
+
+logger = logging.getLogger(__name__)
+
+ANY_TERM = '*'
+# Longer words are left out of the index
+MAX_WORD_LENGTH = 100
+
+# Most jobs listed for one alert in a digest
+DIGEST_JOB_LIMIT = 10
+
+
+def _keyword_terms(text):
+    return {f'kw:{word}' for word in get_query_terms(text) if len(word) <= MAX_WORD_LENGTH}
+
+
+def _location_terms(city, state):
+    terms = set()
+    city = normalize_place(city)
+    if city:
+        terms.add(f'city:{city}')
+    state = get_state_code(state)
+    if state:
+        terms.add(f'state:{state}')
+    return terms
+
+
+def get_alert_terms(alert):
+    """The terms a job needs to match an alert."""
+    terms = _keyword_terms(alert.keywords)
+    parts = [part.strip() for part in (alert.location or '').split(',') if part.strip()]
+    if len(parts) == 1 and get_state_code(parts[0]):
+        # Just a state
+        terms |= _location_terms('', parts[0])
+    elif parts:
+        terms |= _location_terms(parts[0], parts[1] if len(parts) > 1 else '')
+    if alert.employment_type:
+        terms.add(f'type:{alert.employment_type}')
+    return terms or {ANY_TERM}
+
+
+def get_job_terms(job):
+    """The terms a job has, for matching against alerts."""
+    terms = _keyword_terms(' '.join(getattr(job, field) or '' for field in SEARCH_FIELDS))
+    terms |= _location_terms(job.city, job.state)
+    terms.add(f'type:{job.employment_type}')
+    terms.add(ANY_TERM)
+    return terms
+
+
+def index_job_alert(alert):
+    """Rebuild the JobAlertTerm rows of an alert after it's created or edited."""
+    terms = get_alert_terms(alert)
+    with transaction.atomic():
+        JobAlertTerm.objects.filter(alert=alert).delete()
+        JobAlertTerm.objects.bulk_create([JobAlertTerm(alert=alert, term=term) for term in terms])
+        JobAlert.objects.filter(pk=alert.pk).update(term_count=len(terms))
+    alert.term_count = len(terms)
+
+
+def find_matching_alerts(job):
+    """Return a queryset of the alerts a job posting matches."""
+    matched_alerts = (
+        JobAlertTerm.objects.filter(term__in=get_job_terms(job))
+        .values('alert', 'alert__term_count')
+        .annotate(matched_terms=Count('id'))
+        .filter(matched_terms=F('alert__term_count'))
+        .values('alert')
+    )
+    # Jobs without pay information only match alerts without a pay floor
+    top_pay = job.pay_max if job.pay_max is not None else job.pay_min
+    pay_filter = Q(pay_min__isnull=True)
+    if top_pay is not None:
+        pay_filter |= Q(pay_min__lte=top_pay)
+    return JobAlert.objects.filter(pay_filter, id__in=matched_alerts)
+
+
+def match_job_to_alerts(job_id):
+    """Record a JobAlertMatch for each alert an active job posting matches."""
+    job = JobPosting.objects.filter(pk=job_id, is_active=True).first()
+    if job is None:
+        return 0
+    alert_ids = list(find_matching_alerts(job).values_list('id', flat=True))
+    JobAlertMatch.objects.bulk_create(
+        [JobAlertMatch(alert_id=alert_id, job_posting_id=job.id) for alert_id in alert_ids],
+        ignore_conflicts=True,
+    )
+    return len(alert_ids)
+
+
+def _match_in_thread(job_id):
+    try:
+        match_job_to_alerts(job_id)
+    except Exception:
+        logger.exception('Matching job %s to job alerts failed', job_id)
+    finally:
+        connection.close()
+
+
+def schedule_job_alert_matching(job):
+    """
+    Match a job posting against the alerts once the current transaction
+    commits, in a background thread unless JOB_ALERTS_IN_BACKGROUND is False.
+    """
+    job_id = job.pk
+    if getattr(settings, 'JOB_ALERTS_IN_BACKGROUND', True):
+        transaction.on_commit(lambda: threading.Thread(target=_match_in_thread, args=(job_id,), daemon=True).start())
+    else:
+        transaction.on_commit(lambda: match_job_to_alerts(job_id))
+
+
+def build_job_digest(matches_by_alert):
+    """The text of one seeker's digest, from {JobAlert: [JobAlertMatch]}."""
+    total = sum(len(matches) for matches in matches_by_alert.values())
+    lines = [f"{total} New Job{'s' if total != 1 else ''} Matching Your Alerts!"]
+    for alert, matches in matches_by_alert.items():
+        lines.append("")
+        lines.append(f"'{alert.name}': {len(matches)} new job{'s' if len(matches) != 1 else ''}")
+        for match in matches[:DIGEST_JOB_LIMIT]:
+            job = match.job_posting
+            job_link = settings.BASE_URL + reverse('jobpostings:detail', args=[job.id])
+            lines.append(f"- {job.title} at {job.company_name} ({job.location_display()}): {job_link}")
+        if len(matches) > DIGEST_JOB_LIMIT:
+            lines.append(f"...and {len(matches) - DIGEST_JOB_LIMIT} more")
+    return "\n".join(lines)
+
+
+def send_job_alert_digests(now=None):
+    """
+    Send each job seeker who is due one a digest of the new jobs matching
+    their alerts. Returns the number of digests sent.
+    """
+    now = now or timezone.now()
+    interval = timedelta(minutes=getattr(settings, 'JOB_ALERT_DIGEST_INTERVAL_MINUTES', 24 * 60))
+
+    # Seekers who got a digest within the interval wait for the next one
+    recently_notified = JobAlert.objects.filter(last_notified__gt=now - interval).values('seeker')
+    pending = JobAlertMatch.objects.filter(notified_at__isnull=True).exclude(alert__seeker__in=recently_notified)
+    matches = list(
+        pending.select_related('alert__seeker', 'job_posting').order_by('alert_id', 'matched_at', 'id')
+    )
+    if not matches:
+        return 0
+
+    # One digest per seeker and delivery method, leaving out jobs taken down since
+    digests = {}
+    for match in matches:
+        if not match.job_posting.is_active:
+            continue
+        alert = match.alert
+        delivery = 'email' if alert.delivery == 'email' and alert.seeker.email else 'message'
+        digests.setdefault((alert.seeker, delivery), {}).setdefault(alert, []).append(match)
+
+    emails = [
+        MailMessage(
+            subject="[JobRecruiter] New jobs matching your alerts",
+            body=build_job_digest(matches_by_alert),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[seeker.email],
+        )
+        for (seeker, delivery), matches_by_alert in digests.items()
+        if delivery == 'email'
+    ]
+    emails_sent = True
+    if emails:
+        try:
+            get_connection().send_messages(emails)
+        except Exception:
+            # The email matches stay pending and are retried on the next run
+            logger.exception('Sending job alert digest emails failed')
+            emails_sent = False
+
+    with transaction.atomic():
+        send_bot_messages({
+            seeker.id: build_job_digest(matches_by_alert)
+            for (seeker, delivery), matches_by_alert in digests.items()
+            if delivery == 'message'
+        }, now)
+
+        # Matches recorded since they were read wait for the next digest
+        sent = pending.filter(id__lte=max(match.id for match in matches))
+        if not emails_sent:
+            sent = sent.exclude(alert__delivery='email', alert__seeker__email__gt='')
+        sent.update(notified_at=now)
+        JobAlert.objects.filter(
+            id__in=JobAlertMatch.objects.filter(notified_at=now).values('alert_id')
+        ).update(last_notified=now)
+    return sum(1 for _, delivery in digests if delivery == 'message') + (len(emails) if emails_sent else 0)
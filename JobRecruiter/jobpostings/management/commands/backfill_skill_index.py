@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from accounts.models import JobSeekerProfile
+from jobpostings.models import JobPosting, JobRecommendationState
+from jobpostings.skills import sync_job_posting_skills, sync_candidate_skills
+from jobpostings.scoring import candidate_matrix
+from jobpostings.talent_pools import rebuild_talent_pool
+
+
+class Command(BaseCommand):
+    help = 'Fill the skill index tables and talent pools for existing job postings and job seeker profiles'
+
+    def handle(self, *args, **options):
+        job_count = 0
+        for job in JobPosting.objects.only('id', 'required_skills').iterator():
+            sync_job_posting_skills(job)
+            job_count += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed skills for {job_count} job postings.')
+        )
+
+        profiles = JobSeekerProfile.objects.select_related('profile')
+        candidate_count = 0
+        for jobseeker_profile in profiles.iterator():
+            sync_candidate_skills(jobseeker_profile)
+            candidate_count += 1
+        JobRecommendationState.objects.update(is_stale=True)
+        candidate_matrix.invalidate()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed skills for {candidate_count} job seeker profiles.')
+        )
+
+        pool_count = 0
+        for job in JobPosting.objects.filter(is_active=True).only('id', 'is_active').iterator():
+            rebuild_talent_pool(job)
+            pool_count += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt talent pools for {pool_count} active job postings.')
+        )
@@ -0,0 +1,63 @@
+import bz2
+import json
+from statistics import median
+from django.core.management.base import BaseCommand, CommandError
+from jobpostings.gazetteer import DEFAULT_PATH, normalize_place, write_gazetteer
+
+
+class Command(BaseCommand):
+    help = 'Build the offline US gazetteer file from a ZIP code dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'source',
+            help='JSON (optionally .bz2) list of ZIP codes with zip_code, zip_code_type, active, '
+                 'city, acceptable_cities, state, lat and long, as shipped by the zipcodes package',
+        )
+        parser.add_argument('--output', default=DEFAULT_PATH, help='Where to write the gazetteer file')
+
+    def handle(self, *args, **options):
+        opener = bz2.open if options['source'].endswith('.bz2') else open
+        try:
+            with opener(options['source'], 'rt', encoding='utf-8') as f:
+                rows = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {options['source']}: {e}")
+
+        zips = {}
+        # Coordinates of the ZIP codes of each place: those it's the primary
+        # city of, and those that only list it as an acceptable name
+        place_points = {}
+        acceptable_points = {}
+        for row in rows:
+            if not row.get('active') or row.get('zip_code_type') == 'MILITARY':
+                continue
+            point = (float(row['lat']), float(row['long']))
+            zips[row['zip_code']] = point + (1,)
+            state = row['state'].lower()
+            place_points.setdefault(state, []).append(point)
+            place_points.setdefault(f"{normalize_place(row['city'])},{state}", []).append(point)
+            for city in row.get('acceptable_cities', []):
+                acceptable_points.setdefault(f'{normalize_place(city)},{state}', []).append(point)
+        # Acceptable names are often neighbouring towns sharing a ZIP code, so
+        # they only place a city that is nobody's primary city
+        for key, points in acceptable_points.items():
+            place_points.setdefault(key, points)
+
+        # The median rather than the mean, so a few outlying ZIP codes (PO
+        # boxes, a far-flung part of the city) don't drag the centroid away
+        places = {
+            key: (
+                median(latitude for latitude, _ in points),
+                median(longitude for _, longitude in points),
+                len(points),
+            )
+            for key, points in place_points.items()
+        }
+        write_gazetteer(options['output'], zips, places)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote {len(zips)} ZIP codes and {len(places)} places to {options['output']}."
+            )
+        )
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from accounts.models import JobSeekerProfile
+from jobpostings.models import JobPosting
+from jobpostings.geocoding import geocode_location, get_geocoder
+
+
+class Command(BaseCommand):
+    help = 'Geocode job postings and job seeker profiles that have a location but no coordinates'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Geocode every row with a location, not just the ones missing coordinates',
+        )
+
+    def handle(self, *args, **options):
+        geocoder = get_geocoder()
+        has_location = ~Q(address='') | ~Q(city='') | ~Q(state='')
+        for model in (JobPosting, JobSeekerProfile):
+            rows = model.objects.filter(has_location)
+            if not options['all']:
+                rows = rows.filter(latitude__isnull=True)
+            found = missing = 0
+            for pk in rows.values_list('pk', flat=True).iterator():
+                if geocode_location(model, pk, geocoder):
+                    found += 1
+                else:
+                    missing += 1
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Geocoded {found} {model._meta.verbose_name_plural}, {missing} could not be found.'
+                )
+            )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from jobpostings.models import JobPosting
+from jobpostings.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for job postings'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Rebuilt the {backend.__class__.__name__} index for {JobPosting.objects.count()} job postings.'
+            )
+        )
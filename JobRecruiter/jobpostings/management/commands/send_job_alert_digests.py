@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from jobpostings.job_alerts import send_job_alert_digests
+
+
+class Command(BaseCommand):
+    help = 'Send job seekers a digest of the new jobs matching their job alerts'
+
+    def handle(self, *args, **options):
+        sent = send_job_alert_digests()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Sent {sent} job alert digest{"s" if sent != 1 else ""}.')
+        )
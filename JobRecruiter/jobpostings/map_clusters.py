@@ -0,0 +1,141 @@
+"""
+Clustered job markers for the job map.
+
+The map asks for the markers in its viewport at its zoom level. Jobs are
+grouped by the prefix of their geohash, one character longer for roughly
+every two and a half zoom levels, and each group becomes a single cluster
+at the average of its jobs' coordinates. Groups holding a single job come
+back as a plain job marker instead.
+
+The viewport is split into tiles (shorter geohash cells) and the clusters
+for each tile are computed by the database and cached, so panning around
+only computes the tiles that haven't been seen yet. The number of tiles and
+of clusters per tile are bounded, so the payload stays small however many
+jobs match. Every JobPosting save or delete invalidates the cache by
+bumping the tiles' IndexVersion, which every process reads, so no process
+serves tiles from before the change even though each caches its own.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, Max, Min
+from django.db.models.functions import Substr
+from django.urls import reverse
+
+from .models import IndexVersion, JobPosting
+from .spatial import GEOHASH_LENGTH, geohash_cells, geohash_prefilter
+
+MAX_TILES = 32
+CACHE_TIMEOUT = 10 * 60
+VERSION_NAME = 'job_map_clusters'
+# Most jobs listed when a cluster that can't be split any further is opened
+CELL_JOB_LIMIT = 50
+
+
+def get_cluster_precision(zoom):
+    """Geohash length to group jobs by at a map zoom level."""
+    return max(1, min(GEOHASH_LENGTH, round((zoom + 2) * 2 / 5)))
+
+
+def invalidate_map_clusters():
+    IndexVersion.bump(VERSION_NAME)
+
+
+def _cache_prefix(filter_key):
+    version = IndexVersion.get(VERSION_NAME)
+    digest = hashlib.md5(filter_key.encode()).hexdigest()
+    return f'job_map_clusters:{version}:{digest}'
+
+
+def _plain_queryset(jobs):
+    """Drop ordering, and search or distance annotations, which would end up in the GROUP BY."""
+    jobs = jobs.order_by()
+    if jobs.query.annotations:
+        jobs = JobPosting.objects.filter(id__in=jobs.values('id'))
+    return jobs
+
+
+def job_feature(job):
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [job.longitude, job.latitude]},
+        'properties': {
+            'id': job.id,
+            'title': job.title,
+            'company': job.company_name,
+            'location': job.full_address(),
+            'pay_range': job.pay_range_display(),
+            'employment_type': job.get_employment_type_display(),
+            'url': reverse('jobpostings:detail', args=[job.id]),
+        },
+    }
+
+
+def _cluster_tile(jobs, tile, precision):
+    """Return the GeoJSON features for the jobs in one tile."""
+    groups = list(
+        jobs.filter(geohash_prefilter([tile]))
+        .annotate(cell=Substr('geohash', 1, precision))
+        .values('cell')
+        .annotate(
+            count=Count('id'),
+            center_latitude=Avg('latitude'),
+            center_longitude=Avg('longitude'),
+            south=Min('latitude'),
+            north=Max('latitude'),
+            west=Min('longitude'),
+            east=Max('longitude'),
+            job_id=Min('id'),
+        )
+    )
+    single_jobs = JobPosting.objects.in_bulk([group['job_id'] for group in groups if group['count'] == 1])
+    features = []
+    for group in groups:
+        if group['count'] == 1:
+            features.append(job_feature(single_jobs[group['job_id']]))
+            continue
+        features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [group['center_longitude'], group['center_latitude']]},
+            'properties': {
+                'cluster': True,
+                'cell': group['cell'],
+                'point_count': group['count'],
+                'bounds': [[group['south'], group['west']], [group['north'], group['east']]],
+                # Jobs sharing one point can't be split by zooming in, so the
+                # map lists them instead
+                'expandable': group['south'] != group['north'] or group['west'] != group['east'],
+            },
+        })
+    return features
+
+
+def get_map_features(jobs, bbox, zoom, filter_key=''):
+    """
+    Return a GeoJSON FeatureCollection of clustered markers for the jobs in
+    a (south, west, north, east) bounding box at a zoom level. filter_key
+    identifies the filters applied to jobs, for caching.
+    """
+    precision = get_cluster_precision(zoom)
+    tiles = geohash_cells(*bbox, max_cells=MAX_TILES, max_precision=precision - 1)
+    prefix = _cache_prefix(filter_key)
+    keys = {tile: f'{prefix}:{precision}:{tile}' for tile in tiles}
+    cached = cache.get_many(keys.values())
+    jobs = _plain_queryset(jobs)
+    features = []
+    for tile, key in keys.items():
+        tile_features = cached.get(key)
+        if tile_features is None:
+            tile_features = _cluster_tile(jobs, tile, precision)
+            cache.set(key, tile_features, CACHE_TIMEOUT)
+        features.extend(tile_features)
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def get_cell_features(jobs, cell):
+    """Return up to CELL_JOB_LIMIT job features in a cluster's geohash cell."""
+    jobs = jobs.filter(geohash_prefilter([cell])).order_by('-created_at', '-id')
+    return {
+        'type': 'FeatureCollection',
+        'features': [job_feature(job) for job in jobs[:CELL_JOB_LIMIT]],
+    }
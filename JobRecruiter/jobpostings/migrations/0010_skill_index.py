@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobpostings', '0009_jobposting_required_skills'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Skill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='JobPostingSkill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_posting', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='skill_links', to='jobpostings.jobposting')),
+                ('skill', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='job_links', to='jobpostings.skill')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['skill', 'job_posting'], name='jobskill_skill_job_idx')],
+                'unique_together': {('job_posting', 'skill')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CandidateSkill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('candidate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='candidate_skills', to=settings.AUTH_USER_MODEL)),
+                ('skill', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='candidate_links', to='jobpostings.skill')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['skill', 'candidate'], name='candskill_skill_cand_idx')],
+                'unique_together': {('candidate', 'skill')},
+            },
+        ),
+    ]
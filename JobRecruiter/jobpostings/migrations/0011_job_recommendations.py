@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('jobpostings', '0010_skill_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobRecommendationState',
+            fields=[
+                ('seeker', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='job_recommendation_state', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('is_stale', models.BooleanField(default=True)),
+                ('built_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='JobRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('match_count', models.PositiveIntegerField(default=0)),
+                ('matching_skills', models.TextField(blank=True, help_text='Comma separated names of the matching skills')),
+                ('job_posting', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='jobpostings.jobposting')),
+                ('seeker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='job_recommendations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['seeker', '-match_count'], name='jobrec_seeker_rank_idx')],
+                'unique_together': {('seeker', 'job_posting')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobpostings', '0011_job_recommendations'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TalentPoolEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(default=0, help_text="Percentage of the job's skills the candidate has")),
+                ('match_count', models.PositiveIntegerField(default=0)),
+                ('matching_skills', models.TextField(blank=True, help_text='Comma separated names of the matching skills')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('candidate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='talent_pool_entries', to=settings.AUTH_USER_MODEL)),
+                ('job_posting', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='talent_pool', to='jobpostings.jobposting')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['job_posting', '-score'], name='talentpool_job_rank_idx')],
+                'unique_together': {('job_posting', 'candidate')},
+            },
+        ),
+    ]
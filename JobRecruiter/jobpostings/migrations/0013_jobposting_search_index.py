@@ -0,0 +1,63 @@
+from django.db import migrations
+
+
+# The search index as of this migration, copied from jobpostings/search.py so
+# later changes to the backends don't change what this migration does
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS jobpostings_jobposting_fts "
+    "USING fts5(title, company_name, description, benefits, tokenize='porter unicode61')",
+    "DELETE FROM jobpostings_jobposting_fts",
+    "INSERT INTO jobpostings_jobposting_fts (rowid, title, company_name, description, benefits) "
+    "SELECT id, title, company_name, description, benefits FROM jobpostings_jobposting",
+]
+
+SQLITE_DROP = [
+    "DROP TABLE IF EXISTS jobpostings_jobposting_fts",
+]
+
+POSTGRES_CREATE = [
+    "CREATE TABLE IF NOT EXISTS jobpostings_jobposting_search ("
+    "job_id bigint PRIMARY KEY REFERENCES jobpostings_jobposting (id) ON DELETE CASCADE, "
+    "document tsvector NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS jobpostings_jobposting_search_document_idx "
+    "ON jobpostings_jobposting_search USING GIN (document)",
+    "DELETE FROM jobpostings_jobposting_search",
+    "INSERT INTO jobpostings_jobposting_search (job_id, document) "
+    "SELECT j.id, "
+    "setweight(to_tsvector('english', coalesce(j.title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(j.company_name, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(j.description, '')), 'C') || "
+    "setweight(to_tsvector('english', coalesce(j.benefits, '')), 'D') "
+    "FROM jobpostings_jobposting j "
+    "ON CONFLICT (job_id) DO UPDATE SET document = EXCLUDED.document",
+]
+
+POSTGRES_DROP = [
+    "DROP TABLE IF EXISTS jobpostings_jobposting_search",
+]
+
+# Other databases fall back to substring matching, which needs no index
+CREATE_SQL = {'sqlite': SQLITE_CREATE, 'postgresql': POSTGRES_CREATE}
+DROP_SQL = {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP}
+
+
+def create_search_index(apps, schema_editor):
+    for sql in CREATE_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    for sql in DROP_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobpostings', '0012_talent_pool'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
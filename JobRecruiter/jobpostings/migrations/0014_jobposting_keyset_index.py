@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobpostings', '0013_jobposting_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='jobposting',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='jobposting',
+            index=models.Index(fields=['is_active', '-created_at', '-id'], name='jobposting_active_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobpostings', '0014_jobposting_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=255, unique=True)),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+                ('provider', models.CharField(blank=True, help_text='Name of the geocoder that answered the query', max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='jobposting',
+            name='latitude',
+            field=models.FloatField(blank=True, help_text='Set by the geocoder from the address, city and state', null=True),
+        ),
+        migrations.AddField(
+            model_name='jobposting',
+            name='longitude',
+            field=models.FloatField(blank=True, help_text='Set by the geocoder from the address, city and state', null=True),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:44
+
+from django.db import migrations, models
+
+
+# A copy of jobpostings/spatial.py's encoder as of this migration, so later
+# changes to it don't change what this migration does
+
+GEOHASH_LENGTH = 9
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_LENGTH):
+    south, north, west, east = -90.0, 90.0, -180.0, 180.0
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(geohash) < precision:
+        # Bits alternate between longitude and latitude, starting with longitude
+        if even:
+            middle = (west + east) / 2
+            bit = longitude >= middle
+            west, east = (middle, east) if bit else (west, middle)
+        else:
+            middle = (south + north) / 2
+            bit = latitude >= middle
+            south, north = (middle, north) if bit else (south, middle)
+        bits = bits * 2 + bit
+        bit_count += 1
+        even = not even
+        if bit_count == 5:
+            geohash.append(GEOHASH_ALPHABET[bits])
+            bits = bit_count = 0
+    return ''.join(geohash)
+
+
+def fill_geohashes(apps, schema_editor):
+    JobPosting = apps.get_model('jobpostings', 'JobPosting')
+    jobs = JobPosting.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    for job in jobs.only('id', 'latitude', 'longitude').iterator():
+        JobPosting.objects.filter(id=job.id).update(geohash=encode_geohash(job.latitude, job.longitude))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobpostings', '0015_geocoding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobposting',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, help_text='Geohash of the coordinates, used to prefilter radius searches', max_length=12),
+        ),
+        migrations.RunPython(fill_geohashes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobpostings', '0016_jobposting_geohash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(default='My Job Alert', max_length=100)),
+                ('keywords', models.CharField(blank=True, help_text="Words that must all appear in the job's title, company or description", max_length=255)),
+                ('location', models.CharField(blank=True, help_text='City, State or just a state', max_length=100)),
+                ('employment_type', models.CharField(blank=True, choices=[('full_time', 'Full-time'), ('part_time', 'Part-time'), ('contract', 'Contract'), ('internship', 'Internship'), ('temporary', 'Temporary'), ('other', 'Other')], max_length=20)),
+                ('pay_min', models.DecimalField(blank=True, decimal_places=2, help_text='Only jobs paying at least this much', max_digits=10, null=True)),
+                ('delivery', models.CharField(choices=[('message', 'In-app message'), ('email', 'Email')], default='message', max_length=10)),
+                ('term_count', models.PositiveIntegerField(default=0, help_text='Number of JobAlertTerm rows a job must match')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_notified', models.DateTimeField(blank=True, null=True)),
+                ('seeker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='job_alerts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='JobAlertMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('matched_at', models.DateTimeField(auto_now_add=True)),
+                ('notified_at', models.DateTimeField(blank=True, help_text='When the match was sent in a digest', null=True)),
+                ('alert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='jobpostings.jobalert')),
+                ('job_posting', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alert_matches', to='jobpostings.jobposting')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['notified_at', 'alert'], name='jobalertmatch_pending_idx')],
+                'unique_together': {('alert', 'job_posting')},
+            },
+        ),
+        migrations.CreateModel(
+            name='JobAlertTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=120)),
+                ('alert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='jobpostings.jobalert')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'alert'], name='jobalertterm_term_alert_idx')],
+                'unique_together': {('alert', 'term')},
+            },
+        ),
+    ]
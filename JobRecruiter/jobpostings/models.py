@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -27,6 +28,9 @@ class JobPosting(models.Model):
     required_skills = models.TextField(blank=True, help_text="List of skills required for this role (comma, semicolon, or newline separated)")
     application_url = models.URLField(blank=True)
     application_email = models.EmailField(blank=True)
+    latitude = models.FloatField(null=True, blank=True, help_text="Set by the geocoder from the address, city and state")
+    longitude = models.FloatField(null=True, blank=True, help_text="Set by the geocoder from the address, city and state")
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, help_text="Geohash of the coordinates, used to prefilter radius searches")
 
     posted_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='job_postings')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -34,7 +38,10 @@ class JobPosting(models.Model):
     is_active = models.BooleanField(default=True)
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['is_active', '-created_at', '-id'], name='jobposting_active_recent_idx'),
+        ]
 
     def __str__(self) -> str:
         return f"{self.title} at {self.company_name}"
@@ -56,6 +63,232 @@ class JobPosting(models.Model):
         return ", ".join(part for part in parts if part) or self.location_display()
 
 
+class Skill(models.Model):
+    """
+    A normalized skill name shared by job postings and job seekers.
+    """
+    name = models.CharField(max_length=255, unique=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class JobPostingSkill(models.Model):
+    """
+    Links a job posting to one of the skills parsed from its required_skills.
+    """
+    job_posting = models.ForeignKey(JobPosting, on_delete=models.CASCADE, related_name='skill_links')
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='job_links')
+
+    class Meta:
+        unique_together = ['job_posting', 'skill']
+        indexes = [
+            models.Index(fields=['skill', 'job_posting'], name='jobskill_skill_job_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.job_posting_id} requires {self.skill.name}"
+
+
+class CandidateSkill(models.Model):
+    """
+    Links a job seeker to one of the skills parsed from their profile.
+    """
+    candidate = models.ForeignKey(User, on_delete=models.CASCADE, related_name='candidate_skills')
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='candidate_links')
+
+    class Meta:
+        unique_together = ['candidate', 'skill']
+        indexes = [
+            models.Index(fields=['skill', 'candidate'], name='candskill_skill_cand_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.candidate_id} has {self.skill.name}"
+
+
+class JobRecommendation(models.Model):
+    """
+    A precomputed job recommendation for a job seeker, ranked by the number
+    of skills the job shares with the seeker's profile.
+    """
+    seeker = models.ForeignKey(User, on_delete=models.CASCADE, related_name='job_recommendations')
+    job_posting = models.ForeignKey(JobPosting, on_delete=models.CASCADE, related_name='recommendations')
+    match_count = models.PositiveIntegerField(default=0)
+    matching_skills = models.TextField(blank=True, help_text="Comma separated names of the matching skills")
+
+    class Meta:
+        unique_together = ['seeker', 'job_posting']
+        indexes = [
+            models.Index(fields=['seeker', '-match_count'], name='jobrec_seeker_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.job_posting_id} recommended to {self.seeker_id} ({self.match_count} skills)"
+
+    def get_matching_skills(self):
+        return [skill for skill in self.matching_skills.split(', ') if skill]
+
+
+class JobRecommendationState(models.Model):
+    """
+    Tracks whether a job seeker's JobRecommendation rows are up to date with
+    their skills. Stale recommendations are rebuilt the next time they're read.
+    """
+    seeker = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='job_recommendation_state')
+    is_stale = models.BooleanField(default=True)
+    built_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Job recommendations for {self.seeker_id} ({'stale' if self.is_stale else 'fresh'})"
+
+
+class TalentPoolEntry(models.Model):
+    """
+    A precomputed candidate match for an active job posting. Together the
+    entries for a job form its ranked talent pool.
+    """
+    job_posting = models.ForeignKey(JobPosting, on_delete=models.CASCADE, related_name='talent_pool')
+    candidate = models.ForeignKey(User, on_delete=models.CASCADE, related_name='talent_pool_entries')
+    score = models.FloatField(default=0, help_text="Percentage of the job's skills the candidate has")
+    match_count = models.PositiveIntegerField(default=0)
+    matching_skills = models.TextField(blank=True, help_text="Comma separated names of the matching skills")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['job_posting', 'candidate']
+        indexes = [
+            models.Index(fields=['job_posting', '-score'], name='talentpool_job_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.candidate_id} in talent pool for {self.job_posting_id} ({self.score:.0f}%)"
+
+    def get_matching_skills(self):
+        return [skill for skill in self.matching_skills.split(', ') if skill]
+
+
+class GeocodeCache(models.Model):
+    """
+    The result of geocoding a normalized address, so each address is only
+    sent to the geocoder once. Addresses that couldn't be found are cached
+    too, with empty coordinates.
+    """
+    query = models.CharField(max_length=255, unique=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    provider = models.CharField(max_length=50, blank=True, help_text="Name of the geocoder that answered the query")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        if self.latitude is None:
+            return f"{self.query} (not found)"
+        return f"{self.query} ({self.latitude:.5f}, {self.longitude:.5f})"
+
+    def is_found(self):
+        return self.latitude is not None and self.longitude is not None
+
+
+class IndexVersion(models.Model):
+    """
+    How many times some data held in process memory has changed. Every
+    change bumps the version, so a process whose copy was built at an older
+    version knows to rebuild it. It lives in the database rather than
+    Django's cache because the default cache is local to each process.
+    """
+    name = models.CharField(max_length=100, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} at version {self.version}"
+
+    @classmethod
+    def get(cls, name):
+        """The current version of name, 0 if it has never changed."""
+        return cls.objects.filter(name=name).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls, name):
+        """Record a change to name and return its new version."""
+        with transaction.atomic():
+            if not cls.objects.filter(name=name).update(version=F('version') + 1):
+                # Conflicts are a row created meanwhile by someone else
+                cls.objects.bulk_create([cls(name=name)], ignore_conflicts=True)
+                cls.objects.filter(name=name).update(version=F('version') + 1)
+            return cls.objects.filter(name=name).values_list('version', flat=True).get()
+
+
+class JobAlert(models.Model):
+    """
+    A job search saved by a job seeker. New and edited job postings that
+    match it are sent to the seeker in a periodic digest.
+    """
+    DELIVERY_CHOICES = (
+        ('message', 'In-app message'),
+        ('email', 'Email'),
+    )
+
+    seeker = models.ForeignKey(User, on_delete=models.CASCADE, related_name='job_alerts')
+    name = models.CharField(max_length=100, default="My Job Alert")
+    keywords = models.CharField(max_length=255, blank=True, help_text="Words that must all appear in the job's title, company or description")
+    location = models.CharField(max_length=100, blank=True, help_text="City, State or just a state")
+    employment_type = models.CharField(max_length=20, choices=JobPosting.EMPLOYMENT_TYPE_CHOICES, blank=True)
+    pay_min = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text="Only jobs paying at least this much")
+    delivery = models.CharField(max_length=10, choices=DELIVERY_CHOICES, default='message')
+    term_count = models.PositiveIntegerField(default=0, help_text="Number of JobAlertTerm rows a job must match")
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_notified = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.name} for {self.seeker_id}"
+
+
+class JobAlertTerm(models.Model):
+    """
+    One of the terms a job must have to match a JobAlert: a keyword, a city,
+    a state or an employment type. Together these rows are the inverted
+    index used to find the alerts a job matches.
+    """
+    alert = models.ForeignKey(JobAlert, on_delete=models.CASCADE, related_name='terms')
+    term = models.CharField(max_length=120)
+
+    class Meta:
+        unique_together = ['alert', 'term']
+        indexes = [
+            models.Index(fields=['term', 'alert'], name='jobalertterm_term_alert_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} for alert {self.alert_id}"
+
+
+class JobAlertMatch(models.Model):
+    """
+    A job posting that matched a JobAlert. Each job matches an alert at most
+    once, however often it's edited.
+    """
+    alert = models.ForeignKey(JobAlert, on_delete=models.CASCADE, related_name='matches')
+    job_posting = models.ForeignKey(JobPosting, on_delete=models.CASCADE, related_name='alert_matches')
+    matched_at = models.DateTimeField(auto_now_add=True)
+    notified_at = models.DateTimeField(null=True, blank=True, help_text="When the match was sent in a digest")
+
+    class Meta:
+        unique_together = ['alert', 'job_posting']
+        indexes = [
+            models.Index(fields=['notified_at', 'alert'], name='jobalertmatch_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.job_posting_id} matches job alert {self.alert_id}"
+
+
 class PipelineStage(models.Model):
     """
     Represents a stage in the hiring pipeline (e.g., Applied, Phone Screen, Interview, Offer, etc.)
@@ -0,0 +1,89 @@
+"""
+Keyset (cursor) pagination.
+
+Instead of OFFSET, each page filters on the ordering values of the last row
+of the previous page, so deep pages cost the same as the first one as long as
+the ordering is backed by an index. Cursors are opaque URL-safe strings.
+"""
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _split_ordering(ordering):
+    return [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+
+def _row_values(obj, ordering):
+    return [getattr(obj, name) for name, _ in _split_ordering(ordering)]
+
+
+def encode_cursor(values):
+    payload = json.dumps(values, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, model, ordering):
+    """Turn a cursor back into Python values for each ordering field."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor('Malformed cursor') from e
+    fields = _split_ordering(ordering)
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise InvalidCursor('Cursor does not match the ordering')
+    decoded = []
+    for (name, _), value in zip(fields, values):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotations such as a search rank are stored as plain JSON values
+            decoded.append(value)
+            continue
+        try:
+            decoded.append(field.to_python(value))
+        except Exception as e:
+            raise InvalidCursor(f'Invalid value for {name}') from e
+    return decoded
+
+
+def _after(ordering, values):
+    """
+    Build a filter selecting the rows that come after `values` in `ordering`:
+    (a > x) OR (a = x AND b > y) OR ... with > flipped for descending fields.
+    """
+    fields = _split_ordering(ordering)
+    condition = Q()
+    for i, (name, descending) in enumerate(fields):
+        step = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[i]})
+        for j, (prev_name, _) in enumerate(fields[:i]):
+            step &= Q(**{prev_name: values[j]})
+        condition |= step
+    return condition
+
+
+def keyset_page(queryset, ordering, cursor=None, page_size=20):
+    """
+    Return (items, next_cursor) for one page of `queryset` in `ordering`.
+
+    `ordering` must end in a unique field (normally '-id') so the order is
+    total. next_cursor is None on the last page. Raises InvalidCursor for a
+    cursor that can't be decoded.
+    """
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = queryset.filter(_after(ordering, decode_cursor(cursor, queryset.model, ordering)))
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor(_row_values(items[-1], ordering))
+    return items, next_cursor
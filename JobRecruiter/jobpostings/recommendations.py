@@ -0,0 +1,99 @@
+"""
+Materialized job recommendations for job seekers.
+
+Each seeker's ranked JobRecommendation rows are rebuilt lazily after their
+skills change, refreshed per job when a JobPosting is saved, and trimmed when
+the seeker applies, so the job list page only has to read them back.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    Application, JobPostingSkill, CandidateSkill,
+    JobRecommendation, JobRecommendationState,
+)
+
+
+def _build_rows(link_queryset, group_field, make_row):
+    """
+    Group skill links by group_field, count matches and collect the names of
+    the matching skills, returning a list of unsaved JobRecommendation rows.
+    """
+    matching_skills = {}
+    for key, skill_name in link_queryset.values_list(group_field, 'skill__name'):
+        matching_skills.setdefault(key, []).append(skill_name)
+    return [
+        make_row(key, len(names), ', '.join(sorted(names)))
+        for key, names in matching_skills.items()
+    ]
+
+
+def rebuild_job_recommendations(seeker):
+    """Recompute every JobRecommendation row for a job seeker."""
+    user_skill_ids = CandidateSkill.objects.filter(candidate=seeker).values('skill_id')
+    applied_job_ids = Application.objects.filter(applicant=seeker).values('job_posting_id')
+    links = JobPostingSkill.objects.filter(
+        skill_id__in=user_skill_ids, job_posting__is_active=True
+    ).exclude(job_posting_id__in=applied_job_ids)
+    rows = _build_rows(
+        links,
+        'job_posting_id',
+        lambda job_posting_id, match_count, skills: JobRecommendation(
+            seeker=seeker, job_posting_id=job_posting_id,
+            match_count=match_count, matching_skills=skills,
+        ),
+    )
+    with transaction.atomic():
+        JobRecommendation.objects.filter(seeker=seeker).delete()
+        JobRecommendation.objects.bulk_create(rows, ignore_conflicts=True)
+        JobRecommendationState.objects.update_or_create(
+            seeker=seeker, defaults={'is_stale': False, 'built_at': timezone.now()}
+        )
+
+
+def get_job_recommendations(seeker):
+    """
+    Return the seeker's ranked JobRecommendation rows, rebuilding them first
+    if their skills changed since the last build.
+    """
+    is_fresh = JobRecommendationState.objects.filter(seeker=seeker, is_stale=False).exists()
+    if not is_fresh:
+        rebuild_job_recommendations(seeker)
+    return JobRecommendation.objects.filter(
+        seeker=seeker, job_posting__is_active=True
+    ).select_related('job_posting').order_by('-match_count', '-job_posting__created_at')
+
+
+def mark_job_recommendations_stale(seeker_id):
+    JobRecommendationState.objects.filter(seeker_id=seeker_id).update(is_stale=True)
+
+
+def refresh_job_recommendations_for_job(job):
+    """
+    Update the recommendation rows for a single job across every seeker whose
+    recommendations are already built. Seekers with stale or missing
+    recommendations pick the job up on their next rebuild.
+    """
+    with transaction.atomic():
+        JobRecommendation.objects.filter(job_posting=job).delete()
+        if not job.is_active:
+            return
+        fresh_seeker_ids = JobRecommendationState.objects.filter(is_stale=False).values('seeker_id')
+        applicant_ids = Application.objects.filter(job_posting=job).values('applicant_id')
+        links = CandidateSkill.objects.filter(
+            skill_id__in=job.skill_links.values('skill_id'),
+            candidate_id__in=fresh_seeker_ids,
+        ).exclude(candidate_id__in=applicant_ids)
+        rows = _build_rows(
+            links,
+            'candidate_id',
+            lambda candidate_id, match_count, skills: JobRecommendation(
+                seeker_id=candidate_id, job_posting=job,
+                match_count=match_count, matching_skills=skills,
+            ),
+        )
+        JobRecommendation.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def remove_job_recommendation(seeker_id, job_posting_id):
+    JobRecommendation.objects.filter(seeker_id=seeker_id, job_posting_id=job_posting_id).delete()
@@ -0,0 +1,112 @@
+"""
+In-memory candidate scoring engine for candidate recommendations.
+
+The engine keeps a sparse candidate x skill matrix built once from the
+CandidateSkill index and updated incrementally when a job seeker's skills
+change. Rows (candidate -> skills) are used for updates and columns
+(skill -> candidates) for scoring, so scoring a job is a single sparse
+matrix-vector product over only the columns of the job's skills.
+"""
+import heapq
+import threading
+from collections import defaultdict
+
+from .models import CandidateSkill, IndexVersion
+
+MATRIX_VERSION_NAME = 'jobpostings:candidate_skill_matrix'
+
+
+class CandidateSkillMatrix:
+    """
+    Sparse candidate x skill matrix held in process memory.
+
+    The matrix's IndexVersion is bumped on every change so that other
+    processes reload their copy on next use.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._columns = defaultdict(set)
+        self._version = None
+
+    def _load(self, version):
+        rows = defaultdict(set)
+        columns = defaultdict(set)
+        links = CandidateSkill.objects.filter(
+            candidate__profile__account_type='jobseeker'
+        ).values_list('candidate_id', 'skill_id')
+        for candidate_id, skill_id in links.iterator():
+            rows[candidate_id].add(skill_id)
+            columns[skill_id].add(candidate_id)
+        self._rows = {candidate_id: frozenset(skills) for candidate_id, skills in rows.items()}
+        self._columns = columns
+        self._version = version
+
+    def _ensure_loaded(self):
+        version = IndexVersion.get(MATRIX_VERSION_NAME)
+        if version != self._version:
+            self._load(version)
+
+    def update_candidate(self, candidate_id, skill_ids):
+        """Replace a candidate's row with the given skill ids."""
+        skill_ids = frozenset(skill_ids)
+        with self._lock:
+            version = IndexVersion.bump(MATRIX_VERSION_NAME)
+            if self._version is None or self._version != version - 1:
+                # Missed another change, so reload on next use
+                self._version = None
+                return
+            old_skill_ids = self._rows.get(candidate_id, frozenset())
+            for skill_id in old_skill_ids - skill_ids:
+                self._columns[skill_id].discard(candidate_id)
+            for skill_id in skill_ids - old_skill_ids:
+                self._columns[skill_id].add(candidate_id)
+            if skill_ids:
+                self._rows[candidate_id] = skill_ids
+            else:
+                self._rows.pop(candidate_id, None)
+            self._version = version
+
+    def invalidate(self):
+        """Force every process to reload the matrix on next use."""
+        with self._lock:
+            IndexVersion.bump(MATRIX_VERSION_NAME)
+            self._version = None
+
+    def match(self, skill_ids, exclude=()):
+        """
+        Return {candidate_id: matching skill ids} for every candidate with at
+        least one of the skills.
+        """
+        skill_ids = frozenset(skill_ids)
+        exclude = set(exclude)
+        with self._lock:
+            self._ensure_loaded()
+            candidate_ids = set().union(*(self._columns.get(skill_id, ()) for skill_id in skill_ids))
+            candidate_ids -= exclude
+            return {candidate_id: self._rows[candidate_id] & skill_ids for candidate_id in candidate_ids}
+
+    def score(self, skill_ids, exclude=(), limit=50):
+        """
+        Score every candidate against a job's skills.
+
+        Returns (top, total) where top is a list of up to `limit`
+        (candidate_id, match_count) pairs ordered by match count, and total is
+        the number of candidates with at least one matching skill.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            scores = defaultdict(int)
+            for skill_id in set(skill_ids):
+                for candidate_id in self._columns.get(skill_id, ()):
+                    scores[candidate_id] += 1
+        exclude = set(exclude)
+        if exclude:
+            for candidate_id in exclude:
+                scores.pop(candidate_id, None)
+        top = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return top, len(scores)
+
+
+candidate_matrix = CandidateSkillMatrix()
@@ -0,0 +1,245 @@
+"""
+Full-text search for job postings.
+
+The search index lives next to the jobpostings_jobposting table and is kept
+up to date from model signals. Each backend knows how to index a job, remove
+it, rebuild the whole index and filter a JobPosting queryset down to the jobs
+matching a query, annotated with `search_rank` (lower is better) and
+`search_snippet` and ordered by relevance.
+
+Backends:
+- SQLiteSearchBackend: an FTS5 table with the porter stemmer, ranked by BM25.
+- PostgresSearchBackend: a tsvector table with a GIN index, ranked by ts_rank_cd.
+- BasicSearchBackend: the old icontains filter, for any other database.
+
+The backend is picked from the database engine unless the
+JOB_SEARCH_BACKEND setting names one explicitly.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+# Markers placed around matched terms in snippets. They're control characters
+# so they can't appear in user text, and the search_snippet template filter
+# turns them into <mark> tags after escaping the rest of the snippet.
+SNIPPET_START = '\x02'
+SNIPPET_END = '\x03'
+
+SEARCH_FIELDS = ('title', 'company_name', 'description', 'benefits')
+
+
+def get_query_terms(query):
+    """Split a user's search text into plain word terms."""
+    return re.findall(r'\w+', (query or '').lower())
+
+
+class BaseSearchBackend:
+    table_name = 'jobpostings_jobposting_search'
+
+    def create_index(self, schema_editor):
+        pass
+
+    def drop_index(self, schema_editor):
+        pass
+
+    def index(self, job):
+        pass
+
+    def remove(self, job_id):
+        pass
+
+    def rebuild_sql(self):
+        return []
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            for sql in self.rebuild_sql():
+                cursor.execute(sql)
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+
+class BasicSearchBackend(BaseSearchBackend):
+    """
+    Substring matching with icontains. No index, ranking or snippets.
+    """
+
+    def search(self, queryset, query):
+        return queryset.filter(
+            Q(title__icontains=query) |
+            Q(company_name__icontains=query) |
+            Q(description__icontains=query) |
+            Q(benefits__icontains=query)
+        )
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """
+    SQLite FTS5 index using the porter stemmer, ranked with BM25.
+    """
+    table_name = 'jobpostings_jobposting_fts'
+    # BM25 weights for title, company_name, description and benefits
+    column_weights = (10.0, 5.0, 1.0, 1.0)
+
+    def create_index(self, schema_editor):
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table_name} "
+            f"USING fts5({', '.join(SEARCH_FIELDS)}, tokenize='porter unicode61')"
+        )
+        for sql in self.rebuild_sql():
+            schema_editor.execute(sql)
+
+    def drop_index(self, schema_editor):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {self.table_name}")
+
+    def index(self, job):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table_name} WHERE rowid = %s", [job.id])
+            cursor.execute(
+                f"INSERT INTO {self.table_name} (rowid, {', '.join(SEARCH_FIELDS)}) "
+                f"VALUES (%s, %s, %s, %s, %s)",
+                [job.id] + [getattr(job, field) or '' for field in SEARCH_FIELDS],
+            )
+
+    def remove(self, job_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table_name} WHERE rowid = %s", [job_id])
+
+    def rebuild_sql(self):
+        return [
+            f"DELETE FROM {self.table_name}",
+            f"INSERT INTO {self.table_name} (rowid, {', '.join(SEARCH_FIELDS)}) "
+            f"SELECT id, {', '.join(SEARCH_FIELDS)} FROM jobpostings_jobposting",
+        ]
+
+    def build_match_expression(self, query):
+        terms = get_query_terms(query)
+        if not terms:
+            return None
+        # Quote every term so FTS5 operators in user input are taken literally,
+        # and allow the last term to match as a prefix while the user types.
+        quoted = [f'"{term}"' for term in terms]
+        quoted[-1] += '*'
+        return ' '.join(quoted)
+
+    def search(self, queryset, query):
+        match = self.build_match_expression(query)
+        if match is None:
+            return queryset
+        weights = ', '.join(str(weight) for weight in self.column_weights)
+        job_table = queryset.model._meta.db_table
+        return queryset.filter(
+            id__in=RawSQL(f"SELECT rowid FROM {self.table_name} WHERE {self.table_name} MATCH %s", [match])
+        ).annotate(
+            search_rank=RawSQL(
+                f"SELECT bm25({self.table_name}, {weights}) FROM {self.table_name} "
+                f"WHERE {self.table_name} MATCH %s AND rowid = {job_table}.id",
+                [match],
+            ),
+            search_snippet=RawSQL(
+                f"SELECT snippet({self.table_name}, -1, %s, %s, '...', 16) FROM {self.table_name} "
+                f"WHERE {self.table_name} MATCH %s AND rowid = {job_table}.id",
+                [SNIPPET_START, SNIPPET_END, match],
+            ),
+        ).order_by('search_rank', '-created_at')
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    PostgreSQL tsvector index with a GIN index, ranked with ts_rank_cd.
+    """
+    config = 'english'
+
+    def _document_sql(self, alias):
+        weights = {'title': 'A', 'company_name': 'B', 'description': 'C', 'benefits': 'D'}
+        return ' || '.join(
+            f"setweight(to_tsvector('{self.config}', coalesce({alias}.{field}, '')), '{weight}')"
+            for field, weight in weights.items()
+        )
+
+    def create_index(self, schema_editor):
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table_name} ("
+            f"job_id bigint PRIMARY KEY REFERENCES jobpostings_jobposting (id) ON DELETE CASCADE, "
+            f"document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table_name}_document_idx "
+            f"ON {self.table_name} USING GIN (document)"
+        )
+        for sql in self.rebuild_sql():
+            schema_editor.execute(sql)
+
+    def drop_index(self, schema_editor):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {self.table_name}")
+
+    def _upsert_sql(self, where):
+        return (
+            f"INSERT INTO {self.table_name} (job_id, document) "
+            f"SELECT j.id, {self._document_sql('j')} FROM jobpostings_jobposting j {where} "
+            f"ON CONFLICT (job_id) DO UPDATE SET document = EXCLUDED.document"
+        )
+
+    def index(self, job):
+        with connection.cursor() as cursor:
+            cursor.execute(self._upsert_sql("WHERE j.id = %s"), [job.id])
+
+    def remove(self, job_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table_name} WHERE job_id = %s", [job_id])
+
+    def rebuild_sql(self):
+        return [f"DELETE FROM {self.table_name}", self._upsert_sql("")]
+
+    def build_tsquery(self, query):
+        terms = get_query_terms(query)
+        if not terms:
+            return None
+        return ' & '.join(terms[:-1] + [f"{terms[-1]}:*"])
+
+    def search(self, queryset, query):
+        tsquery = self.build_tsquery(query)
+        if tsquery is None:
+            return queryset
+        job_table = queryset.model._meta.db_table
+        to_tsquery = f"to_tsquery('{self.config}', %s)"
+        headline_options = f"StartSel={SNIPPET_START}, StopSel={SNIPPET_END}, MaxWords=30, MinWords=10"
+        return queryset.filter(
+            id__in=RawSQL(
+                f"SELECT job_id FROM {self.table_name} WHERE document @@ {to_tsquery}", [tsquery]
+            )
+        ).annotate(
+            # Negated so that, as with BM25 in SQLite, lower ranks sort first
+            search_rank=RawSQL(
+                f"SELECT -ts_rank_cd(document, {to_tsquery}) FROM {self.table_name} "
+                f"WHERE job_id = {job_table}.id",
+                [tsquery],
+            ),
+            search_snippet=RawSQL(
+                f"ts_headline('{self.config}', {job_table}.description, {to_tsquery}, %s)",
+                [tsquery, headline_options],
+            ),
+        ).order_by('search_rank', '-created_at')
+
+
+def get_search_backend(vendor=None):
+    """Return the configured job search backend for the default database."""
+    backend_path = getattr(settings, 'JOB_SEARCH_BACKEND', None)
+    if backend_path:
+        return import_string(backend_path)()
+    vendor = vendor or connection.vendor
+    if vendor == 'sqlite':
+        return SQLiteSearchBackend()
+    if vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return BasicSearchBackend()
+
+
+def search_jobs(queryset, query):
+    """Filter a JobPosting queryset down to the jobs matching a search query."""
+    return get_search_backend().search(queryset, query)
@@ -0,0 +1,115 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from accounts.models import JobSeekerProfile
+from .models import JobPosting, Application, JobAlert
+from .skills import sync_job_posting_skills, sync_candidate_skills, clear_candidate_skills
+from .recommendations import (
+    mark_job_recommendations_stale, refresh_job_recommendations_for_job, remove_job_recommendation,
+)
+from . import talent_pools
+from .scoring import candidate_matrix
+from .search import get_search_backend
+from .geocoding import LOCATION_FIELDS, coordinates_updated, get_coordinate_values, get_location, schedule_geocode
+from .map_clusters import invalidate_map_clusters
+from .job_alerts import index_job_alert, schedule_job_alert_matching
+
+
+@receiver(post_save, sender=JobPosting)
+def update_job_posting_skills(sender, instance, created, **kwargs):
+    """
+    Keep the JobPostingSkill index, the job's talent pool and the job seekers'
+    recommendations in sync with the job's required_skills and active state.
+    """
+    skills_changed = sync_job_posting_skills(instance)
+    refresh_job_recommendations_for_job(instance)
+    if created or skills_changed or not instance.is_active or not instance.talent_pool.exists():
+        talent_pools.rebuild_talent_pool(instance)
+
+
+@receiver(post_save, sender=JobPosting)
+def update_job_search_index(sender, instance, **kwargs):
+    get_search_backend().index(instance)
+
+
+@receiver(post_delete, sender=JobPosting)
+def remove_job_from_search_index(sender, instance, **kwargs):
+    get_search_backend().remove(instance.id)
+
+
+@receiver(post_save, sender=JobPosting)
+def match_job_alerts(sender, instance, **kwargs):
+    if instance.is_active:
+        schedule_job_alert_matching(instance)
+
+
+@receiver(post_save, sender=JobAlert)
+def update_job_alert_index(sender, instance, **kwargs):
+    index_job_alert(instance)
+
+
+@receiver(pre_save, sender=JobPosting)
+@receiver(pre_save, sender=JobSeekerProfile)
+def remember_previous_location(sender, instance, **kwargs):
+    instance._previous_location = sender.objects.filter(pk=instance.pk).values_list(*LOCATION_FIELDS).first()
+
+
+@receiver(post_save, sender=JobPosting)
+@receiver(post_save, sender=JobSeekerProfile)
+def update_location_coordinates(sender, instance, **kwargs):
+    """
+    Clear the stored coordinates when the location changes and geocode the
+    new location in the background.
+    """
+    location = get_location(instance)
+    location_changed = location != getattr(instance, '_previous_location', None)
+    if not location_changed and instance.latitude is not None:
+        return
+    if location_changed and instance.latitude is not None:
+        values = get_coordinate_values(sender, None)
+        sender.objects.filter(pk=instance.pk).update(**values)
+        for field, value in values.items():
+            setattr(instance, field, value)
+    if any(location):
+        schedule_geocode(instance)
+
+
+@receiver(post_save, sender=JobPosting)
+@receiver(post_delete, sender=JobPosting)
+@receiver(coordinates_updated, sender=JobPosting)
+def clear_job_map_clusters(sender, **kwargs):
+    invalidate_map_clusters()
+
+
+@receiver(post_save, sender=JobSeekerProfile)
+def update_candidate_skills(sender, instance, **kwargs):
+    """
+    Keep the CandidateSkill index, the in-memory scoring matrix,
+    recommendations and talent pools in sync with the job seeker's skill
+    fields.
+    """
+    user_id = instance.profile.user_id
+    skill_ids, previous_skill_ids = sync_candidate_skills(instance)
+    if skill_ids != previous_skill_ids:
+        transaction.on_commit(lambda: candidate_matrix.update_candidate(user_id, skill_ids))
+        mark_job_recommendations_stale(user_id)
+        talent_pools.rescore_candidate(user_id, skill_ids, previous_skill_ids)
+
+
+@receiver(post_delete, sender=JobSeekerProfile)
+def remove_candidate_skills(sender, instance, **kwargs):
+    clear_candidate_skills(instance)
+    transaction.on_commit(candidate_matrix.invalidate)
+    talent_pools.remove_candidate(instance)
+
+
+@receiver(post_save, sender=Application)
+def remove_applied_job_recommendation(sender, instance, created, **kwargs):
+    """
+    Drop a job from the applicant's recommendations and remove the applicant
+    from the job's talent pool once they apply.
+    """
+    if created:
+        remove_job_recommendation(instance.applicant_id, instance.job_posting_id)
+        talent_pools.remove_pool_entry(instance.job_posting_id, instance.applicant_id)
@@ -0,0 +1,102 @@
+"""
+Skill parsing and the normalized skill index used by the recommendation views.
+
+Skills are split out of free text once, when a JobPosting or JobSeekerProfile
+is saved, and stored as Skill rows linked through JobPostingSkill and
+CandidateSkill. Matching then becomes an indexed join instead of re-parsing
+every row on every request.
+"""
+import re
+
+from .models import Skill, JobPostingSkill, CandidateSkill
+
+SKILL_DELIMITERS = r'[,;\n|/]'
+SKILL_PREFIXES = r'^(skills?|proficient in|experience with|knowledge of|familiar with):?\s*'
+SKILL_NAME_MAX_LENGTH = 255
+
+
+def extract_skills(text):
+    """Extract skills from text, returning a set of normalized skill strings."""
+    if not text:
+        return set()
+    skills = re.split(SKILL_DELIMITERS, text.lower())
+    normalized_skills = set()
+    for skill in skills:
+        skill = skill.strip()
+        skill = re.sub(SKILL_PREFIXES, '', skill, flags=re.IGNORECASE)
+        skill = skill.strip('.,;()[]{}')
+        if skill and len(skill) > 1:
+            normalized_skills.add(skill[:SKILL_NAME_MAX_LENGTH])
+    return normalized_skills
+
+
+def get_candidate_skills_text(jobseeker_profile):
+    """Combine the skill fields of a job seeker profile into one string."""
+    return f"{jobseeker_profile.technical_skills or ''} {jobseeker_profile.soft_skills or ''}"
+
+
+def get_skill_ids(names):
+    """
+    Return a {name: skill_id} dict for the given skill names, creating any
+    Skill rows that don't exist yet.
+    """
+    names = set(names)
+    if not names:
+        return {}
+    skill_ids = dict(Skill.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = names - skill_ids.keys()
+    if missing:
+        Skill.objects.bulk_create([Skill(name=name) for name in missing], ignore_conflicts=True)
+        skill_ids.update(Skill.objects.filter(name__in=missing).values_list('name', 'id'))
+    return skill_ids
+
+
+def _sync_links(link_queryset, wanted_ids, make_link):
+    """
+    Add and remove rows in link_queryset so its skill ids equal wanted_ids.
+    Returns the set of skill ids the rows had before.
+    """
+    existing_ids = set(link_queryset.values_list('skill_id', flat=True))
+    stale_ids = existing_ids - wanted_ids
+    if stale_ids:
+        link_queryset.filter(skill_id__in=stale_ids).delete()
+    new_ids = wanted_ids - existing_ids
+    if new_ids:
+        link_queryset.model.objects.bulk_create(
+            [make_link(skill_id) for skill_id in new_ids], ignore_conflicts=True
+        )
+    return existing_ids
+
+
+def sync_job_posting_skills(job):
+    """
+    Rebuild the JobPostingSkill rows for a job from its required_skills.
+    Returns True if the job's skills changed.
+    """
+    wanted_ids = set(get_skill_ids(extract_skills(job.required_skills)).values())
+    previous_ids = _sync_links(
+        JobPostingSkill.objects.filter(job_posting=job),
+        wanted_ids,
+        lambda skill_id: JobPostingSkill(job_posting=job, skill_id=skill_id),
+    )
+    return previous_ids != wanted_ids
+
+
+def sync_candidate_skills(jobseeker_profile):
+    """
+    Rebuild the CandidateSkill rows for a job seeker from their profile.
+    Returns the sets of skill ids they have now and had before.
+    """
+    user_id = jobseeker_profile.profile.user_id
+    wanted_ids = set(get_skill_ids(extract_skills(get_candidate_skills_text(jobseeker_profile))).values())
+    previous_ids = _sync_links(
+        CandidateSkill.objects.filter(candidate_id=user_id),
+        wanted_ids,
+        lambda skill_id: CandidateSkill(candidate_id=user_id, skill_id=skill_id),
+    )
+    return wanted_ids, previous_ids
+
+
+def clear_candidate_skills(jobseeker_profile):
+    """Remove all CandidateSkill rows for a job seeker."""
+    CandidateSkill.objects.filter(candidate__profile=jobseeker_profile.profile_id).delete()
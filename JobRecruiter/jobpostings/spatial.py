@@ -0,0 +1,136 @@
+"""
+Radius search over stored coordinates.
+
+Rows with coordinates also store a geohash, indexed in the database. A
+radius search first turns the circle's bounding box into a handful of
+geohash cells and selects the rows in those cells with indexed range
+lookups, then computes the exact haversine distance in the database for
+just those candidates and drops the ones outside the radius. The distance
+is annotated as `distance` (miles) so results can be ordered by it.
+"""
+import math
+
+from django.db.models import F, Q
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_MILES = 3958.8
+
+GEOHASH_LENGTH = 9
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Most geohash cells a bounding box is split into for the prefilter
+MAX_PREFILTER_CELLS = 16
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_LENGTH):
+    """Return the geohash of a point."""
+    south, north, west, east = -90.0, 90.0, -180.0, 180.0
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(geohash) < precision:
+        # Bits alternate between longitude and latitude, starting with longitude
+        if even:
+            middle = (west + east) / 2
+            bit = longitude >= middle
+            west, east = (middle, east) if bit else (west, middle)
+        else:
+            middle = (south + north) / 2
+            bit = latitude >= middle
+            south, north = (middle, north) if bit else (south, middle)
+        bits = bits * 2 + bit
+        bit_count += 1
+        even = not even
+        if bit_count == 5:
+            geohash.append(GEOHASH_ALPHABET[bits])
+            bits = bit_count = 0
+    return ''.join(geohash)
+
+
+def geohash_cell_size(precision):
+    """Return the (height, width) in degrees of a geohash cell."""
+    total_bits = precision * 5
+    longitude_bits = (total_bits + 1) // 2
+    latitude_bits = total_bits // 2
+    return 180.0 / 2 ** latitude_bits, 360.0 / 2 ** longitude_bits
+
+
+def bounding_box(latitude, longitude, radius_miles):
+    """Return (south, west, north, east) around a circle on the earth's surface."""
+    latitude_delta = math.degrees(radius_miles / EARTH_RADIUS_MILES)
+    cos_latitude = math.cos(math.radians(latitude))
+    if cos_latitude < 1e-6:
+        longitude_delta = 180.0
+    else:
+        longitude_delta = min(180.0, math.degrees(radius_miles / (EARTH_RADIUS_MILES * cos_latitude)))
+    return (
+        max(-90.0, latitude - latitude_delta),
+        max(-180.0, longitude - longitude_delta),
+        min(90.0, latitude + latitude_delta),
+        min(180.0, longitude + longitude_delta),
+    )
+
+
+def _cell_span(south, west, north, east, precision):
+    height, width = geohash_cell_size(precision)
+    rows = range(math.floor((south + 90) / height), math.floor((min(north, 89.999999) + 90) / height) + 1)
+    cols = range(math.floor((west + 180) / width), math.floor((min(east, 179.999999) + 180) / width) + 1)
+    return height, width, rows, cols
+
+
+def geohash_cells(south, west, north, east, max_cells=MAX_PREFILTER_CELLS, max_precision=GEOHASH_LENGTH):
+    """
+    Return the geohash cells covering a bounding box, at the finest precision
+    up to max_precision that needs no more than max_cells of them. A box too
+    big for a single one-character cell is covered by [''], the whole world.
+    """
+    for precision in range(max_precision, 0, -1):
+        height, width, rows, cols = _cell_span(south, west, north, east, precision)
+        if len(rows) * len(cols) <= max_cells:
+            return sorted({
+                encode_geohash((row + 0.5) * height - 90, (col + 0.5) * width - 180, precision)
+                for row in rows
+                for col in cols
+            })
+    return ['']
+
+
+def geohash_prefilter(cells, field='geohash'):
+    """
+    Build a filter for rows whose geohash starts with one of the cells, as
+    range lookups so the database can use the index.
+    """
+    if '' in cells:
+        return ~Q(**{field: ''})
+    condition = Q()
+    for cell in cells:
+        # '~' sorts after every geohash character
+        condition |= Q(**{f'{field}__gte': cell, f'{field}__lte': cell + '~'})
+    return condition
+
+
+def distance_expression(latitude, longitude):
+    """Haversine distance in miles from a point to each row's coordinates."""
+    origin_latitude = math.radians(latitude)
+    origin_longitude = math.radians(longitude)
+    half_latitude_delta = (Radians(F('latitude')) - origin_latitude) / 2
+    half_longitude_delta = (Radians(F('longitude')) - origin_longitude) / 2
+    a = (
+        Power(Sin(half_latitude_delta), 2)
+        + math.cos(origin_latitude) * Cos(Radians(F('latitude'))) * Power(Sin(half_longitude_delta), 2)
+    )
+    return 2 * EARTH_RADIUS_MILES * ASin(Sqrt(a))
+
+
+def within_radius(queryset, latitude, longitude, radius_miles):
+    """
+    Filter a queryset of geocoded rows down to those within radius_miles of a
+    point, annotated with their `distance` in miles.
+    """
+    cells = geohash_cells(*bounding_box(latitude, longitude, radius_miles))
+    return queryset.filter(
+        geohash_prefilter(cells)
+    ).annotate(
+        distance=distance_expression(latitude, longitude)
+    ).filter(distance__lte=radius_miles)
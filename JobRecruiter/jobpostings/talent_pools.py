@@ -0,0 +1,102 @@
+"""
+Materialized talent pools for active job postings.
+
+Each active job keeps a ranked list of TalentPoolEntry rows for the job
+seekers who share at least one of its skills. A job's pool is rebuilt when
+its skills or active state change, scoring every job seeker at once through
+the in-memory candidate skill matrix (scoring.py). When a job seeker's
+skills change only the jobs sharing a skill with them (found through the
+JobPostingSkill inverted index) are rescored.
+"""
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Application, JobPostingSkill, TalentPoolEntry
+from .scoring import candidate_matrix
+
+
+def _group_skill_names(link_queryset, group_field):
+    """Return {group_field value: [skill names]} for the given skill links."""
+    skill_names = {}
+    for key, skill_name in link_queryset.values_list(group_field, 'skill__name'):
+        skill_names.setdefault(key, []).append(skill_name)
+    return skill_names
+
+
+def _make_entry(job_posting_id, candidate_id, names, total_job_skills):
+    return TalentPoolEntry(
+        job_posting_id=job_posting_id,
+        candidate_id=candidate_id,
+        score=(len(names) / total_job_skills) * 100,
+        match_count=len(names),
+        matching_skills=', '.join(sorted(names)),
+    )
+
+
+def rebuild_talent_pool(job):
+    """
+    Recompute every TalentPoolEntry row for a job posting, scoring the job
+    seekers through the in-memory candidate skill matrix.
+    """
+    with transaction.atomic():
+        TalentPoolEntry.objects.filter(job_posting=job).delete()
+        if not job.is_active:
+            return
+        job_skill_names = dict(job.skill_links.values_list('skill_id', 'skill__name'))
+        if not job_skill_names:
+            return
+        applicant_ids = Application.objects.filter(job_posting=job).values_list('applicant_id', flat=True)
+        entries = [
+            _make_entry(
+                job.id, candidate_id, [job_skill_names[skill_id] for skill_id in skill_ids], len(job_skill_names)
+            )
+            for candidate_id, skill_ids in candidate_matrix.match(job_skill_names, exclude=applicant_ids).items()
+        ]
+        TalentPoolEntry.objects.bulk_create(entries, batch_size=500, ignore_conflicts=True)
+
+
+def rescore_candidate(candidate_id, skill_ids, previous_skill_ids):
+    """
+    Update a job seeker's entries in the talent pools of the active jobs that
+    share a skill with their old or new skills.
+    """
+    affected_skill_ids = set(skill_ids) | set(previous_skill_ids)
+    if not affected_skill_ids:
+        return
+    affected_job_ids = JobPostingSkill.objects.filter(
+        skill_id__in=affected_skill_ids, job_posting__is_active=True
+    ).exclude(
+        job_posting__applications__applicant_id=candidate_id
+    ).values('job_posting_id')
+    with transaction.atomic():
+        TalentPoolEntry.objects.filter(
+            candidate_id=candidate_id, job_posting_id__in=affected_job_ids
+        ).delete()
+        if not skill_ids:
+            return
+        matching = _group_skill_names(
+            JobPostingSkill.objects.filter(job_posting_id__in=affected_job_ids, skill_id__in=skill_ids),
+            'job_posting_id',
+        )
+        if not matching:
+            return
+        total_job_skills = dict(
+            JobPostingSkill.objects.filter(job_posting_id__in=matching.keys())
+            .values('job_posting_id')
+            .annotate(total=Count('id'))
+            .values_list('job_posting_id', 'total')
+        )
+        entries = [
+            _make_entry(job_posting_id, candidate_id, names, total_job_skills[job_posting_id])
+            for job_posting_id, names in matching.items()
+        ]
+        TalentPoolEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def remove_candidate(jobseeker_profile):
+    """Remove a job seeker from every talent pool."""
+    TalentPoolEntry.objects.filter(candidate__profile=jobseeker_profile.profile_id).delete()
+
+
+def remove_pool_entry(job_posting_id, candidate_id):
+    TalentPoolEntry.objects.filter(job_posting_id=job_posting_id, candidate_id=candidate_id).delete()
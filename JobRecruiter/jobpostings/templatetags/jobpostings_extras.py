@@ -1,5 +1,9 @@
 # In jobpostings/templatetags/jobpostings_extras.py
 from django import template
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from jobpostings.search import SNIPPET_START, SNIPPET_END
 
 register = template.Library()
 
@@ -16,4 +20,16 @@ def lookup(dictionary, key):
         return {'applications': []}
     return data
 
+
+@register.filter(name='search_snippet')
+def search_snippet(snippet):
+    """
+    Escapes a full-text search snippet and wraps the matched terms in <mark>.
+    Usage: {{ job.search_snippet|search_snippet }}
+    """
+    if not snippet:
+        return ''
+    highlighted = escape(snippet).replace(SNIPPET_START, '<mark>').replace(SNIPPET_END, '</mark>')
+    return mark_safe(highlighted)
+
 # Add any other custom filters or tags you might have here
\ No newline at end of file
@@ -1,3 +1,345 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import JobSeekerProfile, Profile
+from .geocoding import get_coordinate_values
+from .job_alerts import get_alert_terms, match_job_to_alerts
+from .models import Application, JobAlert, JobAlertMatch, JobPosting
+from .pagination import InvalidCursor, encode_cursor, keyset_page
+from .spatial import within_radius
+
+ATLANTA = (33.749, -84.388)
+MARIETTA = (33.9526, -84.5499)
+KENNESAW = (34.0234, -84.6155)
+SAVANNAH = (32.0809, -81.0912)
+
+
+def make_employer(username):
+    user = User.objects.create_user(username)
+    Profile.objects.create(user=user, account_type='employer')
+    return user
+
+
+def make_job(employer, title, coordinates=None, **fields):
+    fields = {'company_name': 'Acme', 'description': title, **fields}
+    job = JobPosting.objects.create(posted_by=employer, title=title, **fields)
+    # Set the coordinates the geocoder would have stored
+    JobPosting.objects.filter(pk=job.pk).update(**get_coordinate_values(JobPosting, coordinates))
+    return job
+
+
+def make_applicant(username, job, coordinates=None, city='', state='', **fields):
+    user = User.objects.create_user(username)
+    profile = Profile.objects.create(user=user, account_type='jobseeker')
+    jobseeker_profile = JobSeekerProfile.objects.create(
+        profile=profile, full_name=username.title(), city=city, state=state, **fields
+    )
+    JobSeekerProfile.objects.filter(pk=jobseeker_profile.pk).update(
+        **get_coordinate_values(JobSeekerProfile, coordinates)
+    )
+    Application.objects.create(job_posting=job, applicant=user, cover_letter='Hello')
+    return user
+
+
+class RadiusSearchTests(TestCase):
+    def setUp(self):
+        self.employer = make_employer('employer')
+        self.atlanta = make_job(self.employer, 'Atlanta job', ATLANTA)
+        self.marietta = make_job(self.employer, 'Marietta job', MARIETTA)
+        self.savannah = make_job(self.employer, 'Savannah job', SAVANNAH)
+        make_job(self.employer, 'Remote job')
+
+    def test_within_radius(self):
+        jobs = within_radius(JobPosting.objects.all(), *ATLANTA, 25).order_by('distance')
+        self.assertEqual(list(jobs), [self.atlanta, self.marietta])
+        self.assertAlmostEqual(jobs[0].distance, 0, places=3)
+        self.assertTrue(15 < jobs[1].distance < 20)
+
+    def test_larger_radius(self):
+        jobs = within_radius(JobPosting.objects.all(), *ATLANTA, 300)
+        self.assertEqual(set(jobs), {self.atlanta, self.marietta, self.savannah})
+
+    def test_job_list_near_coordinates(self):
+        response = self.client.get(reverse('jobpostings:list'), {'near': '33.749, -84.388', 'radius': '25'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.context['jobs']), {self.atlanta, self.marietta})
+
+
+class JobMapMarkersTests(TestCase):
+    url = reverse('jobpostings:map_markers')
+
+    def setUp(self):
+        cache.clear()
+        self.employer = make_employer('employer')
+        self.atlanta = make_job(self.employer, 'Atlanta job', ATLANTA)
+        self.marietta = make_job(self.employer, 'Marietta job', MARIETTA)
+        self.savannah = make_job(self.employer, 'Savannah job', SAVANNAH)
+
+    def get_features(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['features']
+
+    def test_clusters_at_low_zoom(self):
+        kennesaw = make_job(self.employer, 'Kennesaw job', KENNESAW)
+        features = self.get_features(bbox='-90,30,-80,36', zoom='5')
+        clusters = [feature for feature in features if feature['properties'].get('cluster')]
+        self.assertEqual(len(clusters), 1)
+        self.assertEqual(clusters[0]['properties']['point_count'], 2)
+        self.assertTrue(clusters[0]['properties']['expandable'])
+        cell_features = self.get_features(cell=clusters[0]['properties']['cell'])
+        self.assertEqual(
+            {feature['properties']['id'] for feature in cell_features}, {self.marietta.id, kennesaw.id}
+        )
+        jobs = {feature['properties']['id'] for feature in features if not feature['properties'].get('cluster')}
+        self.assertEqual(jobs, {self.atlanta.id, self.savannah.id})
+
+    def test_single_jobs_at_high_zoom(self):
+        features = self.get_features(bbox='-85,33.5,-84,34.5', zoom='14')
+        self.assertEqual(
+            {feature['properties']['id'] for feature in features}, {self.atlanta.id, self.marietta.id}
+        )
+
+    def test_radius_filter(self):
+        features = self.get_features(bbox='-90,30,-80,36', zoom='14', near='33.749,-84.388', radius='5')
+        self.assertEqual([feature['properties']['id'] for feature in features], [self.atlanta.id])
+
+    def test_saved_job_invalidates_tiles(self):
+        self.get_features(bbox='-85,33.5,-84,34.5', zoom='14')
+        self.marietta.is_active = False
+        self.marietta.save()
+        features = self.get_features(bbox='-85,33.5,-84,34.5', zoom='14')
+        self.assertEqual([feature['properties']['id'] for feature in features], [self.atlanta.id])
+
+    def test_cell(self):
+        cell = JobPosting.objects.get(pk=self.atlanta.pk).geohash[:5]
+        features = self.get_features(cell=cell)
+        self.assertEqual([feature['properties']['id'] for feature in features], [self.atlanta.id])
+
+    def test_invalid_parameters(self):
+        for params, error in [
+            ({}, 'bbox and zoom are required'),
+            ({'bbox': '-90,30,-80', 'zoom': '5'}, 'bbox and zoom are required'),
+            ({'bbox': '-90,30,-80,36', 'zoom': 'x'}, 'bbox and zoom are required'),
+            ({'bbox': 'nan,30,-80,36', 'zoom': '5'}, 'bbox and zoom must be finite numbers'),
+            ({'bbox': '-90,30,inf,36', 'zoom': '5'}, 'bbox and zoom must be finite numbers'),
+            ({'cell': 'aaa'}, 'Invalid cell'),
+        ]:
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': error})
+
+
+class ApplicantMapBucketsTests(TestCase):
+    url = reverse('jobpostings:applicant_map_buckets')
+
+    def setUp(self):
+        self.employer = make_employer('employer')
+        self.job = make_job(self.employer, 'Developer')
+        make_applicant('atlanta1', self.job, ATLANTA, city='Atlanta', state='GA')
+        make_applicant('atlanta2', self.job, ATLANTA, city='Atlanta', state='GA')
+        make_applicant('savannah', self.job, SAVANNAH, city='Savannah', state='GA')
+        make_applicant('hidden', self.job, ATLANTA, city='Atlanta', state='GA', show_location_to_recruiters=False)
+        make_applicant('unplaced', self.job, city='Nowhere', state='GA')
+        self.client.force_login(self.employer)
+
+    def get_buckets(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_grid(self):
+        buckets = self.get_buckets(mode='grid', bbox='-90,30,-80,36', zoom='8')
+        self.assertEqual([feature['properties']['count'] for feature in buckets['features']], [2, 1])
+        self.assertEqual(buckets['max_count'], 2)
+
+    def test_grid_only_covers_bbox(self):
+        buckets = self.get_buckets(mode='grid', bbox='-82,31,-80,33', zoom='8')
+        self.assertEqual([feature['properties']['count'] for feature in buckets['features']], [1])
+
+    def test_city(self):
+        buckets = self.get_buckets(mode='city')
+        self.assertEqual(
+            [(feature['properties']['label'], feature['properties']['count']) for feature in buckets['features']],
+            [('Atlanta, GA', 2), ('Savannah, GA', 1)],
+        )
+        self.assertEqual(buckets['features'][0]['properties']['filter'], {'city': 'atlanta', 'state': 'ga'})
+
+    def test_state(self):
+        buckets = self.get_buckets(mode='state')
+        self.assertEqual(
+            [(feature['properties']['label'], feature['properties']['count']) for feature in buckets['features']],
+            [('GA', 3)],
+        )
+
+    def test_other_employers_applicants(self):
+        self.client.force_login(make_employer('other'))
+        self.assertEqual(self.get_buckets(mode='state')['features'], [])
+
+    def test_invalid_parameters(self):
+        for params, error in [
+            ({'mode': 'zip'}, 'Invalid mode'),
+            ({'mode': 'grid'}, 'bbox and zoom are required'),
+            ({'mode': 'grid', 'bbox': '-90,nan,-80,36', 'zoom': '8'}, 'bbox and zoom must be finite numbers'),
+        ]:
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': error})
+
+    def test_job_seekers_cannot_see_buckets(self):
+        self.client.force_login(User.objects.get(username='atlanta1'))
+        response = self.client.get(self.url, {'mode': 'state'})
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(JOB_ALERTS_IN_BACKGROUND=False, GEOCODE_IN_BACKGROUND=False)
+class JobAlertTests(TestCase):
+    def setUp(self):
+        self.employer = make_employer('employer')
+        self.seeker = User.objects.create_user('seeker')
+        Profile.objects.create(user=self.seeker, account_type='jobseeker')
+
+    def make_alert(self, **fields):
+        return JobAlert.objects.create(seeker=self.seeker, **fields)
+
+    def post_job(self, title, **fields):
+        fields = {'city': 'Atlanta', 'state': 'GA', **fields}
+        with self.captureOnCommitCallbacks(execute=True):
+            return make_job(self.employer, title, **fields)
+
+    def matched_alerts(self, job):
+        return set(JobAlertMatch.objects.filter(job_posting=job).values_list('alert_id', flat=True))
+
+    def test_alert_terms(self):
+        alert = self.make_alert(keywords='Senior Python', location='Atlanta, Georgia', employment_type='part_time')
+        self.assertEqual(
+            get_alert_terms(alert),
+            {'kw:senior', 'kw:python', 'city:atlanta', 'state:ga', 'type:part_time'},
+        )
+        self.assertEqual(get_alert_terms(JobAlert(location='georgia')), {'state:ga'})
+        self.assertEqual(get_alert_terms(JobAlert()), {'*'})
+        self.assertEqual(alert.terms.count(), 5)
+        self.assertEqual(JobAlert.objects.get(pk=alert.pk).term_count, 5)
+
+    def test_keywords_must_all_match_whole_words(self):
+        python = self.make_alert(keywords='python developer')
+        java = self.make_alert(keywords='java')
+        job = self.post_job('Python Developer', description='JavaScript front end')
+        self.assertEqual(self.matched_alerts(job), {python.id})
+        self.assertNotIn(java.id, self.matched_alerts(self.post_job('Python')))
+
+    def test_location_and_employment_type(self):
+        atlanta = self.make_alert(location='atlanta, ga')
+        georgia = self.make_alert(location='GA')
+        boston = self.make_alert(location='Boston, MA')
+        contract = self.make_alert(employment_type='contract')
+        anything = self.make_alert()
+        job = self.post_job('Developer', employment_type='full_time')
+        self.assertEqual(self.matched_alerts(job), {atlanta.id, georgia.id, anything.id})
+        job = self.post_job('Developer', city='Boston', state='MA', employment_type='contract')
+        self.assertEqual(self.matched_alerts(job), {boston.id, contract.id, anything.id})
+
+    def test_pay_floor(self):
+        alert = self.make_alert(pay_min=Decimal('80000'))
+        self.assertEqual(self.matched_alerts(self.post_job('Low', pay_min=50000, pay_max=70000)), set())
+        self.assertEqual(self.matched_alerts(self.post_job('High', pay_min=60000, pay_max=90000)), {alert.id})
+        self.assertEqual(self.matched_alerts(self.post_job('Unknown pay')), set())
+
+    def test_edited_alert_is_reindexed(self):
+        alert = self.make_alert(keywords='python')
+        alert.keywords = 'rust'
+        alert.save()
+        self.assertEqual(self.matched_alerts(self.post_job('Python Developer')), set())
+        self.assertEqual(self.matched_alerts(self.post_job('Rust Developer')), {alert.id})
+
+    def test_matches_are_recorded_once(self):
+        alert = self.make_alert(keywords='python')
+        job = self.post_job('Python Developer')
+        self.assertEqual(match_job_to_alerts(job.id), 1)
+        self.assertEqual(JobAlertMatch.objects.filter(alert=alert).count(), 1)
+
+    def test_inactive_jobs_do_not_match(self):
+        self.make_alert()
+        self.assertEqual(self.matched_alerts(self.post_job('Developer', is_active=False)), set())
+
+
+class KeysetPaginationTests(TestCase):
+    ordering = ('-created_at', '-id')
+
+    def setUp(self):
+        employer = make_employer('employer')
+        self.jobs = [make_job(employer, f'Job {number}') for number in range(7)]
+        # Ties on created_at are broken by id
+        JobPosting.objects.filter(pk__in=[job.pk for job in self.jobs[2:5]]).update(created_at=timezone.now())
+        self.expected = list(JobPosting.objects.order_by(*self.ordering))
+
+    def test_pages(self):
+        pages = []
+        cursor = None
+        while True:
+            items, cursor = keyset_page(JobPosting.objects.all(), self.ordering, cursor=cursor, page_size=3)
+            pages.append(items)
+            if cursor is None:
+                break
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual([job for page in pages for job in page], self.expected)
+
+    def test_exact_last_page(self):
+        items, cursor = keyset_page(JobPosting.objects.all(), self.ordering, page_size=7)
+        self.assertEqual(items, self.expected)
+        self.assertIsNone(cursor)
+
+    def test_rows_added_meanwhile_do_not_shift_pages(self):
+        first_page, cursor = keyset_page(JobPosting.objects.all(), self.ordering, page_size=3)
+        make_job(first_page[0].posted_by, 'Newer job')
+        second_page, _ = keyset_page(JobPosting.objects.all(), self.ordering, cursor=cursor, page_size=3)
+        self.assertEqual(second_page, self.expected[3:6])
+
+    def test_invalid_cursors(self):
+        for cursor in [
+            'not a cursor',
+            encode_cursor({'created_at': 1}),
+            encode_cursor([1]),
+            encode_cursor(['yesterday', 1]),
+        ]:
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                keyset_page(JobPosting.objects.all(), self.ordering, cursor=cursor)
+
+
+@mock.patch('jobpostings.views.JOB_LIST_PAGE_SIZE', 2)
+class JobListPageTests(TestCase):
+    url = reverse('jobpostings:list_page')
+
+    def setUp(self):
+        employer = make_employer('employer')
+        self.jobs = [make_job(employer, f'Job {number}') for number in range(5)]
+        make_job(employer, 'Closed job', is_active=False)
+
+    def test_infinite_scroll(self):
+        response = self.client.get(reverse('jobpostings:list'))
+        self.assertEqual(list(response.context['jobs']), self.jobs[:-3:-1])
+        cursor = response.context['next_cursor']
+        titles = []
+        while cursor:
+            page = self.client.get(self.url, {'cursor': cursor}).json()
+            titles += [job['title'] for job in page['jobs']]
+            cursor = page['next_cursor']
+        self.assertEqual(titles, ['Job 2', 'Job 1', 'Job 0'])
+
+    def test_filters(self):
+        page = self.client.get(self.url, {'search': 'Job 3'}).json()
+        self.assertEqual([job['title'] for job in page['jobs']], ['Job 3'])
+        self.assertIsNone(page['next_cursor'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': '!!'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Invalid cursor'})
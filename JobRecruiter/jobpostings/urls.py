@@ -5,6 +5,7 @@ app_name = 'jobpostings'
 
 urlpatterns = [
 	path('', views.job_list_view, name='list'),
+	path('page/', views.job_list_page_view, name='list_page'),
 	path('create/', views.job_create_view, name='create'),
 	path('<int:job_id>/', views.job_detail_view, name='detail'),
 	path('<int:job_id>/edit/', views.job_edit_view, name='edit'),
@@ -12,10 +13,16 @@ urlpatterns = [
     path('<int:job_id>/applicants/', views.view_applicants, name='view_applicants'),
     path('<int:job_id>/recommendations/', views.candidate_recommendations_view, name='candidate_recommendations'),
     path('<int:job_id>/pipeline/', views.pipeline_view, name='pipeline'),
+    path('<int:job_id>/broadcast/', views.broadcast_view, name='broadcast'),
 	path('<int:job_id>/apply/', views.apply_to_job_view, name='apply'),
 	path('map/', views.job_map_view, name='map'),
+	path('map/markers/', views.job_map_markers_view, name='map_markers'),
     path('applicant-map/', views.applicant_map_view, name='applicant_map'),
+    path('applicant-map/buckets/', views.applicant_map_buckets_view, name='applicant_map_buckets'),
+    path('applicant-map/bucket/', views.applicant_map_bucket_view, name='applicant_map_bucket'),
     path('my-applications/', views.job_seeker_applications, name='job_seeker_applications'),
+    path('alerts/', views.job_alerts_view, name='job_alerts'),
+    path('alerts/<int:alert_id>/delete/', views.delete_job_alert_view, name='delete_job_alert'),
     path('my-posted-jobs/', views.my_posted_jobs, name='my_posted_jobs'),
     path('application/<int:app_id>/move/', views.move_application_stage, name='move_application_stage'),
     # AJAX endpoints for pipeline management
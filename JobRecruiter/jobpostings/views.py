@@ -1,79 +1,47 @@
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
 from django.contrib import messages
 from django.urls import reverse
-from django.db.models import Q
+from django.db.models import Q, Count, Min, Max
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
 import json
+import math
+import re
 from accounts.models import Profile, JobSeekerProfile, EmployerProfile
-from .models import JobPosting, Application, PipelineStage
-from .forms import JobPostingForm, ApplicationForm
-
-US_STATE_NAMES = {
-    "AL": "Alabama",
-    "AK": "Alaska",
-    "AZ": "Arizona",
-    "AR": "Arkansas",
-    "CA": "California",
-    "CO": "Colorado",
-    "CT": "Connecticut",
-    "DE": "Delaware",
-    "FL": "Florida",
-    "GA": "Georgia",
-    "HI": "Hawaii",
-    "ID": "Idaho",
-    "IL": "Illinois",
-    "IN": "Indiana",
-    "IA": "Iowa",
-    "KS": "Kansas",
-    "KY": "Kentucky",
-    "LA": "Louisiana",
-    "ME": "Maine",
-    "MD": "Maryland",
-    "MA": "Massachusetts",
-    "MI": "Michigan",
-    "MN": "Minnesota",
-    "MS": "Mississippi",
-    "MO": "Missouri",
-    "MT": "Montana",
-    "NE": "Nebraska",
-    "NV": "Nevada",
-    "NH": "New Hampshire",
-    "NJ": "New Jersey",
-    "NM": "New Mexico",
-    "NY": "New York",
-    "NC": "North Carolina",
-    "ND": "North Dakota",
-    "OH": "Ohio",
-    "OK": "Oklahoma",
-    "OR": "Oregon",
-    "PA": "Pennsylvania",
-    "RI": "Rhode Island",
-    "SC": "South Carolina",
-    "SD": "South Dakota",
-    "TN": "Tennessee",
-    "TX": "Texas",
-    "UT": "Utah",
-    "VT": "Vermont",
-    "VA": "Virginia",
-    "WA": "Washington",
-    "WV": "West Virginia",
-    "WI": "Wisconsin",
-    "WY": "Wyoming",
-}
-
-
-def get_state_full_name(state_value: str) -> str:
-    if not state_value:
-        return ''
-    state_value = state_value.strip()
-    if len(state_value) == 2:
-        return US_STATE_NAMES.get(state_value.upper(), state_value)
-    return state_value
+from .models import JobPosting, Application, PipelineStage, JobAlert, CandidateSkill
+from .forms import JobPostingForm, ApplicationForm, JobAlertForm, BroadcastForm
+from .broadcasts import EMAIL, PLACEHOLDERS, broadcast_to_stage
+from .recommendations import get_job_recommendations
+from .scoring import candidate_matrix
+from .search import search_jobs
+from .pagination import keyset_page, InvalidCursor
+from .geocoding import geocode
+from .spatial import GEOHASH_ALPHABET, GEOHASH_LENGTH, within_radius
+from .map_clusters import get_cell_features, get_map_features, job_feature
+from .applicant_heatmap import (
+    BUCKET_MODES, applicant_detail, filter_bucket, get_applicant_buckets, get_mapped_applications,
+)
+
+# Maximum number of candidates shown on the recommendations page
+CANDIDATE_RECOMMENDATION_LIMIT = 50
+
+# Number of jobs per page on the job list and its infinite scroll endpoint
+JOB_LIST_PAGE_SIZE = 20
+
+# Radius options (in miles) for the "jobs near" filter
+JOB_RADIUS_CHOICES = (5, 10, 25, 50, 100)
+
+# Request parameters that filter the jobs on the map, used as the marker cache key
+JOB_MAP_FILTER_PARAMS = ('search', 'location', 'employment_type', 'near', 'radius')
+
+# Number of applicants listed at a time for a bucket on the applicant map
+APPLICANT_MAP_PAGE_SIZE = 25
+
 
 @login_required
 def my_posted_jobs(request):
@@ -93,37 +61,35 @@ def my_posted_jobs(request):
     # 3. Render the new template we are about to create
     return render(request, 'jobpostings/my_posted_jobs.html', context)
 
-def extract_skills(text):
-    """Extract skills from text, returning a set of normalized skill strings."""
-    if not text:
-        return set()
-    import re
-    delimiters = r'[,;\n|/]'
-    skills = re.split(delimiters, text.lower())
-    normalized_skills = set()
-    for skill in skills:
-        skill = skill.strip()
-        skill = re.sub(r'^(skills?|proficient in|experience with|knowledge of|familiar with):?\s*', '', skill, flags=re.IGNORECASE)
-        skill = skill.strip('.,;()[]{}')
-        if skill and len(skill) > 1:
-            normalized_skills.add(skill)
-    return normalized_skills
 
+def get_radius_filter(request):
+    """
+    Return (latitude, longitude, radius) for the "within N miles of" filter in
+    the request's near and radius parameters, or None when it isn't set or the
+    place can't be found.
+    """
+    near = request.GET.get('near', '').strip()
+    try:
+        radius = float(request.GET.get('radius', ''))
+    except ValueError:
+        return None
+    if not near or radius <= 0:
+        return None
+    # The map's "use my location" button sends coordinates
+    point = re.fullmatch(r'(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)', near)
+    if point and abs(float(point.group(1))) <= 90 and abs(float(point.group(2))) <= 180:
+        return float(point.group(1)), float(point.group(2)), radius
+    coordinates = geocode([near, f"{near}, USA"])
+    if coordinates is None:
+        return None
+    return coordinates[0], coordinates[1], radius
 
-def job_list_view(request):
-    jobs = JobPosting.objects.filter(is_active=True)
-    search_query = request.GET.get('search', '')
-    location_filter = request.GET.get('location', '')
-    employment_type_filter = request.GET.get('employment_type', '')
-    
+
+def filter_jobs(jobs, search_query, location_filter, employment_type_filter, radius_filter=None):
+    """Apply the job list search, location, radius and employment type filters."""
     if search_query:
-        jobs = jobs.filter(
-            Q(title__icontains=search_query) |
-            Q(company_name__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(benefits__icontains=search_query)
-        )
-    
+        jobs = search_jobs(jobs, search_query)
+
     if location_filter:
         jobs = jobs.filter(
             Q(city__icontains=location_filter) |
@@ -131,52 +97,114 @@ def job_list_view(request):
             Q(city__icontains=location_filter.split(',')[0].strip()) |
             Q(state__icontains=location_filter.split(',')[1].strip() if ',' in location_filter else '')
         )
-    
+
     if employment_type_filter:
         jobs = jobs.filter(employment_type=employment_type_filter)
+
+    if radius_filter:
+        jobs = within_radius(jobs, *radius_filter)
+
+    return jobs
+
+
+def get_job_list_ordering(jobs, sort=''):
+    """
+    Keyset ordering for the job list: nearest first when asked for and a
+    radius filter is applied, by relevance when the search backend ranked the
+    results, otherwise newest first. Always ends in a unique field.
+    """
+    if sort == 'distance' and 'distance' in jobs.query.annotations:
+        return ('distance', '-id')
+    if 'search_rank' in jobs.query.annotations:
+        return ('search_rank', '-created_at', '-id')
+    return ('-created_at', '-id')
+
+
+def job_list_view(request):
+    search_query = request.GET.get('search', '')
+    location_filter = request.GET.get('location', '')
+    employment_type_filter = request.GET.get('employment_type', '')
+    near = request.GET.get('near', '')
+    radius = request.GET.get('radius', '')
+    sort = request.GET.get('sort', '')
+    radius_filter = get_radius_filter(request)
+    
+    jobs = filter_jobs(
+        JobPosting.objects.filter(is_active=True),
+        search_query, location_filter, employment_type_filter, radius_filter,
+    )
+    
+    # Render only the first page, the rest is loaded through job_list_page_view
+    jobs, next_cursor = keyset_page(jobs, get_job_list_ordering(jobs, sort), page_size=JOB_LIST_PAGE_SIZE)
     
     # Get recommended jobs for job seekers
     recommended_jobs = []
     if request.user.is_authenticated and hasattr(request, 'profile') and request.profile and request.profile.account_type == 'jobseeker':
-        try:
-            jobseeker_profile = request.profile.jobseekerprofile
-            user_skills_text = f"{jobseeker_profile.technical_skills or ''} {jobseeker_profile.soft_skills or ''}"
-            user_skills = extract_skills(user_skills_text)
-            
-            if user_skills:
-                # Get jobs user hasn't applied to
-                applied_job_ids = Application.objects.filter(applicant=request.user).values_list('job_posting_id', flat=True)
-                available_jobs = JobPosting.objects.filter(is_active=True).exclude(id__in=applied_job_ids)
-                
-                # Check each job for skill matches
-                for job in available_jobs:
-                    if job.required_skills:
-                        job_skills = extract_skills(job.required_skills)
-                        matching_skills = user_skills.intersection(job_skills)
-                        if matching_skills:  # At least one match
-                            recommended_jobs.append({
-                                'job': job,
-                                'matching_skills': sorted(matching_skills),
-                                'match_count': len(matching_skills)
-                            })
-                
-                # Sort by number of matching skills (most matches first)
-                recommended_jobs.sort(key=lambda x: x['match_count'], reverse=True)
-        except:
-            pass
+        for recommendation in get_job_recommendations(request.user):
+            recommended_jobs.append({
+                'job': recommendation.job_posting,
+                'matching_skills': recommendation.get_matching_skills(),
+                'match_count': recommendation.match_count,
+            })
     
     context = {
         'jobs': jobs,
+        'next_cursor': next_cursor,
         'recommended_jobs': recommended_jobs,
         'search_query': search_query,
         'location_filter': location_filter,
         'employment_type_filter': employment_type_filter,
         'employment_types': JobPosting.EMPLOYMENT_TYPE_CHOICES,
+        'near': near,
+        'radius': radius,
+        'sort': sort,
+        'radius_choices': JOB_RADIUS_CHOICES,
+        'near_not_found': bool(near.strip() and radius and radius_filter is None),
     }
     
     return render(request, 'jobpostings/job_list.html', context)
 
 
+def job_list_page_view(request):
+    """
+    JSON endpoint returning the next page of the job list for infinite scroll.
+    Takes the same filters as job_list_view plus the cursor of the last page.
+    """
+    jobs = filter_jobs(
+        JobPosting.objects.filter(is_active=True),
+        request.GET.get('search', ''),
+        request.GET.get('location', ''),
+        request.GET.get('employment_type', ''),
+        get_radius_filter(request),
+    )
+    try:
+        jobs, next_cursor = keyset_page(
+            jobs, get_job_list_ordering(jobs, request.GET.get('sort', '')),
+            cursor=request.GET.get('cursor'), page_size=JOB_LIST_PAGE_SIZE,
+        )
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    
+    html = render_to_string('jobpostings/job_list_items.html', {'jobs': jobs}, request=request)
+    return JsonResponse({
+        'jobs': [
+            {
+                'id': job.id,
+                'title': job.title,
+                'company': job.company_name,
+                'location': job.location_display(),
+                'pay_range': job.pay_range_display(),
+                'created_at': job.created_at.isoformat(),
+                'distance': getattr(job, 'distance', None),
+                'url': reverse('jobpostings:detail', args=[job.id]),
+            }
+            for job in jobs
+        ],
+        'html': html,
+        'next_cursor': next_cursor,
+    })
+
+
 def job_detail_view(request, job_id: int):
     job = get_object_or_404(JobPosting, id=job_id, is_active=True)
     
@@ -330,91 +358,156 @@ def job_seeker_applications(request):
     }
     return render(request, 'jobpostings/jobseekersjobs.html', context)
 
+
+@login_required
+def job_alerts_view(request):
+    """
+    Lets a job seeker create job alerts and see their existing ones. The form
+    starts from the job list's filters when it links here.
+    """
+    if not request.profile or request.profile.account_type != 'jobseeker':
+        messages.error(request, 'Only job seekers can create job alerts.')
+        return redirect('home.index')
+    
+    if request.method == 'POST':
+        form = JobAlertForm(request.POST)
+        if form.is_valid():
+            alert = form.save(commit=False)
+            alert.seeker = request.user
+            alert.save()
+            messages.success(request, f"Job alert '{alert.name}' has been saved!")
+            return redirect('jobpostings:job_alerts')
+    else:
+        form = JobAlertForm(initial={
+            'keywords': request.GET.get('search', ''),
+            'location': request.GET.get('location', ''),
+            'employment_type': request.GET.get('employment_type', ''),
+        })
+    
+    context = {
+        'form': form,
+        'alerts': JobAlert.objects.filter(seeker=request.user),
+    }
+    return render(request, 'jobpostings/job_alerts.html', context)
+
+
+@login_required
+@require_http_methods(["POST"])
+def delete_job_alert_view(request, alert_id):
+    alert = get_object_or_404(JobAlert, id=alert_id, seeker=request.user)
+    alert.delete()
+    messages.success(request, 'Job alert deleted.')
+    return redirect('jobpostings:job_alerts')
+
+
 def job_map_view(request):
     """
     Display an interactive map where users can search for jobs by location.
+    The markers are loaded for the visible area through job_map_markers_view.
     """
     # Get search parameters
     search_query = request.GET.get('search', '')
     location_filter = request.GET.get('location', '')
     employment_type_filter = request.GET.get('employment_type', '')
     job_id = request.GET.get('job_id', '')
+    radius_filter = get_radius_filter(request)
     
-    # Get all active jobs
-    jobs = JobPosting.objects.filter(is_active=True)
-    
-    # Apply filters
-    if search_query:
-        jobs = jobs.filter(
-            Q(title__icontains=search_query) |
-            Q(company_name__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(benefits__icontains=search_query)
-        )
+    # Get all active jobs matching the filters
+    jobs = filter_jobs(
+        JobPosting.objects.filter(is_active=True),
+        search_query, location_filter, employment_type_filter, radius_filter,
+    )
+    total_jobs = jobs.count()
     
-    if location_filter:
-        jobs = jobs.filter(
-            Q(city__icontains=location_filter) |
-            Q(state__icontains=location_filter) |
-            Q(city__icontains=location_filter.split(',')[0].strip()) |
-            Q(state__icontains=location_filter.split(',')[1].strip() if ',' in location_filter else '')
-        )
+    # Fit the map to the matching jobs when there's nothing else to center on
+    result_bounds = None
+    bounds = jobs.order_by().aggregate(
+        south=Min('latitude'), west=Min('longitude'), north=Max('latitude'), east=Max('longitude'),
+    )
+    if bounds['south'] is not None:
+        result_bounds = [[bounds['south'], bounds['west']], [bounds['north'], bounds['east']]]
     
-    if employment_type_filter:
-        jobs = jobs.filter(employment_type=employment_type_filter)
+    # The side panel lists the first page, nearest first for a radius search
+    sort = 'distance' if radius_filter else ''
+    job_page, _ = keyset_page(jobs, get_job_list_ordering(jobs, sort), page_size=JOB_LIST_PAGE_SIZE)
     
-    # Prepare job data for the map
-    job_markers = []
     highlighted_job = None
-    for job in jobs:
-        # Check if this is the highlighted job
-        is_highlighted = job_id and str(job.id) == str(job_id)
-        if is_highlighted:
-            highlighted_job = job
-
-        display_location = job.full_address()
-        state_value = job.state.strip() if job.state else ''
-        state_full = get_state_full_name(state_value)
-        geocode_parts = [job.address, job.city, state_full or state_value]
-        if state_value or state_full:
-            geocode_parts.append('USA')
-        geocode_query = ", ".join(part for part in geocode_parts if part) or display_location
-            
-        job_markers.append({
-            'id': job.id,
-            'title': job.title,
-            'company': job.company_name,
-            'location': job.location_display(),
-            'pay_range': job.pay_range_display(),
-            'address': job.address,
-            'geocode_query': geocode_query,
-            'display_location': display_location,
-            'state': state_value,
-            'state_full': state_full,
-            'employment_type': job.get_employment_type_display(),
-            'url': reverse('jobpostings:detail', args=[job.id]),
-            'description': job.description[:100] + '...' if len(job.description) > 100 else job.description,
-            'is_highlighted': is_highlighted,
-        })
+    highlighted_marker = None
+    if job_id:
+        highlighted_job = JobPosting.objects.filter(id=job_id, is_active=True).first() if job_id.isdigit() else None
+        if highlighted_job and highlighted_job.latitude is not None:
+            highlighted_marker = job_feature(highlighted_job)
     
+    # Center the map on the radius search's origin, or the searched location
+    # when it can be geocoded
+    if radius_filter:
+        map_center = radius_filter[:2]
+    else:
+        map_center = geocode([f"{location_filter}, USA"]) if location_filter else None
+
     context = {
-        'jobs': jobs,
-        'job_markers': job_markers,
+        'jobs': job_page,
+        'total_jobs': total_jobs,
+        'result_bounds': result_bounds,
+        'highlighted_marker': highlighted_marker,
+        'map_center': map_center,
+        'radius_miles': radius_filter[2] if radius_filter else None,
         'search_query': search_query,
         'location_filter': location_filter,
         'employment_type_filter': employment_type_filter,
         'employment_types': JobPosting.EMPLOYMENT_TYPE_CHOICES,
         'highlighted_job': highlighted_job,
         'job_id': job_id,
+        'near': request.GET.get('near', ''),
+        'radius': request.GET.get('radius', ''),
     }
     
     return render(request, 'jobpostings/job_map.html', context)
 
+
+def job_map_markers_view(request):
+    """
+    GeoJSON endpoint with the clustered job markers inside the map's viewport.
+    Takes the job map's filters plus bbox (west,south,east,north) and zoom, or
+    cell to list the jobs in a cluster that can't be split any further.
+    """
+    jobs = filter_jobs(
+        JobPosting.objects.filter(is_active=True),
+        request.GET.get('search', ''),
+        request.GET.get('location', ''),
+        request.GET.get('employment_type', ''),
+        get_radius_filter(request),
+    )
+    
+    cell = request.GET.get('cell', '')
+    if cell:
+        if not re.fullmatch(f'[{GEOHASH_ALPHABET}]{{1,{GEOHASH_LENGTH}}}', cell):
+            return JsonResponse({'error': 'Invalid cell'}, status=400)
+        return JsonResponse(get_cell_features(jobs, cell))
+    
+    try:
+        west, south, east, north = (float(value) for value in request.GET.get('bbox', '').split(','))
+        zoom = int(request.GET.get('zoom', ''))
+    except ValueError:
+        return JsonResponse({'error': 'bbox and zoom are required'}, status=400)
+    # float() also accepts nan and inf, which no tile can be computed for
+    if not all(math.isfinite(value) for value in (west, south, east, north)):
+        return JsonResponse({'error': 'bbox and zoom must be finite numbers'}, status=400)
+    # Leaflet reports longitudes past +/-180 when the world wraps around
+    bbox = (max(south, -90.0), max(west, -180.0), min(north, 90.0), min(east, 180.0))
+    
+    filter_key = '&'.join(f"{name}={request.GET.get(name, '')}" for name in JOB_MAP_FILTER_PARAMS)
+    return JsonResponse(get_map_features(jobs, bbox, zoom, filter_key))
+
+
 @login_required
 def applicant_map_view(request):
     """
-    Display an interactive map showing locations of applicants who applied to the employer's jobs.
-    Only shows applicants who have location sharing enabled and have a location set.
+    Display an interactive map of where the applicants to the employer's jobs
+    are, as counts per area, city or state. The counts are loaded through
+    applicant_map_buckets_view and the applicants in a bucket through
+    applicant_map_bucket_view when the employer opens it.
+    Only applicants who share their location with recruiters are included.
     """
     # Security Check 1: Ensure the user is an employer
     if not request.user.profile or request.user.profile.account_type != 'employer':
@@ -423,195 +516,127 @@ def applicant_map_view(request):
     
     # Get filter parameters
     job_id = request.GET.get('job_id', '')
+    stage_id = request.GET.get('stage_id', '')
+    mode = request.GET.get('mode', 'grid')
     applicant_id = request.GET.get('applicant_id', '')
     
-    # Get all jobs posted by this employer
-    employer_jobs = JobPosting.objects.filter(posted_by=request.user, is_active=True)
-    
-    # Filter by specific job if requested
-    if job_id:
-        try:
-            employer_jobs = employer_jobs.filter(id=int(job_id))
-        except ValueError:
-            pass
+    applications = get_mapped_applications(request.user, job_id, stage_id)
+    applicants_with_locations = applications.values('applicant').distinct().count()
     
-    # Get all applications for these jobs
-    applications = Application.objects.filter(job_posting__in=employer_jobs).select_related(
-        'applicant', 'applicant__profile', 'applicant__profile__jobseekerprofile', 'job_posting', 'pipeline_stage'
+    # Fit the map to the applicants
+    map_bounds = None
+    bounds = applications.order_by().aggregate(
+        south=Min('applicant__profile__jobseekerprofile__latitude'),
+        west=Min('applicant__profile__jobseekerprofile__longitude'),
+        north=Max('applicant__profile__jobseekerprofile__latitude'),
+        east=Max('applicant__profile__jobseekerprofile__longitude'),
     )
+    if bounds['south'] is not None:
+        map_bounds = [[bounds['south'], bounds['west']], [bounds['north'], bounds['east']]]
     
-    # Filter to only applicants with location sharing enabled and location set
-    applicant_markers = []
+    # Check if an applicant should be highlighted
     highlighted_applicant = None
-    
-    for application in applications:
-        try:
-            # Check if applicant has a jobseeker profile
-            if not application.applicant.profile or application.applicant.profile.account_type != 'jobseeker':
-                continue
-            
-            try:
-                jobseeker_profile = application.applicant.profile.jobseekerprofile
-            except JobSeekerProfile.DoesNotExist:
-                continue
-            
-            # Check privacy setting and location availability
-            if not jobseeker_profile.show_location_to_recruiters:
-                continue
-            
-            # Check if applicant has any location information
-            if not jobseeker_profile.has_location():
-                continue
-            
-            # Get location display string
-            location_display = jobseeker_profile.get_location_display()
-            if not location_display:
-                continue
-            
-            # Check if this is the highlighted applicant
-            is_highlighted = applicant_id and str(application.applicant.id) == str(applicant_id)
-            if is_highlighted:
-                highlighted_applicant = application
-            
-            # Get applicant name
-            applicant_name = application.get_applicant_name()
-            
-            # Prepare multiple geocode query candidates for better address matching
-            # This handles various formats: full addresses, city/state, city only, etc.
-            geocode_candidates = []
-            
-            # Get cleaned field values
-            address = jobseeker_profile.address.strip() if jobseeker_profile.address and jobseeker_profile.address.strip() else None
-            city = jobseeker_profile.city.strip() if jobseeker_profile.city and jobseeker_profile.city.strip() else None
-            state = jobseeker_profile.state.strip() if jobseeker_profile.state and jobseeker_profile.state.strip() else None
-            
-            # Get state variations (abbreviation and full name)
-            state_variations = []
-            if state:
-                state_variations.append(state)
-                state_full = get_state_full_name(state)
-                if state_full and state_full != state:
-                    state_variations.append(state_full)
-            # Ensure we always have at least one state variation if state exists
-            if state and len(state_variations) == 0:
-                state_variations.append(state)
-            
-            # Build candidates in order of specificity (most specific first)
-            # Always include fallbacks to less specific options in case detailed addresses fail
-            
-            # 1. Full address with city and state (most specific)
-            if address and city and state:
-                # Try different address formats - Nominatim can be picky about format
-                for state_var in state_variations:
-                    # Format 1: Standard "address, city, state"
-                    full_address = f"{address}, {city}, {state_var}"
-                    geocode_candidates.append(full_address)
-                    geocode_candidates.append(f"{full_address}, USA")
-                    
-                    # Format 2: Try reversed order "city, state, address" (sometimes works better)
-                    reversed_address = f"{city}, {state_var}, {address}"
-                    geocode_candidates.append(reversed_address)
-                    geocode_candidates.append(f"{reversed_address}, USA")
-                
-                # Fallback: city and state if full address fails (try all state variations)
-                for state_var in state_variations:
-                    city_state = f"{city}, {state_var}"
-                    geocode_candidates.append(city_state)
-                    geocode_candidates.append(f"{city_state}, USA")
-                    geocode_candidates.append(f"{city_state}, United States")
-            
-            # 2. Address with city only
-            elif address and city and not state:
-                geocode_candidates.append(f"{address}, {city}")
-                geocode_candidates.append(f"{address}, {city}, USA")
-                # Fallback: city only
-                geocode_candidates.append(city)
-                geocode_candidates.append(f"{city}, USA")
-            
-            # 3. Address with state only
-            elif address and state and not city:
-                for state_var in state_variations:
-                    geocode_candidates.append(f"{address}, {state_var}")
-                    geocode_candidates.append(f"{address}, {state_var}, USA")
-                # Fallback: state only (try all variations)
-                for state_var in state_variations:
-                    geocode_candidates.append(state_var)
-                    geocode_candidates.append(f"{state_var}, USA")
-            
-            # 4. Address only
-            elif address and not city and not state:
-                geocode_candidates.append(address)
-                geocode_candidates.append(f"{address}, USA")
-            
-            # 5. City and state (no address)
-            elif city and state and not address:
-                for state_var in state_variations:
-                    city_state = f"{city}, {state_var}"
-                    geocode_candidates.append(city_state)
-                    geocode_candidates.append(f"{city_state}, USA")
-                    geocode_candidates.append(f"{city_state}, United States")
-            
-            # 6. City only
-            elif city and not state and not address:
-                geocode_candidates.append(city)
-                geocode_candidates.append(f"{city}, USA")
-            
-            # 7. State only (least specific, but still try)
-            elif state and not city and not address:
-                for state_var in state_variations:
-                    geocode_candidates.append(state_var)
-                    geocode_candidates.append(f"{state_var}, USA")
-            
-            # Remove duplicates while preserving order
-            seen = set()
-            unique_candidates = []
-            for candidate in geocode_candidates:
-                if candidate and candidate.strip() and candidate not in seen:
-                    seen.add(candidate)
-                    unique_candidates.append(candidate.strip())
-            
-            # Get pipeline stage info
-            pipeline_stage_name = application.pipeline_stage.name if application.pipeline_stage else 'Unassigned'
-            pipeline_stage_color = application.pipeline_stage.color if application.pipeline_stage else '#6B7280'
-            
-            applicant_markers.append({
-                'id': application.applicant.id,
-                'application_id': application.id,
-                'name': applicant_name,
-                'email': application.get_applicant_email(),
-                'location': location_display,
-                'geocode_candidates': unique_candidates,
-                'geocode_query': unique_candidates[0] if unique_candidates else location_display,  # Keep for backward compatibility
-                'job_title': application.job_posting.title,
-                'company': application.job_posting.company_name,
-                'applied_at': application.applied_at.strftime('%Y-%m-%d'),
-                'pipeline_stage': pipeline_stage_name,
-                'pipeline_stage_color': pipeline_stage_color,
-                'profile_url': reverse('accounts.public_profile', args=[application.applicant.id]),
-                'application_url': reverse('jobpostings:view_applicants', args=[application.job_posting.id]),
-                'is_highlighted': is_highlighted,
-            })
-        except (AttributeError, JobSeekerProfile.DoesNotExist):
-            continue
+    if applicant_id.isdigit():
+        application = applications.filter(applicant_id=int(applicant_id)).select_related(
+            'applicant', 'applicant__profile', 'applicant__profile__jobseekerprofile', 'job_posting', 'pipeline_stage'
+        ).first()
+        if application:
+            highlighted_applicant = applicant_detail(application)
     
     # Get all jobs for the filter dropdown
-    all_employer_jobs = JobPosting.objects.filter(posted_by=request.user, is_active=True).order_by('-created_at')
+    all_employer_jobs = JobPosting.objects.filter(posted_by=request.user, is_active=True).annotate(
+        application_count=Count('applications')
+    ).order_by('-created_at')
     
-    # Debug: Count total applications
-    total_applications = Application.objects.filter(job_posting__in=employer_jobs).count()
+    # Count total applications, with or without a location
+    total_applications = Application.objects.filter(job_posting__in=all_employer_jobs)
+    if job_id.isdigit():
+        total_applications = total_applications.filter(job_posting_id=int(job_id))
     
     context = {
-        'applicant_markers': applicant_markers,
         'employer_jobs': all_employer_jobs,
+        'pipeline_stages': PipelineStage.objects.all(),
+        'bucket_modes': BUCKET_MODES,
         'selected_job_id': job_id,
+        'selected_stage_id': stage_id,
+        'selected_mode': mode,
         'applicant_id': applicant_id,
         'highlighted_applicant': highlighted_applicant,
-        'total_applications': total_applications,
-        'applicants_with_locations': len(applicant_markers),
+        'map_bounds': map_bounds,
+        'total_applications': total_applications.count(),
+        'applicants_with_locations': applicants_with_locations,
     }
     
     return render(request, 'jobpostings/applicant_map.html', context)
 
+
+@login_required
+def applicant_map_buckets_view(request):
+    """
+    GeoJSON endpoint with the number of applicants per bucket for the
+    applicant map. Takes job_id, stage_id and mode (grid, city or state);
+    the grid mode also needs the map's bbox (west,south,east,north) and zoom.
+    """
+    if not request.user.profile or request.user.profile.account_type != 'employer':
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    
+    mode = request.GET.get('mode', 'grid')
+    if mode not in dict(BUCKET_MODES):
+        return JsonResponse({'error': 'Invalid mode'}, status=400)
+    
+    bbox = zoom = None
+    if mode == 'grid':
+        try:
+            west, south, east, north = (float(value) for value in request.GET.get('bbox', '').split(','))
+            zoom = int(request.GET.get('zoom', ''))
+        except ValueError:
+            return JsonResponse({'error': 'bbox and zoom are required'}, status=400)
+        if not all(math.isfinite(value) for value in (west, south, east, north)):
+            return JsonResponse({'error': 'bbox and zoom must be finite numbers'}, status=400)
+        bbox = (max(south, -90.0), max(west, -180.0), min(north, 90.0), min(east, 180.0))
+    
+    applications = get_mapped_applications(
+        request.user, request.GET.get('job_id', ''), request.GET.get('stage_id', ''),
+    )
+    return JsonResponse(get_applicant_buckets(applications, mode, bbox, zoom))
+
+
+@login_required
+def applicant_map_bucket_view(request):
+    """
+    JSON endpoint listing the applicants in one bucket of the applicant map,
+    a page at a time. Takes the map's filters, the bucket's cell, city and/or
+    state and the cursor of the last page.
+    """
+    if not request.user.profile or request.user.profile.account_type != 'employer':
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    
+    cell = request.GET.get('cell', '')
+    if cell and not re.fullmatch(f'[{GEOHASH_ALPHABET}]{{1,{GEOHASH_LENGTH}}}', cell):
+        return JsonResponse({'error': 'Invalid cell'}, status=400)
+    
+    applications = get_mapped_applications(
+        request.user, request.GET.get('job_id', ''), request.GET.get('stage_id', ''),
+    )
+    applications = filter_bucket(
+        applications, cell, request.GET.get('city'), request.GET.get('state'),
+    ).select_related(
+        'applicant', 'applicant__profile', 'applicant__profile__jobseekerprofile', 'job_posting', 'pipeline_stage'
+    )
+    try:
+        applications, next_cursor = keyset_page(
+            applications, ('-applied_at', '-id'),
+            cursor=request.GET.get('cursor'), page_size=APPLICANT_MAP_PAGE_SIZE,
+        )
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    
+    return JsonResponse({
+        'applicants': [applicant_detail(application) for application in applications],
+        'next_cursor': next_cursor,
+    })
+
+
 @login_required
 def view_applicants(request, job_id):
     # 1. Get the job post, ensuring it exists
@@ -711,6 +736,56 @@ def pipeline_view(request, job_id):
     return render(request, 'jobpostings/pipeline.html', context)
 
 
+@login_required
+def broadcast_view(request, job_id):
+    """
+    Send one message or email, with per-applicant placeholders, to every
+    applicant of a job in a pipeline stage.
+    """
+    job = get_object_or_404(JobPosting, id=job_id)
+
+    # Security Check 1: Ensure the user is an employer
+    if not request.user.profile or request.user.profile.account_type != 'employer':
+        messages.error(request, 'You do not have permission to view this page.')
+        return redirect('home.index')
+
+    # Security Check 2: Ensure the employer owns this job posting
+    if job.posted_by != request.user:
+        messages.error(request, 'This is not your job posting.')
+        return redirect('jobpostings:my_posted_jobs')
+
+    if request.method == 'POST':
+        form = BroadcastForm(request.POST)
+        if form.is_valid():
+            channel = form.cleaned_data['channel']
+            stage = form.cleaned_data['stage']
+            if channel == EMAIL and not request.user.email:
+                messages.warning(request, "You need to add an email address to your account before you can send emails.")
+                return redirect('accounts.add_email')
+
+            sent, skipped = broadcast_to_stage(
+                request.user, job, stage, channel,
+                form.cleaned_data['body'], form.cleaned_data['subject'],
+            )
+            if not sent and not skipped:
+                messages.info(request, f"There are no applicants in {stage.name}.")
+            else:
+                noun = 'email' if channel == EMAIL else 'message'
+                messages.success(request, f"Sent your {noun} to {sent} applicant{'s' if sent != 1 else ''} in {stage.name}.")
+                if skipped:
+                    messages.warning(request, f"{skipped} applicant{'s' if skipped != 1 else ''} without an email address {'were' if skipped != 1 else 'was'} skipped.")
+            return redirect('jobpostings:pipeline', job_id=job.id)
+    else:
+        form = BroadcastForm(initial={'stage': request.GET.get('stage')})
+
+    context = {
+        'job': job,
+        'form': form,
+        'placeholders': PLACEHOLDERS,
+    }
+    return render(request, 'jobpostings/broadcast.html', context)
+
+
 @login_required
 @require_http_methods(["POST"])
 @csrf_exempt
@@ -852,8 +927,9 @@ def candidate_recommendations_view(request, job_id):
         messages.error(request, 'This is not your job posting.')
         return redirect('jobpostings:my_posted_jobs')
     
-    # Extract required skills from the job posting
-    job_skills = extract_skills(job.required_skills) if job.required_skills else set()
+    # Read the job's required skills from the skill index
+    job_skill_links = list(job.skill_links.values_list('skill_id', 'skill__name'))
+    job_skills = {name for _, name in job_skill_links}
     
     # If no skills specified, return empty recommendations
     if not job_skills:
@@ -862,61 +938,81 @@ def candidate_recommendations_view(request, job_id):
             'recommended_candidates': [],
             'job_skills': [],
             'total_candidates_analyzed': 0,
+            'total_matching_candidates': 0,
         }
         return render(request, 'jobpostings/candidate_recommendations.html', context)
     
-    # Get all job seekers who have profiles
-    all_jobseekers = User.objects.filter(
-        profile__account_type='jobseeker'
-    ).select_related('profile', 'profile__jobseekerprofile')
-    
     # Get IDs of candidates who already applied
     applied_candidate_ids = Application.objects.filter(
         job_posting=job
     ).values_list('applicant_id', flat=True)
     
-    # Filter out candidates who already applied
-    available_candidates = all_jobseekers.exclude(id__in=applied_candidate_ids)
+    # Count job seekers who haven't applied yet
+    total_candidates_analyzed = User.objects.filter(
+        profile__account_type='jobseeker'
+    ).exclude(id__in=applied_candidate_ids).count()
+    
+    # Read the top of the job's precomputed talent pool
+    talent_pool = job.talent_pool.exclude(candidate_id__in=applied_candidate_ids)
+    total_matching_candidates = talent_pool.count()
+    if total_matching_candidates:
+        matches = [
+            (entry.candidate, entry.match_count, entry.score, entry.get_matching_skills())
+            for entry in talent_pool.select_related(
+                'candidate', 'candidate__profile', 'candidate__profile__jobseekerprofile'
+            ).order_by('-score', '-match_count', 'candidate_id')[:CANDIDATE_RECOMMENDATION_LIMIT]
+        ]
+    else:
+        # No pool has been built for the job yet, so score every candidate
+        # against its skills in memory and load only the top K
+        job_skill_ids = [skill_id for skill_id, _ in job_skill_links]
+        candidate_matches, total_matching_candidates = candidate_matrix.score(
+            job_skill_ids,
+            exclude=applied_candidate_ids,
+            limit=CANDIDATE_RECOMMENDATION_LIMIT,
+        )
+        candidates_by_id = User.objects.select_related(
+            'profile', 'profile__jobseekerprofile'
+        ).in_bulk([candidate_id for candidate_id, _ in candidate_matches])
+        matching_skills = {}
+        for candidate_id, skill_name in CandidateSkill.objects.filter(
+            candidate_id__in=candidates_by_id, skill_id__in=job_skill_ids
+        ).values_list('candidate_id', 'skill__name'):
+            matching_skills.setdefault(candidate_id, []).append(skill_name)
+        matches = [
+            (
+                candidates_by_id[candidate_id],
+                match_count,
+                (match_count / len(job_skills)) * 100,
+                sorted(matching_skills.get(candidate_id, [])),
+            )
+            for candidate_id, match_count in candidate_matches
+            if candidate_id in candidates_by_id
+        ]
     
-    # Calculate recommendations
+    # Build recommendations (already sorted by match score)
     recommended_candidates = []
-    for candidate in available_candidates:
+    for candidate, match_count, match_score, candidate_matching_skills in matches:
         try:
             jobseeker_profile = candidate.profile.jobseekerprofile
         except (Profile.DoesNotExist, JobSeekerProfile.DoesNotExist):
             continue
         
-        # Get candidate's skills
-        candidate_skills_text = f"{jobseeker_profile.technical_skills or ''} {jobseeker_profile.soft_skills or ''}"
-        candidate_skills = extract_skills(candidate_skills_text)
-        
-        if not candidate_skills:
-            continue
-        
-        # Find matching skills
-        matching_skills = job_skills.intersection(candidate_skills)
-        
-        if matching_skills:  # At least one match
-            # Calculate match score as percentage
-            match_score = (len(matching_skills) / len(job_skills)) * 100
-            
-            recommended_candidates.append({
-                'candidate': candidate,
-                'profile': jobseeker_profile,
-                'matching_skills': sorted(matching_skills),
-                'match_count': len(matching_skills),
-                'match_score': match_score,
-                'total_job_skills': len(job_skills),
-            })
-    
-    # Sort by match score (highest first), then by number of matching skills
-    recommended_candidates.sort(key=lambda x: (x['match_score'], x['match_count']), reverse=True)
+        recommended_candidates.append({
+            'candidate': candidate,
+            'profile': jobseeker_profile,
+            'matching_skills': candidate_matching_skills,
+            'match_count': match_count,
+            'match_score': match_score,
+            'total_job_skills': len(job_skills),
+        })
     
     context = {
         'job': job,
         'recommended_candidates': recommended_candidates,
         'job_skills': sorted(job_skills),
-        'total_candidates_analyzed': len(available_candidates),
+        'total_candidates_analyzed': total_candidates_analyzed,
+        'total_matching_candidates': total_matching_candidates,
     }
     
     return render(request, 'jobpostings/candidate_recommendations.html', context)
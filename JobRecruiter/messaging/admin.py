@@ -16,8 +16,8 @@ class ConversationAdmin(admin.ModelAdmin):
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
-    list_display = ['id', 'conversation', 'sender', 'content_preview', 'timestamp', 'is_read']
-    list_filter = ['is_read', 'timestamp', 'conversation']
+    list_display = ['id', 'conversation', 'sender', 'content_preview', 'timestamp']
+    list_filter = ['timestamp', 'conversation']
     search_fields = ['content', 'sender__username']
     readonly_fields = ['timestamp']
     
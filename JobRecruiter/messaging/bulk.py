@@ -0,0 +1,62 @@
+"""
+Sending messages and emails to many users at once.
+
+Everything is written in bulk: the direct conversations are found by their
+pair keys and the missing ones created together
+(Conversation.get_or_create_direct_many), then the messages and emails are
+each created with one bulk_create. bulk_create skips the model signals, so
+the unread counters, search index and event streams are updated here
+instead.
+
+Emails are only queued; the outbox worker (messaging/outbox.py) delivers
+them in batches over a shared connection.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .events import conversation_changed
+from .models import Conversation, EmailMessage, Message
+from .search import index_emails, index_messages
+from .unread import count_new_messages
+
+
+def send_messages_in_bulk(sender, contents, now=None):
+    """
+    Send a message from sender to each of many users, from {user id: text},
+    in their direct conversations. Returns the new messages.
+    """
+    if not contents:
+        return []
+    now = now or timezone.now()
+    with transaction.atomic():
+        conversations = Conversation.get_or_create_direct_many(sender, list(contents))
+        new_messages = Message.objects.bulk_create([
+            Message(conversation_id=conversations[user_id], sender=sender, content=content)
+            for user_id, content in contents.items()
+        ])
+        count_new_messages(new_messages)
+        index_messages(new_messages)
+        Conversation.objects.filter(id__in=conversations.values()).update(updated_at=now)
+        for conversation_id in conversations.values():
+            conversation_changed(conversation_id)
+    return new_messages
+
+
+def queue_emails_in_bulk(sender, emails, now=None):
+    """
+    Queue an email from sender to each of many users, from
+    {user id: (subject, body)}, for the outbox worker. Returns the new emails.
+    """
+    if not emails:
+        return []
+    now = now or timezone.now()
+    with transaction.atomic():
+        new_emails = EmailMessage.objects.bulk_create([
+            EmailMessage(
+                sender=sender, recipient_id=user_id, subject=subject, body=body,
+                status='queued', next_attempt_at=now,
+            )
+            for user_id, (subject, body) in emails.items()
+        ])
+        index_emails(new_emails)
+    return new_emails
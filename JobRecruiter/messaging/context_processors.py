@@ -1,4 +1,4 @@
-from .models import Message
+from .unread import get_unread_count
 
 
 def unread_message_count(request):
@@ -6,9 +6,6 @@ def unread_message_count(request):
     Add unread message count to template context.
     """
     if request.user.is_authenticated:
-        unread_count = Message.objects.filter(
-            conversation__participants=request.user,
-            is_read=False
-        ).exclude(sender=request.user).count()
-        return {'unread_message_count': unread_count}
+        # Read from the user's unread counter rather than counting messages
+        return {'unread_message_count': get_unread_count(request.user)}
     return {'unread_message_count': 0}
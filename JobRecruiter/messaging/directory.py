@@ -0,0 +1,152 @@
+"""
+The user directory behind the "Start a Conversation" list and the recipient
+search of the email composer.
+
+Each user has a UserDirectoryEntry with what those pages show (display
+name, account type, company and title) and a search key: their names,
+username, email, company, job title and industry, ASCII-folded and
+lowercased. The words of the search key are also stored as
+UserDirectoryTerm rows, an inverted index searched by prefix with range
+lookups, so finding "jo sm" among many users is an index scan per word
+rather than a substring match over every user and profile.
+
+Entries are kept up to date from the User and profile signals in
+messaging/signals.py. The rebuild_user_directory management command
+rebuilds them all should they ever drift.
+"""
+import unicodedata
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .models import UserDirectoryEntry, UserDirectoryTerm
+
+TERM_MAX_LENGTH = 100
+
+# Entries written per bulk_create when rebuilding the directory
+REBUILD_BATCH_SIZE = 500
+
+
+# Lowercases ASCII letters and turns everything but letters and digits into spaces
+_NORMALIZE_TABLE = {
+    code: chr(code).lower() if chr(code).isalnum() else ' ' for code in range(128)
+}
+
+
+def normalize(text):
+    """ASCII-fold and lowercase text, keeping only its letters and digits."""
+    text = text or ''
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode()
+    return ' '.join(text.translate(_NORMALIZE_TABLE).split())
+
+
+def get_display_name(profile):
+    """
+    Get the display name for a user based on their profile type.
+    """
+    if profile.account_type == 'jobseeker':
+        try:
+            jobseeker_profile = profile.jobseekerprofile
+            return jobseeker_profile.full_name or profile.user.username
+        except ObjectDoesNotExist:
+            return profile.user.username
+    elif profile.account_type == 'employer':
+        try:
+            employer_profile = profile.employerprofile
+            return employer_profile.company_name or profile.user.username
+        except ObjectDoesNotExist:
+            return profile.user.username
+    else:
+        return profile.user.username
+
+
+def describe_user(user):
+    """The directory entry fields of a user, from their User and profile rows."""
+    values = {
+        'username': user.username,
+        'display_name': user.username,
+        'account_type': '',
+        'company': '',
+        'title': '',
+    }
+    searched = [user.username, user.first_name, user.last_name, user.email]
+    try:
+        profile = user.profile
+    except ObjectDoesNotExist:
+        profile = None
+    if profile:
+        values['display_name'] = get_display_name(profile)
+        values['account_type'] = profile.account_type
+        try:
+            if profile.account_type == 'jobseeker':
+                jobseeker_profile = profile.jobseekerprofile
+                values['company'] = jobseeker_profile.company
+                values['title'] = jobseeker_profile.current_job
+                searched += [jobseeker_profile.full_name, jobseeker_profile.preferred_name]
+            elif profile.account_type == 'employer':
+                employer_profile = profile.employerprofile
+                values['company'] = employer_profile.company_name
+                searched.append(employer_profile.industry)
+        except ObjectDoesNotExist:
+            pass
+    searched += [values['company'], values['title']]
+    values['search_key'] = normalize(' '.join(text for text in searched if text))
+    return values
+
+
+def get_terms(search_key):
+    """The distinct words of a search key, as stored in the prefix index."""
+    return list(dict.fromkeys(word[:TERM_MAX_LENGTH] for word in search_key.split()))
+
+
+def update_directory(user_ids):
+    """Write the directory entries of some users, dropping those of users that are gone."""
+    user_ids = set(user_ids)
+    users = list(
+        User.objects.filter(id__in=user_ids)
+        .select_related('profile__jobseekerprofile', 'profile__employerprofile')
+    )
+    entries = [UserDirectoryEntry(user_id=user.id, **describe_user(user)) for user in users]
+    with transaction.atomic():
+        UserDirectoryEntry.objects.filter(user_id__in=user_ids - {user.id for user in users}).delete()
+        UserDirectoryEntry.objects.bulk_create(
+            entries,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['username', 'display_name', 'account_type', 'company', 'title', 'search_key', 'updated_at'],
+        )
+        UserDirectoryTerm.objects.filter(entry_id__in=user_ids).delete()
+        UserDirectoryTerm.objects.bulk_create([
+            UserDirectoryTerm(entry_id=entry.user_id, term=term)
+            for entry in entries
+            for term in get_terms(entry.search_key)
+        ])
+
+
+def rebuild_user_directory():
+    """Rewrite every directory entry. Returns the number of entries."""
+    user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+    with transaction.atomic():
+        UserDirectoryEntry.objects.exclude(user_id__in=User.objects.values('id')).delete()
+        for start in range(0, len(user_ids), REBUILD_BATCH_SIZE):
+            update_directory(user_ids[start:start + REBUILD_BATCH_SIZE])
+    return len(user_ids)
+
+
+def search_directory(query, exclude_user=None):
+    """
+    The directory entries matching a search query: every word of the query
+    has to start a word of the entry's search key.
+    """
+    entries = UserDirectoryEntry.objects.all()
+    if exclude_user is not None:
+        entries = entries.exclude(user=exclude_user)
+    for word in get_terms(normalize(query)):
+        # '~' sorts after every character of a normalized term
+        entries = entries.filter(Exists(UserDirectoryTerm.objects.filter(
+            entry=OuterRef('pk'), term__gte=word, term__lte=word + '~',
+        )))
+    return entries
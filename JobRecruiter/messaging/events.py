@@ -0,0 +1,95 @@
+"""
+Live conversation updates as server-sent events.
+
+An open conversation keeps one event stream (messaging.views.conversation_events)
+open instead of reloading the page. The stream sends each new message as a
+`message` event and the other participant's read watermark as a `read`
+event whenever it moves (the read receipt). Everything it sends is read
+from the database, so a stream can always pick up where it left off: the
+event id is the id of the last message sent and the read watermark, which
+EventSource hands back as Last-Event-ID when it reconnects.
+
+Streams don't poll the database continuously. They wait on a broker, which
+is told when a conversation changes (a message is sent or someone reads it)
+and wakes up the streams of that conversation. The broker is named by the
+MESSAGING_EVENT_BROKER setting. The default LocalBroker only knows about
+changes made by its own process, so streams also check the database every
+MESSAGING_EVENT_POLL_SECONDS to notice changes made by other processes, such
+as the management commands sending CareerifyBot digests. A broker shared between
+processes (Redis pub/sub, PostgreSQL LISTEN/NOTIFY, ...) only needs the
+same publish() and wait() methods.
+
+Under an ASGI server (JobRecruiter/asgi.py) the stream stays open for up to
+MAX_STREAM_SECONDS and an open stream costs a coroutine rather than a worker
+thread. A WSGI server (runserver, or JobRecruiter/wsgi.py) can't hold many
+streams open, so there each request sends only what is new and ends, and
+EventSource reconnects every MESSAGING_EVENT_POLL_SECONDS.
+"""
+import asyncio
+import json
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# Streams end after this long and EventSource reconnects, so a stream never
+# outlives a deploy by much and dropped clients are noticed
+MAX_STREAM_SECONDS = 5 * 60
+
+
+class LocalBroker:
+    """
+    Wakes up the streams of this process when a conversation changes in
+    this process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # {conversation id: {(event loop, asyncio.Event)}}
+        self._waiters = {}
+
+    def publish(self, conversation_id):
+        """Tell the streams of a conversation that it changed. Safe to call from any thread."""
+        with self._lock:
+            waiters = list(self._waiters.get(conversation_id, ()))
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    async def wait(self, conversation_id, timeout):
+        """Wait until a conversation changes or the timeout passes."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters.setdefault(conversation_id, set()).add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(conversation_id)
+                waiters.discard(waiter)
+                if not waiters:
+                    del self._waiters[conversation_id]
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    """The broker named by the MESSAGING_EVENT_BROKER setting."""
+    return import_string(getattr(settings, 'MESSAGING_EVENT_BROKER', 'messaging.events.LocalBroker'))()
+
+
+def conversation_changed(conversation_id):
+    """Wake up the streams of a conversation once the current transaction commits."""
+    transaction.on_commit(lambda: get_broker().publish(conversation_id))
+
+
+def format_event(event, data, event_id=None):
+    """One server-sent event, with its data as JSON."""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
@@ -0,0 +1,91 @@
+"""
+The inbox, built from a fixed number of queries however many conversations
+a user has.
+
+A page of conversations comes from one query, ordered by their last activity
+(Conversation.updated_at, bumped whenever a message is sent) and annotated
+with the unread count past the user's read watermark and the id of the
+latest message, both found through the (conversation, id) message index.
+The other participants and the latest messages of the page are then loaded
+with one query each. Pages are keyset paginated, so a user with thousands of
+conversations (CareerifyBot digests included) gets their first page as fast
+as anyone else.
+
+Searching the inbox matches the other participant's name and, through the
+message search index (messaging/search.py), the content of the messages.
+"""
+from django.db.models import Exists, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Substr
+
+from jobpostings.pagination import keyset_page
+from .models import Conversation, ConversationMembership, Message
+from .search import MESSAGE, search_messages
+from .unread import annotate_unread_counts
+
+INBOX_ORDERING = ('-updated_at', '-id')
+
+# Best matching messages looked at when searching the inbox
+SEARCH_HIT_LIMIT = 500
+
+# Characters of the latest message loaded for its preview
+SNIPPET_LENGTH = 100
+
+
+def get_inbox_conversations(user, search_query='', search_hits=()):
+    """
+    The user's conversations, annotated for the inbox but not yet loaded.
+    search_hits are the ids of the conversations whose messages match the
+    search query.
+    """
+    conversations = Conversation.objects.filter(participants=user)
+    if search_query:
+        # Conversations with someone of that name, or with messages matching it in the search index
+        name_match = ConversationMembership.objects.filter(conversation=OuterRef('pk')).exclude(user=user).filter(
+            Q(user__username__icontains=search_query) |
+            Q(user__first_name__icontains=search_query) |
+            Q(user__last_name__icontains=search_query)
+        )
+        conversations = conversations.filter(Q(Exists(name_match)) | Q(id__in=search_hits))
+
+    latest_message = Message.objects.filter(conversation=OuterRef('pk')).order_by('-id').values('id')[:1]
+    conversations = annotate_unread_counts(conversations, user).annotate(
+        latest_message_id=Subquery(latest_message)
+    )
+    return conversations.prefetch_related(
+        Prefetch(
+            'memberships',
+            queryset=ConversationMembership.objects.exclude(user=user).select_related('user'),
+            to_attr='other_memberships',
+        )
+    )
+
+
+def get_inbox_page(user, search_query='', cursor=None, page_size=20):
+    """
+    Return (conversations, next_cursor) for one page of the inbox. Each
+    conversation has unread_count, other_participant and latest_message
+    (with a snippet of its content) set, plus search_snippet when searching.
+    Raises InvalidCursor for a bad cursor.
+    """
+    # The best matching message of each conversation, for its snippet
+    snippets = {}
+    if search_query:
+        for hit in search_messages(user, search_query, kind=MESSAGE, limit=SEARCH_HIT_LIMIT):
+            snippets.setdefault(hit.conversation_id, hit.snippet)
+    
+    conversations, next_cursor = keyset_page(
+        get_inbox_conversations(user, search_query, list(snippets)), INBOX_ORDERING,
+        cursor=cursor, page_size=page_size,
+    )
+    latest_messages = (
+        Message.objects.annotate(snippet=Substr('content', 1, SNIPPET_LENGTH))
+        .only('id', 'timestamp', 'sender_id')
+        .in_bulk([conversation.latest_message_id for conversation in conversations if conversation.latest_message_id])
+    )
+    for conversation in conversations:
+        conversation.other_participant = (
+            conversation.other_memberships[0].user if conversation.other_memberships else None
+        )
+        conversation.latest_message = latest_messages.get(conversation.latest_message_id)
+        conversation.search_snippet = snippets.get(conversation.id)
+    return conversations, next_cursor
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from messaging.directory import rebuild_user_directory
+from messaging.typeahead import directory_rebuilt
+
+
+class Command(BaseCommand):
+    help = "Rebuild the user directory used to list and search the users to message"
+
+    def handle(self, *args, **options):
+        count = rebuild_user_directory()
+        directory_rebuilt()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Listed {count} user{"s" if count != 1 else ""} in the directory.')
+        )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from messaging.unread import repair_unread_counters
+
+
+class Command(BaseCommand):
+    help = "Recount every user's unread messages and fix the unread counters that drifted"
+
+    def handle(self, *args, **options):
+        fixed = repair_unread_counters()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Fixed {fixed} unread counter{"s" if fixed != 1 else ""}.')
+        )
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from messaging.outbox import BATCH_SIZE, send_queued_emails
+
+
+class Command(BaseCommand):
+    help = "Deliver the emails waiting in the outbox, retrying failed ones with backoff"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Emails sent over one connection to the mail server',
+        )
+        parser.add_argument(
+            '--loop', type=int, metavar='SECONDS', default=0,
+            help='Keep running, checking the outbox every SECONDS seconds',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed, retrying = send_queued_emails(batch_size=options['batch_size'])
+            if sent or failed or retrying or not options['loop']:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f'Sent {sent} email{"s" if sent != 1 else ""}, {failed} failed, {retrying} to retry.'
+                    )
+                )
+            if not options['loop']:
+                return
+            time.sleep(options['loop'])
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Q
+
+
+def fill_unread_counters(apps, schema_editor):
+    Message = apps.get_model('messaging', 'Message')
+    UnreadCounter = apps.get_model('messaging', 'UnreadCounter')
+    counts = (
+        Message.objects.filter(is_read=False)
+        .annotate(recipient=F('conversation__participants'))
+        .filter(~Q(recipient=F('sender')))
+        .values('recipient')
+        .annotate(unread=Count('id'))
+        .values_list('recipient', 'unread')
+    )
+    UnreadCounter.objects.bulk_create(
+        [UnreadCounter(user_id=user_id, count=count) for user_id, count in counts],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('messaging', '0002_emailmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='unread_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(fill_unread_counters, migrations.RunPython.noop),
+    ]
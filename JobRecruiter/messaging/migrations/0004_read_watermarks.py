@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def convert_read_flags(apps, schema_editor):
+    """
+    Set each member's watermark just below the first message from the others
+    they haven't read, or at the latest message if they've read them all.
+    """
+    Message = apps.get_model('messaging', 'Message')
+    ConversationMembership = apps.get_model('messaging', 'ConversationMembership')
+    first_unread = (
+        Message.objects.filter(conversation=OuterRef('conversation'), is_read=False)
+        .exclude(sender=OuterRef('user'))
+        .order_by('id')
+        .values('id')[:1]
+    )
+    latest = Message.objects.filter(conversation=OuterRef('conversation')).order_by('-id').values('id')[:1]
+    ConversationMembership.objects.update(
+        last_read_message_id=Coalesce(Subquery(first_unread) - 1, Subquery(latest), Value(0))
+    )
+
+
+def restore_read_flags(apps, schema_editor):
+    """Mark the messages every other member has read up to as read."""
+    Message = apps.get_model('messaging', 'Message')
+    ConversationMembership = apps.get_model('messaging', 'ConversationMembership')
+    unread_by = ConversationMembership.objects.filter(
+        conversation=OuterRef('conversation'), last_read_message_id__lt=OuterRef('id')
+    ).exclude(user=OuterRef('sender'))
+    Message.objects.filter(~Exists(unread_by)).update(is_read=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0003_unreadcounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # The participants table becomes the membership table, so only the
+        # migration state changes here
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ConversationMembership',
+                    fields=[
+                        ('id', models.AutoField(primary_key=True, serialize=False)),
+                        ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='messaging.conversation')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_memberships', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'messaging_conversation_participants',
+                        'unique_together': {('conversation', 'user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='conversation',
+                    name='participants',
+                    field=models.ManyToManyField(related_name='conversations', through='messaging.ConversationMembership', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='conversationmembership',
+            name='last_read_message_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(convert_read_flags, restore_read_flags),
+        migrations.RemoveField(
+            model_name='message',
+            name='is_read',
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'id'], name='message_conversation_id_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:08
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+
+
+def fill_pair_keys(apps, schema_editor):
+    """
+    Key the conversations between two users. Where the same two users have
+    more than one, the most recently active one gets the key.
+    """
+    Conversation = apps.get_model('messaging', 'Conversation')
+    ConversationMembership = apps.get_model('messaging', 'ConversationMembership')
+    pairs = (
+        ConversationMembership.objects.values('conversation')
+        .annotate(members=Count('id'), low=Min('user'), high=Max('user'))
+        .filter(members=2)
+        .values_list('conversation', 'low', 'high')
+    )
+    pair_keys = {conversation_id: f"{low}:{high}" for conversation_id, low, high in pairs}
+    keyed = {}
+    for conversation in Conversation.objects.filter(id__in=pair_keys).order_by('-updated_at', '-id'):
+        pair_key = pair_keys[conversation.id]
+        if pair_key not in keyed:
+            conversation.pair_key = pair_key
+            keyed[pair_key] = conversation
+    Conversation.objects.bulk_update(keyed.values(), ['pair_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0005_message_history_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='pair_key',
+            field=models.CharField(blank=True, max_length=41, null=True, unique=True),
+        ),
+        migrations.RunPython(fill_pair_keys, migrations.RunPython.noop),
+    ]
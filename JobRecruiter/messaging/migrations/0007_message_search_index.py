@@ -0,0 +1,78 @@
+from django.db import migrations
+
+
+# The search index as of this migration, copied from messaging/search.py so
+# later changes to the backends don't change what this migration does
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS messaging_search_fts USING fts5("
+    "owners, subject, body, kind UNINDEXED, object_id UNINDEXED, conversation_id UNINDEXED, "
+    "tokenize='porter unicode61')",
+    "DELETE FROM messaging_search_fts",
+    "INSERT INTO messaging_search_fts (rowid, kind, object_id, conversation_id, owners, subject, body) "
+    "SELECT m.id * 2, 'message', m.id, m.conversation_id, "
+    "(SELECT group_concat('u' || p.user_id, ' ') FROM messaging_conversation_participants p "
+    "WHERE p.conversation_id = m.conversation_id), '', m.content FROM messaging_message m",
+    "INSERT INTO messaging_search_fts (rowid, kind, object_id, conversation_id, owners, subject, body) "
+    "SELECT e.id * 2 + 1, 'email', e.id, NULL, "
+    "'u' || e.sender_id || CASE WHEN e.status = 'sent' THEN ' u' || e.recipient_id ELSE '' END, "
+    "e.subject, e.body FROM messaging_emailmessage e",
+]
+
+SQLITE_DROP = [
+    "DROP TABLE IF EXISTS messaging_search_fts",
+]
+
+POSTGRES_CREATE = [
+    "CREATE TABLE IF NOT EXISTS messaging_search ("
+    "doc_id bigint PRIMARY KEY, kind varchar(10) NOT NULL, object_id bigint NOT NULL, "
+    "conversation_id bigint, owners text[] NOT NULL, body text NOT NULL, document tsvector NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS messaging_search_document_idx "
+    "ON messaging_search USING GIN (document)",
+    "CREATE INDEX IF NOT EXISTS messaging_search_owners_idx "
+    "ON messaging_search USING GIN (owners)",
+    "DELETE FROM messaging_search",
+    "INSERT INTO messaging_search (doc_id, kind, object_id, conversation_id, owners, body, document) "
+    "SELECT m.id * 2, 'message', m.id, m.conversation_id, "
+    "ARRAY(SELECT 'u' || p.user_id FROM messaging_conversation_participants p "
+    "WHERE p.conversation_id = m.conversation_id), m.content, "
+    "setweight(to_tsvector('english', coalesce(NULL, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(m.content, '')), 'B') "
+    "FROM messaging_message m",
+    "INSERT INTO messaging_search (doc_id, kind, object_id, conversation_id, owners, body, document) "
+    "SELECT e.id * 2 + 1, 'email', e.id, NULL, "
+    "CASE WHEN e.status = 'sent' THEN ARRAY['u' || e.sender_id, 'u' || e.recipient_id] "
+    "ELSE ARRAY['u' || e.sender_id] END, e.body, "
+    "setweight(to_tsvector('english', coalesce(e.subject, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(e.body, '')), 'B') "
+    "FROM messaging_emailmessage e",
+]
+
+POSTGRES_DROP = [
+    "DROP TABLE IF EXISTS messaging_search",
+]
+
+# Other databases fall back to substring matching, which needs no index
+CREATE_SQL = {'sqlite': SQLITE_CREATE, 'postgresql': POSTGRES_CREATE}
+DROP_SQL = {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP}
+
+
+def create_search_index(apps, schema_editor):
+    for sql in CREATE_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    for sql in DROP_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0006_conversation_pair_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
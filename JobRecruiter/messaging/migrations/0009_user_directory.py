@@ -0,0 +1,121 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:16
+
+import unicodedata
+
+import django.db.models.deletion
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import migrations, models
+
+
+# A copy of messaging/directory.py as of this migration, so later changes
+# to it don't change what this migration does
+
+TERM_MAX_LENGTH = 100
+
+_NORMALIZE_TABLE = {
+    code: chr(code).lower() if chr(code).isalnum() else ' ' for code in range(128)
+}
+
+
+def normalize(text):
+    text = text or ''
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode()
+    return ' '.join(text.translate(_NORMALIZE_TABLE).split())
+
+
+def describe_user(user):
+    values = {
+        'username': user.username,
+        'display_name': user.username,
+        'account_type': '',
+        'company': '',
+        'title': '',
+    }
+    searched = [user.username, user.first_name, user.last_name, user.email]
+    try:
+        profile = user.profile
+    except ObjectDoesNotExist:
+        profile = None
+    if profile:
+        values['account_type'] = profile.account_type
+        try:
+            if profile.account_type == 'jobseeker':
+                jobseeker_profile = profile.jobseekerprofile
+                values['display_name'] = jobseeker_profile.full_name or user.username
+                values['company'] = jobseeker_profile.company
+                values['title'] = jobseeker_profile.current_job
+                searched += [jobseeker_profile.full_name, jobseeker_profile.preferred_name]
+            elif profile.account_type == 'employer':
+                employer_profile = profile.employerprofile
+                values['display_name'] = employer_profile.company_name or user.username
+                values['company'] = employer_profile.company_name
+                searched.append(employer_profile.industry)
+        except ObjectDoesNotExist:
+            pass
+    searched += [values['company'], values['title']]
+    values['search_key'] = normalize(' '.join(text for text in searched if text))
+    return values
+
+
+def get_terms(search_key):
+    return list(dict.fromkeys(word[:TERM_MAX_LENGTH] for word in search_key.split()))
+
+
+def fill_user_directory(apps, schema_editor):
+    """List every existing user in the directory."""
+    User = apps.get_model('auth', 'User')
+    UserDirectoryEntry = apps.get_model('messaging', 'UserDirectoryEntry')
+    UserDirectoryTerm = apps.get_model('messaging', 'UserDirectoryTerm')
+    entries = [
+        UserDirectoryEntry(user_id=user.id, **describe_user(user))
+        for user in User.objects.select_related('profile__jobseekerprofile', 'profile__employerprofile')
+    ]
+    UserDirectoryEntry.objects.bulk_create(entries, batch_size=500)
+    UserDirectoryTerm.objects.bulk_create([
+        UserDirectoryTerm(entry_id=entry.user_id, term=term)
+        for entry in entries
+        for term in get_terms(entry.search_key)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_savedsearchmatch'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('messaging', '0008_email_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDirectoryEntry',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='directory_entry', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('username', models.CharField(max_length=150)),
+                ('display_name', models.CharField(max_length=150)),
+                ('account_type', models.CharField(blank=True, max_length=10)),
+                ('company', models.CharField(blank=True, max_length=150)),
+                ('title', models.CharField(blank=True, max_length=100)),
+                ('search_key', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['username', 'user'], name='directory_username_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserDirectoryTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100)),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='messaging.userdirectoryentry')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'entry'], name='directory_term_entry_idx')],
+                'unique_together': {('entry', 'term')},
+            },
+        ),
+        migrations.RunPython(fill_user_directory, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -7,7 +7,10 @@ class Conversation(models.Model):
     """
     Represents a conversation between two users.
     """
-    participants = models.ManyToManyField(User, related_name='conversations')
+    participants = models.ManyToManyField(User, related_name='conversations', through='ConversationMembership')
+    # "<lower user id>:<higher user id>" for a direct conversation between two
+    # users, so there is only ever one and it's found with one indexed lookup
+    pair_key = models.CharField(max_length=41, null=True, blank=True, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -18,6 +21,50 @@ class Conversation(models.Model):
         participant_names = [p.username for p in self.participants.all()]
         return f"Conversation between {', '.join(participant_names)}"
     
+    @staticmethod
+    def make_pair_key(user_id, other_user_id):
+        """The pair_key of the direct conversation between two users."""
+        return f"{min(user_id, other_user_id)}:{max(user_id, other_user_id)}"
+    
+    @classmethod
+    def get_or_create_direct(cls, user, other_user):
+        """
+        Get the direct conversation between two users, creating it if there
+        is none yet. Returns (conversation, created). Two requests creating
+        the same conversation at once end up with the same one.
+        """
+        pair_key = cls.make_pair_key(user.id, other_user.id)
+        conversation = cls.objects.filter(pair_key=pair_key).first()
+        if conversation:
+            return conversation, False
+        with transaction.atomic():
+            conversation, created = cls.objects.get_or_create(pair_key=pair_key)
+            if created:
+                conversation.participants.add(user, other_user)
+        return conversation, created
+
+    @classmethod
+    def get_or_create_direct_many(cls, user, other_user_ids):
+        """
+        Return {other user id: conversation id} for the direct conversations
+        between a user and many others, creating the missing ones in bulk.
+        """
+        pair_keys = {cls.make_pair_key(user.id, other_user_id): other_user_id for other_user_id in other_user_ids}
+        conversations = dict(cls.objects.filter(pair_key__in=pair_keys).values_list('pair_key', 'id'))
+        missing = [pair_key for pair_key in pair_keys if pair_key not in conversations]
+        if missing:
+            with transaction.atomic():
+                # Conflicts are conversations created meanwhile by someone else
+                cls.objects.bulk_create([cls(pair_key=pair_key) for pair_key in missing], ignore_conflicts=True)
+                created = dict(cls.objects.filter(pair_key__in=missing).values_list('pair_key', 'id'))
+                ConversationMembership.objects.bulk_create([
+                    ConversationMembership(conversation_id=conversation_id, user_id=participant_id)
+                    for pair_key, conversation_id in created.items()
+                    for participant_id in (user.id, pair_keys[pair_key])
+                ], ignore_conflicts=True)
+            conversations.update(created)
+        return {pair_keys[pair_key]: conversation_id for pair_key, conversation_id in conversations.items()}
+
     def get_other_participant(self, user):
         """Get the other participant in the conversation"""
         return self.participants.exclude(id=user.id).first()
@@ -35,18 +82,39 @@ class Message(models.Model):
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
     content = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
-    is_read = models.BooleanField(default=False)
     
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # Counting the messages past a read watermark
+            models.Index(fields=['conversation', 'id'], name='message_conversation_id_idx'),
+            # Paging through a conversation's history
+            models.Index(fields=['conversation', 'timestamp'], name='message_conversation_time_idx'),
+        ]
     
     def __str__(self):
         return f"Message from {self.sender.username} at {self.timestamp}"
+
+
+class ConversationMembership(models.Model):
+    """
+    A user's place in a conversation, with how far they have read it: the
+    messages from the other participants with an id above
+    last_read_message_id are unread for them.
+    """
+    # The table (and integer primary key) of the former automatic participants table
+    id = models.AutoField(primary_key=True)
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='memberships')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversation_memberships')
+    # Not a foreign key, so deleting the last read message leaves the watermark in place
+    last_read_message_id = models.BigIntegerField(default=0)
     
-    def mark_as_read(self):
-        """Mark the message as read"""
-        self.is_read = True
-        self.save()
+    class Meta:
+        db_table = 'messaging_conversation_participants'
+        unique_together = ['conversation', 'user']
+    
+    def __str__(self):
+        return f"{self.user_id} in conversation {self.conversation_id}, read up to message {self.last_read_message_id}"
 
 
 class MessageNotification(models.Model):
@@ -65,12 +133,75 @@ class MessageNotification(models.Model):
         return f"{self.user.username} - {self.unread_count} unread messages"
 
 
+class UnreadCounter(models.Model):
+    """
+    The number of unread messages sent to a user, across all their
+    conversations. Kept up to date as messages are created and deleted and
+    as conversations are read (see messaging/unread.py) so the unread badge doesn't have to
+    count messages.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='unread_counter')
+    count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id} has {self.count} unread messages"
+
+
+class UserDirectoryEntry(models.Model):
+    """
+    A user as listed in the directory of people to message, copied from
+    their User and profile rows so listing and searching users doesn't load
+    each profile (see messaging/directory.py).
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='directory_entry')
+    username = models.CharField(max_length=150)
+    display_name = models.CharField(max_length=150)
+    account_type = models.CharField(max_length=10, blank=True)
+    company = models.CharField(max_length=150, blank=True)
+    title = models.CharField(max_length=100, blank=True)
+    # Everything the directory is searched on, ASCII-folded and lowercased
+    search_key = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Paging through the directory
+            models.Index(fields=['username', 'user'], name='directory_username_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.display_name} (@{self.username})"
+
+
+class UserDirectoryTerm(models.Model):
+    """
+    One word of a directory entry's search key. Together these rows are the
+    prefix index the directory is searched through.
+    """
+    entry = models.ForeignKey(UserDirectoryEntry, on_delete=models.CASCADE, related_name='terms')
+    term = models.CharField(max_length=100)
+
+    class Meta:
+        unique_together = ['entry', 'term']
+        indexes = [
+            models.Index(fields=['term', 'entry'], name='directory_term_entry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} for {self.entry_id}"
+
+
 class EmailMessage(models.Model):
     """
     Represents an email message sent between users.
+    
+    Sending an email queues it; the send_queued_emails management command
+    delivers the queue (see messaging/outbox.py).
     """
     STATUS_CHOICES = [
         ('draft', 'Draft'),
+        ('queued', 'Queued'),
         ('sent', 'Sent'),
         ('failed', 'Failed'),
     ]
@@ -83,9 +214,17 @@ class EmailMessage(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     sent_at = models.DateTimeField(null=True, blank=True)
     is_read = models.BooleanField(default=False)
+    # Delivery attempts, when a queued email is due to be tried (again) and why the last attempt failed
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    failure_reason = models.TextField(blank=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # The outbox: queued emails that are due
+            models.Index(fields=['status', 'next_attempt_at'], name='email_outbox_idx'),
+        ]
     
     def __str__(self):
         return f"Email: {self.subject} from {self.sender.username} to {self.recipient.username}"
@@ -95,25 +234,20 @@ class EmailMessage(models.Model):
         self.is_read = True
         self.save()
     
-    def send_email(self):
-        """Send the email and update status"""
-        from django.core.mail import send_mail
+    def queue(self):
+        """Queue the email for delivery by the outbox worker"""
+        self.status = 'queued'
+        self.attempts = 0
+        self.next_attempt_at = timezone.now()
+        self.failure_reason = ''
+        self.save()
+    
+    def build_mail(self):
+        """Build the outgoing mail, sent from the generic account with the sender's details in the body"""
+        from django.core.mail import EmailMessage as MailMessage
         from django.conf import settings
-        import logging
-        
-        logger = logging.getLogger(__name__)
         
-        try:
-            # Get recipient's email address
-            recipient_email = self.get_recipient_email()
-            if not recipient_email:
-                logger.error(f"No email address found for user {self.recipient.username}")
-                self.status = 'failed'
-                self.save()
-                return False
-            
-            # Create a more detailed email body with sender information
-            email_body = f"""
+        email_body = f"""
 Hello {self.recipient.username},
 
 You have received a new email from {self.sender.username} on JobRecruiter.
@@ -128,28 +262,13 @@ Message:
 This email was sent from JobRecruiter platform.
 If you have any questions, please contact our support team.
 """
-            
-            # Send the email using the system's generic email address
-            send_mail(
-                subject=f"[JobRecruiter] {self.subject}",
-                message=email_body,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[recipient_email],
-                fail_silently=False,
-            )
-            
-            logger.info(f"Email sent successfully to {recipient_email} from {self.sender.username}")
-            self.status = 'sent'
-            self.sent_at = timezone.now()
-            self.save()
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send email: {str(e)}")
-            self.status = 'failed'
-            self.save()
-            return False
+        return MailMessage(
+            subject=f"[JobRecruiter] {self.subject}",
+            body=email_body,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[self.get_recipient_email()],
+        )
     
     def get_recipient_email(self):
         """Get the recipient's email address from their Django User account"""
-        return self.recipient.email if self.recipient.email else None
\ No newline at end of file
+        return self.recipient.email if self.recipient.email else None
@@ -0,0 +1,144 @@
+"""
+The email outbox.
+
+Sending an email from the site only queues it (EmailMessage.queue), so the
+request doesn't wait on the mail server. The send_queued_emails management
+command delivers the queue in batches, over one connection to the mail
+server per batch (get_connection().send_messages), rather than one
+connection per email.
+
+An email that can't be delivered is tried again later (unless the mail
+server refused its recipient, or the recipient has no address), waiting
+EMAIL_OUTBOX_RETRY_SECONDS after the first failure and twice as long after
+each further one, until it has been tried EMAIL_OUTBOX_MAX_ATTEMPTS times
+and is marked failed. The reason of the last failure is kept on the email.
+
+Emails are claimed before they're sent by pushing their next attempt back,
+so several workers can run at once and an email claimed by a worker that
+dies is picked up again once the claim runs out.
+
+Delivery goes through the configured EMAIL_BACKEND, so pointing EMAIL_HOST
+and EMAIL_PORT at a local SMTP stand-in (or using the locmem backend in
+tests) exercises the real code path.
+"""
+import logging
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EmailMessage
+from .search import index_emails
+
+logger = logging.getLogger(__name__)
+
+# Emails sent per batch, over one connection
+BATCH_SIZE = 50
+# How long a worker has to send the emails it claimed
+CLAIM_TIMEOUT = timedelta(minutes=10)
+# Longest wait between two attempts
+MAX_RETRY_DELAY = timedelta(hours=6)
+
+
+def get_retry_delay(attempts):
+    """How long to wait before trying an email again after `attempts` failures."""
+    base = getattr(settings, 'EMAIL_OUTBOX_RETRY_SECONDS', 60)
+    return min(timedelta(seconds=base * 2 ** (attempts - 1)), MAX_RETRY_DELAY)
+
+
+def _claim_batch(now, batch_size):
+    with transaction.atomic():
+        batch = list(
+            EmailMessage.objects.select_for_update(skip_locked=True)
+            .filter(status='queued', next_attempt_at__lte=now)
+            .select_related('sender', 'recipient')
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        EmailMessage.objects.filter(id__in=[email.id for email in batch]).update(next_attempt_at=now + CLAIM_TIMEOUT)
+    return batch
+
+
+def _record_failure(email, reason, now, permanent=False):
+    email.attempts += 1
+    email.failure_reason = reason
+    max_attempts = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+    if permanent or email.attempts >= max_attempts:
+        email.status = 'failed'
+        email.next_attempt_at = None
+    else:
+        email.next_attempt_at = now + get_retry_delay(email.attempts)
+
+
+def send_batch(batch, now=None):
+    """
+    Deliver a batch of emails over one connection and record the outcome of
+    each. Returns (sent, failed) counts, where failed only counts emails
+    that won't be tried again.
+    """
+    now = now or timezone.now()
+    to_send = []
+    for email in batch:
+        if email.get_recipient_email():
+            to_send.append(email)
+        else:
+            _record_failure(email, f"{email.recipient.username} has no email address", now, permanent=True)
+
+    if to_send:
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as e:
+            logger.exception('Connecting to the mail server failed')
+            for email in to_send:
+                _record_failure(email, f"Could not connect to the mail server: {e}", now)
+        else:
+            try:
+                for email in to_send:
+                    try:
+                        # One email at a time, so a rejected recipient only fails its own email
+                        if connection.send_messages([email.build_mail()]):
+                            email.status = 'sent'
+                            email.sent_at = now
+                            email.next_attempt_at = None
+                            email.failure_reason = ''
+                        else:
+                            _record_failure(email, "The mail server did not accept the email", now)
+                    except Exception as e:
+                        logger.warning('Sending email %s failed: %s', email.id, e)
+                        # The mail server won't take a refused recipient on a later try either
+                        _record_failure(
+                            email, str(e) or e.__class__.__name__, now,
+                            permanent=isinstance(e, smtplib.SMTPRecipientsRefused),
+                        )
+            finally:
+                connection.close()
+
+    EmailMessage.objects.bulk_update(
+        batch, ['status', 'sent_at', 'attempts', 'next_attempt_at', 'failure_reason'],
+    )
+    # bulk_update skips the signal that lets recipients find sent emails in their search
+    index_emails([email for email in batch if email.status == 'sent'])
+    return (
+        sum(1 for email in batch if email.status == 'sent'),
+        sum(1 for email in batch if email.status == 'failed'),
+    )
+
+
+def send_queued_emails(batch_size=BATCH_SIZE, now=None):
+    """
+    Deliver every queued email that is due, a batch at a time. Returns
+    (sent, failed, retrying) counts.
+    """
+    sent = failed = retrying = 0
+    while True:
+        now_for_batch = now or timezone.now()
+        batch = _claim_batch(now_for_batch, batch_size)
+        if not batch:
+            return sent, failed, retrying
+        batch_sent, batch_failed = send_batch(batch, now_for_batch)
+        sent += batch_sent
+        failed += batch_failed
+        retrying += len(batch) - batch_sent - batch_failed
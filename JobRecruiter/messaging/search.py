@@ -0,0 +1,332 @@
+"""
+Full-text search over chat messages and emails.
+
+Both are kept in one search index, so a user's messages and emails are
+matched and ranked together by a single query. Every document lists the
+users who can see it as owner tokens ("u<user id>"): the participants of a
+message's conversation, and the sender of an email plus its recipient once
+it's sent. Searches are scoped to one owner through the index itself rather
+than by filtering the matches afterwards.
+
+Documents are keyed by message id * 2 for messages and email id * 2 + 1 for
+emails. The index is kept up to date from model signals, and by
+messaging/bulk.py and the outbox for the rows they write in bulk.
+
+As with the job search (jobpostings/search.py) there is an SQLite FTS5
+backend, a PostgreSQL tsvector backend and a basic icontains one, picked
+from the database engine unless the MESSAGE_SEARCH_BACKEND setting names
+one. Snippets use the same markers as job search snippets, so the
+search_snippet template filter highlights them.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from jobpostings.search import SNIPPET_END, SNIPPET_START, get_query_terms
+from .models import ConversationMembership, EmailMessage, Message
+
+MESSAGE = 'message'
+EMAIL = 'email'
+
+SearchHit = namedtuple('SearchHit', 'kind object_id conversation_id rank snippet')
+
+# A document: its key, kind, object id, conversation id, owner tokens, subject and body
+SearchDocument = namedtuple('SearchDocument', 'doc_id kind object_id conversation_id owners subject body')
+
+
+def get_doc_id(kind, object_id):
+    return object_id * 2 + (1 if kind == EMAIL else 0)
+
+
+def message_documents(messages):
+    """The search documents of some messages."""
+    owners = {}
+    for conversation_id, user_id in ConversationMembership.objects.filter(
+        conversation_id__in={message.conversation_id for message in messages}
+    ).values_list('conversation_id', 'user_id'):
+        owners.setdefault(conversation_id, []).append(f'u{user_id}')
+    return [
+        SearchDocument(
+            get_doc_id(MESSAGE, message.id), MESSAGE, message.id, message.conversation_id,
+            ' '.join(owners.get(message.conversation_id, [])), '', message.content,
+        )
+        for message in messages
+    ]
+
+
+def email_document(email):
+    """The search document of an email. Recipients only see sent emails."""
+    owners = [f'u{email.sender_id}']
+    if email.status == 'sent':
+        owners.append(f'u{email.recipient_id}')
+    return SearchDocument(get_doc_id(EMAIL, email.id), EMAIL, email.id, None, ' '.join(owners), email.subject, email.body)
+
+
+class BaseMessageSearchBackend:
+    table_name = 'messaging_search'
+
+    def create_index(self, schema_editor):
+        pass
+
+    def drop_index(self, schema_editor):
+        pass
+
+    def index(self, documents):
+        pass
+
+    def remove(self, doc_ids):
+        pass
+
+    def rebuild_sql(self):
+        return []
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            for sql in self.rebuild_sql():
+                cursor.execute(sql)
+
+    def search(self, user, query, kind=None, limit=50):
+        """Return up to `limit` SearchHits for a user's query, best first."""
+        raise NotImplementedError
+
+
+class BasicMessageSearchBackend(BaseMessageSearchBackend):
+    """
+    Substring matching with icontains. No index, ranking or snippets.
+    """
+
+    def search(self, user, query, kind=None, limit=50):
+        hits = []
+        if kind in (None, MESSAGE):
+            messages = Message.objects.filter(
+                conversation__participants=user, content__icontains=query
+            ).order_by('-id').values_list('id', 'conversation_id')[:limit]
+            hits += [SearchHit(MESSAGE, message_id, conversation_id, 0, None) for message_id, conversation_id in messages]
+        if kind in (None, EMAIL):
+            emails = EmailMessage.objects.filter(
+                Q(sender=user) | Q(recipient=user, status='sent'),
+                Q(subject__icontains=query) | Q(body__icontains=query),
+            ).order_by('-id').values_list('id', flat=True)[:limit]
+            hits += [SearchHit(EMAIL, email_id, None, 0, None) for email_id in emails]
+        return hits[:limit]
+
+
+class SQLiteMessageSearchBackend(BaseMessageSearchBackend):
+    """
+    SQLite FTS5 index using the porter stemmer, ranked with BM25.
+    """
+    table_name = 'messaging_search_fts'
+    # BM25 weights for owners (not part of the ranking), subject and body
+    column_weights = (0.0, 5.0, 1.0)
+
+    def create_index(self, schema_editor):
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table_name} USING fts5("
+            f"owners, subject, body, kind UNINDEXED, object_id UNINDEXED, conversation_id UNINDEXED, "
+            f"tokenize='porter unicode61')"
+        )
+        for sql in self.rebuild_sql():
+            schema_editor.execute(sql)
+
+    def drop_index(self, schema_editor):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {self.table_name}")
+
+    def index(self, documents):
+        if not documents:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {self.table_name} WHERE rowid = %s", [[document.doc_id] for document in documents]
+            )
+            cursor.executemany(
+                f"INSERT INTO {self.table_name} "
+                f"(rowid, kind, object_id, conversation_id, owners, subject, body) "
+                f"VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                [list(document) for document in documents],
+            )
+
+    def remove(self, doc_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table_name} WHERE rowid = %s", [[doc_id] for doc_id in doc_ids])
+
+    def rebuild_sql(self):
+        columns = 'rowid, kind, object_id, conversation_id, owners, subject, body'
+        return [
+            f"DELETE FROM {self.table_name}",
+            f"INSERT INTO {self.table_name} ({columns}) "
+            f"SELECT m.id * 2, '{MESSAGE}', m.id, m.conversation_id, "
+            f"(SELECT group_concat('u' || p.user_id, ' ') FROM messaging_conversation_participants p "
+            f"WHERE p.conversation_id = m.conversation_id), '', m.content FROM messaging_message m",
+            f"INSERT INTO {self.table_name} ({columns}) "
+            f"SELECT e.id * 2 + 1, '{EMAIL}', e.id, NULL, "
+            f"'u' || e.sender_id || CASE WHEN e.status = 'sent' THEN ' u' || e.recipient_id ELSE '' END, "
+            f"e.subject, e.body FROM messaging_emailmessage e",
+        ]
+
+    def build_match_expression(self, user, query):
+        terms = get_query_terms(query)
+        if not terms:
+            return None
+        # Quote every term so FTS5 operators in user input are taken literally,
+        # and allow the last term to match as a prefix while the user types.
+        quoted = [f'"{term}"' for term in terms]
+        quoted[-1] += '*'
+        return f'owners : "u{user.id}" AND {{subject body}} : ({" ".join(quoted)})'
+
+    def search(self, user, query, kind=None, limit=50):
+        match = self.build_match_expression(user, query)
+        if match is None:
+            return []
+        weights = ', '.join(str(weight) for weight in self.column_weights)
+        sql = (
+            f"SELECT kind, object_id, conversation_id, bm25({self.table_name}, {weights}) AS rank, "
+            f"snippet({self.table_name}, 2, %s, %s, '...', 16) "
+            f"FROM {self.table_name} WHERE {self.table_name} MATCH %s"
+        )
+        params = [SNIPPET_START, SNIPPET_END, match]
+        if kind:
+            sql += " AND kind = %s"
+            params.append(kind)
+        sql += " ORDER BY rank LIMIT %s"
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [SearchHit(*row) for row in cursor.fetchall()]
+
+
+class PostgresMessageSearchBackend(BaseMessageSearchBackend):
+    """
+    PostgreSQL tsvector index with GIN indexes on the document and the
+    owners, ranked with ts_rank_cd.
+    """
+    config = 'english'
+
+    def create_index(self, schema_editor):
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table_name} ("
+            f"doc_id bigint PRIMARY KEY, kind varchar(10) NOT NULL, object_id bigint NOT NULL, "
+            f"conversation_id bigint, owners text[] NOT NULL, body text NOT NULL, document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table_name}_document_idx "
+            f"ON {self.table_name} USING GIN (document)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table_name}_owners_idx "
+            f"ON {self.table_name} USING GIN (owners)"
+        )
+        for sql in self.rebuild_sql():
+            schema_editor.execute(sql)
+
+    def drop_index(self, schema_editor):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {self.table_name}")
+
+    def _document_sql(self, subject, body):
+        return (
+            f"setweight(to_tsvector('{self.config}', coalesce({subject}, '')), 'A') || "
+            f"setweight(to_tsvector('{self.config}', coalesce({body}, '')), 'B')"
+        )
+
+    def index(self, documents):
+        if not documents:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {self.table_name} "
+                f"(doc_id, kind, object_id, conversation_id, owners, body, document) "
+                f"VALUES (%s, %s, %s, %s, string_to_array(%s, ' '), %s, {self._document_sql('%s', '%s')}) "
+                f"ON CONFLICT (doc_id) DO UPDATE SET owners = EXCLUDED.owners, "
+                f"body = EXCLUDED.body, document = EXCLUDED.document",
+                [
+                    [document.doc_id, document.kind, document.object_id, document.conversation_id,
+                     document.owners, document.body, document.subject, document.body]
+                    for document in documents
+                ],
+            )
+
+    def remove(self, doc_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table_name} WHERE doc_id = ANY(%s)", [list(doc_ids)])
+
+    def rebuild_sql(self):
+        columns = 'doc_id, kind, object_id, conversation_id, owners, body, document'
+        return [
+            f"DELETE FROM {self.table_name}",
+            f"INSERT INTO {self.table_name} ({columns}) "
+            f"SELECT m.id * 2, '{MESSAGE}', m.id, m.conversation_id, "
+            f"ARRAY(SELECT 'u' || p.user_id FROM messaging_conversation_participants p "
+            f"WHERE p.conversation_id = m.conversation_id), m.content, {self._document_sql('NULL', 'm.content')} "
+            f"FROM messaging_message m",
+            f"INSERT INTO {self.table_name} ({columns}) "
+            f"SELECT e.id * 2 + 1, '{EMAIL}', e.id, NULL, "
+            f"CASE WHEN e.status = 'sent' THEN ARRAY['u' || e.sender_id, 'u' || e.recipient_id] "
+            f"ELSE ARRAY['u' || e.sender_id] END, e.body, {self._document_sql('e.subject', 'e.body')} "
+            f"FROM messaging_emailmessage e",
+        ]
+
+    def build_tsquery(self, query):
+        terms = get_query_terms(query)
+        if not terms:
+            return None
+        return ' & '.join(terms[:-1] + [f"{terms[-1]}:*"])
+
+    def search(self, user, query, kind=None, limit=50):
+        tsquery = self.build_tsquery(query)
+        if tsquery is None:
+            return []
+        to_tsquery = f"to_tsquery('{self.config}', %s)"
+        headline_options = f"StartSel={SNIPPET_START}, StopSel={SNIPPET_END}, MaxWords=30, MinWords=10"
+        sql = (
+            f"SELECT kind, object_id, conversation_id, -ts_rank_cd(document, {to_tsquery}) AS rank, "
+            f"ts_headline('{self.config}', body, {to_tsquery}, %s) "
+            f"FROM {self.table_name} WHERE owners @> ARRAY[%s] AND document @@ {to_tsquery}"
+        )
+        params = [tsquery, tsquery, headline_options, f'u{user.id}', tsquery]
+        if kind:
+            sql += " AND kind = %s"
+            params.append(kind)
+        sql += " ORDER BY rank LIMIT %s"
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [SearchHit(*row) for row in cursor.fetchall()]
+
+
+def get_message_search_backend(vendor=None):
+    """Return the configured message search backend for the default database."""
+    backend_path = getattr(settings, 'MESSAGE_SEARCH_BACKEND', None)
+    if backend_path:
+        return import_string(backend_path)()
+    vendor = vendor or connection.vendor
+    if vendor == 'sqlite':
+        return SQLiteMessageSearchBackend()
+    if vendor == 'postgresql':
+        return PostgresMessageSearchBackend()
+    return BasicMessageSearchBackend()
+
+
+def index_messages(messages):
+    get_message_search_backend().index(message_documents(messages))
+
+
+def index_email(email):
+    index_emails([email])
+
+
+def index_emails(emails):
+    get_message_search_backend().index([email_document(email) for email in emails])
+
+
+def remove_from_search_index(kind, object_id):
+    get_message_search_backend().remove([get_doc_id(kind, object_id)])
+
+
+def search_messages(user, query, kind=None, limit=50):
+    """
+    Search the messages and emails a user can see. Returns SearchHits, best
+    first, from a single query on the index.
+    """
+    return get_message_search_backend().search(user, query, kind=kind, limit=limit)
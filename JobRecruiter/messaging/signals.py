@@ -0,0 +1,95 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+# Import models
+from accounts.models import EmployerProfile, JobSeekerProfile, Profile
+from .models import EmailMessage, Message
+from .directory import update_directory
+from .typeahead import directory_changed
+from .events import conversation_changed
+from .search import EMAIL, MESSAGE, index_email, index_messages, remove_from_search_index
+from .unread import count_message_change
+
+
+@receiver(post_save, sender=Message)
+def count_new_message(sender, instance, created, **kwargs):
+    """
+    A new message is unread for the other members of its conversation, so
+    it goes on their unread counters, and goes out to the conversation's
+    open event streams.
+    """
+    if created:
+        count_message_change(instance, 1)
+        conversation_changed(instance.conversation_id)
+
+
+@receiver(pre_delete, sender=Message)
+def discount_deleted_message(sender, instance, **kwargs):
+    """
+    Before the delete, as deleting a conversation deletes its memberships
+    too, possibly before its messages.
+    """
+    count_message_change(instance, -1)
+
+
+@receiver(post_save, sender=Message)
+def update_message_search_index(sender, instance, **kwargs):
+    index_messages([instance])
+
+
+@receiver(post_delete, sender=Message)
+def remove_message_from_search_index(sender, instance, **kwargs):
+    remove_from_search_index(MESSAGE, instance.id)
+
+
+@receiver(post_save, sender=EmailMessage)
+def update_email_search_index(sender, instance, **kwargs):
+    index_email(instance)
+
+
+@receiver(post_delete, sender=EmailMessage)
+def remove_email_from_search_index(sender, instance, **kwargs):
+    remove_from_search_index(EMAIL, instance.id)
+
+
+def _update_directory(user_ids):
+    """Update the directory entries of some users, and the typeahead index with them."""
+    user_ids = list(user_ids)
+    update_directory(user_ids)
+    # Only once committed, as the typeahead's version bump must not be rolled back
+    transaction.on_commit(lambda: directory_changed(user_ids))
+
+
+@receiver(post_save, sender=User)
+def update_user_directory_entry(sender, instance, update_fields=None, **kwargs):
+    # Logging in only saves last_login, which the directory doesn't show
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    user_id = instance.id
+    transaction.on_commit(lambda: _update_directory([user_id]))
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def update_directory_entry_for_profile(sender, instance, **kwargs):
+    """
+    Profile changes show in the directory. Deleting a user deletes their
+    profile too, which is why entries are only updated after the commit:
+    by then the user (and their entry) is gone and there is nothing to update.
+    """
+    user_id = instance.user_id
+    transaction.on_commit(lambda: _update_directory([user_id]))
+
+
+@receiver(post_save, sender=JobSeekerProfile)
+@receiver(post_delete, sender=JobSeekerProfile)
+@receiver(post_save, sender=EmployerProfile)
+@receiver(post_delete, sender=EmployerProfile)
+def update_directory_entry_for_details(sender, instance, **kwargs):
+    # The profile may be deleted along with these details, in which case its own signal has it covered
+    profile_id = instance.profile_id
+    transaction.on_commit(
+        lambda: _update_directory(Profile.objects.filter(id=profile_id).values_list('user_id', flat=True))
+    )
@@ -1,3 +1,343 @@
-from django.test import TestCase
+import re
+import smtplib
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Profile
+from .bulk import send_messages_in_bulk
+from .models import Conversation, ConversationMembership, EmailMessage, Message, MessageNotification
+from .outbox import CLAIM_TIMEOUT, _claim_batch, get_retry_delay, send_queued_emails
+from .unread import (
+    annotate_read_state, annotate_unread_counts, get_unread_count, mark_conversation_read,
+    repair_unread_counters,
+)
+
+
+def make_user(username, account_type='employer'):
+    user = User.objects.create_user(username, f'{username}@example.com')
+    Profile.objects.create(user=user, account_type=account_type)
+    return user
+
+
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        self.alice = make_user('alice')
+        self.bob = make_user('bob', 'jobseeker')
+        self.conversation, _ = Conversation.get_or_create_direct(self.alice, self.bob)
+
+    def test_counts_are_current(self):
+        self.assertEqual(get_unread_count(self.bob), 0)
+        Message.objects.create(conversation=self.conversation, sender=self.alice, content='Hello')
+        self.assertEqual(get_unread_count(self.bob), 1)
+        self.assertEqual(get_unread_count(self.alice), 0)
+        mark_conversation_read(self.conversation, self.bob)
+        self.assertEqual(get_unread_count(self.bob), 0)
+
+    def test_deleted_message(self):
+        message = Message.objects.create(conversation=self.conversation, sender=self.alice, content='Hello')
+        message.delete()
+        self.assertEqual(get_unread_count(self.bob), 0)
+
+    def test_bulk_send(self):
+        carol = make_user('carol', 'jobseeker')
+        send_messages_in_bulk(self.alice, {self.bob.id: 'Hello Bob', carol.id: 'Hello Carol'})
+        send_messages_in_bulk(self.alice, {self.bob.id: 'Hello again'})
+        self.assertEqual(get_unread_count(self.bob), 2)
+        self.assertEqual(get_unread_count(carol), 1)
+        self.assertFalse(MessageNotification.objects.exists())
+
+    def test_unread_count_endpoint(self):
+        Message.objects.create(conversation=self.conversation, sender=self.alice, content='Hello')
+        self.client.force_login(self.bob)
+        response = self.client.get(reverse('messaging:unread_count'))
+        self.assertEqual(response.json(), {'unread_count': 1})
+
+
+class ReadWatermarkTests(TestCase):
+    def setUp(self):
+        self.alice = make_user('alice')
+        self.bob = make_user('bob', 'jobseeker')
+        self.conversation, _ = Conversation.get_or_create_direct(self.alice, self.bob)
+        self.messages = [
+            Message.objects.create(conversation=self.conversation, sender=sender, content=content)
+            for sender, content in [(self.alice, 'Hello'), (self.bob, 'Hi'), (self.alice, 'How are you?')]
+        ]
+
+    def get_watermark(self, user):
+        return ConversationMembership.objects.get(conversation=self.conversation, user=user).last_read_message_id
+
+    def test_mark_conversation_read(self):
+        self.assertEqual(get_unread_count(self.bob), 2)
+        self.assertEqual(mark_conversation_read(self.conversation, self.bob), 2)
+        self.assertEqual(self.get_watermark(self.bob), self.messages[-1].id)
+        self.assertEqual(get_unread_count(self.bob), 0)
+        # Nothing new to read
+        self.assertEqual(mark_conversation_read(self.conversation, self.bob), 0)
+
+    def test_annotate_unread_counts(self):
+        conversations = annotate_unread_counts(Conversation.objects.all(), self.bob)
+        self.assertEqual(conversations.get().unread_count, 2)
+        mark_conversation_read(self.conversation, self.bob)
+        conversations = annotate_unread_counts(Conversation.objects.all(), self.bob)
+        self.assertEqual(conversations.get().unread_count, 0)
+
+    def test_annotate_read_state(self):
+        mark_conversation_read(self.conversation, self.bob)
+        Message.objects.create(conversation=self.conversation, sender=self.alice, content='Still there?')
+        read_state = annotate_read_state(Message.objects.order_by('id')).values_list('is_read', flat=True)
+        # Bob's own message counts as read once Alice's watermark passes it
+        self.assertEqual(list(read_state), [True, False, True, False])
+        mark_conversation_read(self.conversation, self.alice)
+        self.assertEqual(list(read_state.all()), [True, True, True, False])
+
+    def test_deleting_conversation_discounts_unread_messages(self):
+        carol = make_user('carol')
+        other_conversation, _ = Conversation.get_or_create_direct(carol, self.bob)
+        Message.objects.create(conversation=other_conversation, sender=carol, content='Hey')
+        self.assertEqual(get_unread_count(self.bob), 3)
+        self.conversation.delete()
+        self.assertEqual(get_unread_count(self.bob), 1)
+        self.assertEqual(repair_unread_counters(), 0)
+
+    def test_repair_unread_counters(self):
+        self.bob.unread_counter.count = 10
+        self.bob.unread_counter.save()
+        self.assertEqual(repair_unread_counters(), 1)
+        self.assertEqual(get_unread_count(self.bob), 2)
+
+
+class ReadWatermarkMigrationTests(TransactionTestCase):
+    before = [('messaging', '0003_unreadcounter')]
+    after = [('messaging', '0004_read_watermarks')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_read_flags_round_trip(self):
+        apps = self.migrate(self.before)
+        User = apps.get_model('auth', 'User')
+        Conversation = apps.get_model('messaging', 'Conversation')
+        Message = apps.get_model('messaging', 'Message')
+        alice = User.objects.create(username='alice')
+        bob = User.objects.create(username='bob')
+        conversation = Conversation.objects.create()
+        conversation.participants.add(alice, bob)
+        messages = [
+            Message.objects.create(conversation=conversation, sender=sender, content='', is_read=is_read)
+            for sender, is_read in [(alice, True), (bob, True), (alice, True), (alice, False), (bob, False)]
+        ]
+
+        apps = self.migrate(self.after)
+        ConversationMembership = apps.get_model('messaging', 'ConversationMembership')
+        watermarks = dict(ConversationMembership.objects.values_list('user_id', 'last_read_message_id'))
+        self.assertEqual(watermarks, {bob.id: messages[2].id, alice.id: messages[3].id})
+
+        apps = self.migrate(self.before)
+        Message = apps.get_model('messaging', 'Message')
+        self.assertEqual(
+            list(Message.objects.order_by('id').values_list('is_read', flat=True)),
+            [True, True, True, False, False],
+        )
+
+
+@mock.patch('messaging.views.MESSAGE_HISTORY_PAGE_SIZE', 3)
+class ConversationHistoryTests(TestCase):
+    def setUp(self):
+        self.alice = make_user('alice')
+        self.bob = make_user('bob', 'jobseeker')
+        self.conversation, _ = Conversation.get_or_create_direct(self.alice, self.bob)
+        self.messages = [
+            Message.objects.create(conversation=self.conversation, sender=self.alice, content=f'Message {number}')
+            for number in range(8)
+        ]
+        self.client.force_login(self.bob)
+
+    def test_load_older(self):
+        response = self.client.get(reverse('messaging:conversation_detail', args=[self.conversation.id]))
+        self.assertEqual(list(response.context['message_list']), self.messages[-3:])
+        cursor = response.context['older_cursor']
+        pages = []
+        while cursor:
+            page = self.client.get(
+                reverse('messaging:conversation_history', args=[self.conversation.id]), {'cursor': cursor}
+            ).json()
+            pages.append([int(message_id) for message_id in re.findall(r'data-message-id="(\d+)"', page['html'])])
+            cursor = page['next_cursor']
+        ids = [message.id for message in self.messages]
+        # Each page comes oldest first, to be put above the messages shown
+        self.assertEqual(pages, [ids[2:5], ids[0:2]])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(
+            reverse('messaging:conversation_history', args=[self.conversation.id]), {'cursor': 'bad'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Invalid cursor'})
+
+    def test_other_users_conversations(self):
+        self.client.force_login(make_user('carol'))
+        response = self.client.get(reverse('messaging:conversation_history', args=[self.conversation.id]))
+        self.assertEqual(response.status_code, 404)
+
+
+class CountingEmailBackend(LocmemEmailBackend):
+    """The locmem backend, counting the connections opened."""
+    connections_opened = 0
+
+    def open(self):
+        CountingEmailBackend.connections_opened += 1
+        return True
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+
+
+class UnreachableEmailBackend(BaseEmailBackend):
+    def open(self):
+        raise ConnectionRefusedError('Connection refused')
+
+
+class RefusingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise smtplib.SMTPRecipientsRefused({email_messages[0].to[0]: (550, b'No such user')})
+
+
+@override_settings(
+    EMAIL_BACKEND='messaging.tests.CountingEmailBackend',
+    EMAIL_OUTBOX_RETRY_SECONDS=60,
+    EMAIL_OUTBOX_MAX_ATTEMPTS=3,
+)
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        CountingEmailBackend.connections_opened = 0
+        self.sender = make_user('sender')
+        self.recipient = make_user('recipient', 'jobseeker')
+        self.now = timezone.now()
+
+    def queue_emails(self, count, recipient=None):
+        emails = []
+        for number in range(count):
+            email = EmailMessage(
+                sender=self.sender, recipient=recipient or self.recipient, subject=f'Email {number}', body='Hello',
+            )
+            email.queue()
+            emails.append(email)
+        return emails
+
+    def test_sends_in_batches(self):
+        emails = self.queue_emails(5)
+        self.assertEqual(send_queued_emails(batch_size=2, now=self.now + timedelta(seconds=1)), (5, 0, 0))
+        self.assertEqual(CountingEmailBackend.connections_opened, 3)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(mail.outbox[0].to, ['recipient@example.com'])
+        self.assertEqual(mail.outbox[0].subject, '[JobRecruiter] Email 0')
+        email = EmailMessage.objects.get(pk=emails[0].pk)
+        self.assertEqual((email.status, email.next_attempt_at), ('sent', None))
+        # Nothing left to send
+        self.assertEqual(send_queued_emails(now=self.now + timedelta(seconds=2)), (0, 0, 0))
+
+    def test_only_sends_due_emails(self):
+        self.queue_emails(2)
+        EmailMessage.objects.filter(subject='Email 1').update(next_attempt_at=self.now + timedelta(hours=1))
+        self.assertEqual(send_queued_emails(now=self.now + timedelta(seconds=1)), (1, 0, 0))
+        self.assertEqual([message.subject for message in mail.outbox], ['[JobRecruiter] Email 0'])
+
+    def test_claimed_emails_are_skipped_until_the_claim_runs_out(self):
+        self.queue_emails(1)
+        now = self.now + timedelta(seconds=1)
+        self.assertEqual(len(_claim_batch(now, 10)), 1)
+        # Another worker finds nothing to do while the claim holds
+        self.assertEqual(_claim_batch(now, 10), [])
+        self.assertEqual(send_queued_emails(now=now + CLAIM_TIMEOUT - timedelta(seconds=1)), (0, 0, 0))
+        # The claiming worker died, so the email is picked up again
+        self.assertEqual(send_queued_emails(now=now + CLAIM_TIMEOUT), (1, 0, 0))
+
+    @override_settings(EMAIL_BACKEND='messaging.tests.FailingEmailBackend')
+    def test_backoff_after_failure(self):
+        email = self.queue_emails(1)[0]
+        now = self.now + timedelta(seconds=1)
+        with self.assertLogs('messaging.outbox', 'WARNING'):
+            self.assertEqual(send_queued_emails(now=now), (0, 0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('queued', 1))
+        self.assertEqual(email.next_attempt_at, now + timedelta(seconds=60))
+        self.assertEqual(email.failure_reason, 'Connection unexpectedly closed')
+        # Not due again until the delay has passed
+        self.assertEqual(send_queued_emails(now=now + timedelta(seconds=59)), (0, 0, 0))
+        now += timedelta(seconds=60)
+        with self.assertLogs('messaging.outbox', 'WARNING'):
+            self.assertEqual(send_queued_emails(now=now), (0, 0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.next_attempt_at, now + timedelta(seconds=120))
+
+    @override_settings(EMAIL_BACKEND='messaging.tests.FailingEmailBackend')
+    def test_retry_cap(self):
+        email = self.queue_emails(1)[0]
+        now = self.now
+        results = []
+        for attempt in range(3):
+            now += get_retry_delay(attempt) if attempt else timedelta(seconds=1)
+            with self.assertLogs('messaging.outbox', 'WARNING'):
+                results.append(send_queued_emails(now=now))
+        self.assertEqual(results, [(0, 0, 1), (0, 0, 1), (0, 1, 0)])
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts, email.next_attempt_at), ('failed', 3, None))
+        self.assertEqual(send_queued_emails(now=now + timedelta(days=1)), (0, 0, 0))
+
+    def test_recovers_after_failure(self):
+        email = self.queue_emails(1)[0]
+        now = self.now + timedelta(seconds=1)
+        with override_settings(EMAIL_BACKEND='messaging.tests.UnreachableEmailBackend'), \
+                self.assertLogs('messaging.outbox', 'ERROR'):
+            self.assertEqual(send_queued_emails(now=now), (0, 0, 1))
+        email.refresh_from_db()
+        self.assertTrue(email.failure_reason.startswith('Could not connect to the mail server'))
+        self.assertEqual(send_queued_emails(now=now + timedelta(seconds=60)), (1, 0, 0))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts, email.failure_reason), ('sent', 1, ''))
+
+    @override_settings(EMAIL_BACKEND='messaging.tests.RefusingEmailBackend')
+    def test_refused_recipient_is_not_retried(self):
+        email = self.queue_emails(1)[0]
+        with self.assertLogs('messaging.outbox', 'WARNING'):
+            self.assertEqual(send_queued_emails(now=self.now + timedelta(seconds=1)), (0, 1, 0))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('failed', 1))
+
+    def test_recipient_without_address(self):
+        recipient = make_user('nomail', 'jobseeker')
+        recipient.email = ''
+        recipient.save()
+        email = self.queue_emails(1, recipient)[0]
+        self.assertEqual(send_queued_emails(now=self.now + timedelta(seconds=1)), (0, 1, 0))
+        email.refresh_from_db()
+        self.assertEqual(email.failure_reason, 'nomail has no email address')
+        self.assertEqual(mail.outbox, [])
+
+    def test_command(self):
+        self.queue_emails(3)
+        out = StringIO()
+        call_command('send_queued_emails', '--batch-size', '2', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Sent 3 emails, 0 failed, 0 to retry.')
+        self.assertEqual(CountingEmailBackend.connections_opened, 2)
@@ -0,0 +1,216 @@
+"""
+Recipient typeahead for the email composer, answered from process memory.
+
+Each process keeps a TypeaheadIndex: every user's normalized username,
+display name (and each later word of it, so "smi" finds John Smith) and
+email in one sorted list, next to an array of the user ids they belong to.
+A lookup bisects to the first key starting with what was typed and reads
+on until it has enough users, so it costs a few microseconds however many
+users there are, plus a primary key lookup of the index version, instead
+of a search of the directory per keystroke.
+
+The index is built from the user directory (messaging/directory.py) and
+kept up to date as directory entries change. As with the saved search
+matcher, a version number kept in the database (an IndexVersion row) tells
+other processes that their copy is out of date. They keep answering from it while a fresh one
+is built in a background thread (unless USER_TYPEAHEAD_IN_BACKGROUND is
+False), and the directory search in the database answers until a process
+has an index at all, or for good if USER_TYPEAHEAD_IN_MEMORY is False.
+"""
+import bisect
+import logging
+import threading
+from array import array
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import connection
+
+from jobpostings.models import IndexVersion
+from .directory import normalize, search_directory
+from .models import UserDirectoryEntry
+
+logger = logging.getLogger(__name__)
+
+VERSION_NAME = 'user_typeahead'
+
+# Users suggested per lookup
+SUGGESTION_LIMIT = 10
+
+# Directory rows read per query when building the index
+BUILD_CHUNK_SIZE = 10000
+
+
+def get_keys(username, display_name, email):
+    """The normalized keys a user can be found by."""
+    keys = {normalize(username), normalize(email)}
+    words = normalize(display_name).split()
+    keys.update(' '.join(words[start:]) for start in range(len(words)))
+    keys.discard('')
+    return keys
+
+
+class TypeaheadIndex:
+    """A sorted array of every user's keys, searched by prefix."""
+
+    def __init__(self, version=None):
+        self.version = version
+        self._keys = []
+        self._user_ids = array('q')
+        # {user id: (username, display name, email)}
+        self.users = {}
+
+    @classmethod
+    def build(cls, rows, version=None):
+        """Build an index from (user id, username, display name, email) rows."""
+        index = cls(version)
+        pairs = []
+        for user_id, username, display_name, email in rows:
+            index.users[user_id] = (username, display_name, email)
+            pairs.extend((key, user_id) for key in get_keys(username, display_name, email))
+        # Comparing the keys alone is much quicker than comparing the pairs
+        pairs.sort(key=itemgetter(0))
+        index._keys = [key for key, _ in pairs]
+        index._user_ids = array('q', (user_id for _, user_id in pairs))
+        return index
+
+    def _insert(self, key, user_id):
+        position = bisect.bisect_right(self._keys, key)
+        self._keys.insert(position, key)
+        self._user_ids.insert(position, user_id)
+
+    def _delete(self, key, user_id):
+        position = bisect.bisect_left(self._keys, key)
+        while position < len(self._keys) and self._keys[position] == key:
+            if self._user_ids[position] == user_id:
+                del self._keys[position]
+                del self._user_ids[position]
+                return
+            position += 1
+
+    def add(self, user_id, username, display_name, email):
+        self.remove(user_id)
+        self.users[user_id] = (username, display_name, email)
+        for key in get_keys(username, display_name, email):
+            self._insert(key, user_id)
+
+    def remove(self, user_id):
+        details = self.users.pop(user_id, None)
+        if details:
+            for key in get_keys(*details):
+                self._delete(key, user_id)
+
+    def search(self, query, limit=SUGGESTION_LIMIT, exclude_user_id=None):
+        """
+        Return [(user id, username, display name, email)] for up to limit
+        users with a key starting with the query, in the order of their keys.
+        """
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        found = {}
+        position = bisect.bisect_left(self._keys, prefix)
+        while len(found) < limit and position < len(self._keys) and self._keys[position].startswith(prefix):
+            user_id = self._user_ids[position]
+            if user_id != exclude_user_id and user_id not in found:
+                found[user_id] = self.users[user_id]
+            position += 1
+        return [(user_id, *details) for user_id, details in found.items()]
+
+
+_index = None
+_building = False
+_lock = threading.Lock()
+
+
+def _directory_rows(user_ids=None):
+    entries = UserDirectoryEntry.objects.all()
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=user_ids)
+    return entries.values_list('user_id', 'username', 'display_name', 'user__email')
+
+
+def _build_index(version):
+    global _index, _building
+    try:
+        index = TypeaheadIndex.build(_directory_rows().iterator(chunk_size=BUILD_CHUNK_SIZE), version)
+        with _lock:
+            # Changes made here while building bumped the version and are picked up by the next build
+            _index = index
+    except Exception:
+        logger.exception('Building the user typeahead index failed')
+    finally:
+        with _lock:
+            _building = False
+
+
+def _build_in_thread(version):
+    try:
+        _build_index(version)
+    finally:
+        connection.close()
+
+
+def get_typeahead_index():
+    """
+    This process's index, starting a rebuild if it is out of date. Returns
+    None while there is no index yet.
+    """
+    global _building
+    version = IndexVersion.get(VERSION_NAME)
+    with _lock:
+        if _index is not None and _index.version == version:
+            return _index
+        stale_index = _index
+        if _building:
+            return stale_index
+        _building = True
+    if getattr(settings, 'USER_TYPEAHEAD_IN_BACKGROUND', True):
+        threading.Thread(target=_build_in_thread, args=(version,), daemon=True).start()
+        return stale_index
+    _build_index(version)
+    return _index
+
+
+def suggest_users(user, query, limit=SUGGESTION_LIMIT):
+    """
+    Return [(user id, username, display name, email)] for up to limit users
+    other than user whose name, username or email starts with the query.
+    """
+    index = get_typeahead_index() if getattr(settings, 'USER_TYPEAHEAD_IN_MEMORY', True) else None
+    if index is not None:
+        # directory_changed edits the index in place
+        with _lock:
+            return index.search(query, limit, exclude_user_id=user.id)
+    # No index in this process yet, so ask the database
+    return list(
+        search_directory(query, exclude_user=user).order_by('username', 'user_id')
+        .values_list('user_id', 'username', 'display_name', 'user__email')[:limit]
+    )
+
+
+def directory_changed(user_ids):
+    """
+    Apply changed (or removed) directory entries to this process's index
+    and tell other processes to rebuild theirs.
+    """
+    global _index
+    user_ids = set(user_ids)
+    version = IndexVersion.bump(VERSION_NAME)
+    rows = list(_directory_rows(user_ids))
+    with _lock:
+        if _index is None:
+            return
+        if _index.version != version - 1:
+            # Missed another change, so this copy is only good until the rebuild
+            return
+        for user_id in user_ids:
+            _index.remove(user_id)
+        for row in rows:
+            _index.add(*row)
+        _index.version = version
+
+
+def directory_rebuilt():
+    """Tell every process to rebuild its index after the whole directory was rebuilt."""
+    IndexVersion.bump(VERSION_NAME)
@@ -0,0 +1,169 @@
+"""
+Per-user unread message counters.
+
+Each member of a conversation has a read watermark, the id of the last
+message they've read (ConversationMembership.last_read_message_id). The
+messages from the other members above it are unread for them, so reading a
+conversation is a single row update and its unread count is a range count
+over the (conversation, id) index.
+
+Rather than counting unread messages on every page, each user's total is
+also kept in an UnreadCounter row, adjusted in the same transaction as the
+change:
+
+- Message creates and deletes are handled by the signals in messaging/signals.py.
+- mark_conversation_read() moves a watermark and takes what was under it off.
+- bulk_create skips the signals, so code using it (messaging/bulk.py) calls
+  count_new_messages().
+
+Reading a count is a single primary key lookup, so it is always current
+in every process. The repair_unread_counters management command recounts
+everything from the messages should the counters ever drift.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .events import conversation_changed
+from .models import ConversationMembership, Message, UnreadCounter
+
+def get_unread_count(user):
+    """The user's unread message count, with one primary key lookup."""
+    return UnreadCounter.objects.filter(pk=user.id).values_list('count', flat=True).first() or 0
+
+
+def adjust_unread_counts(changes):
+    """Add {user id: change} to the users' counters, never going below zero."""
+    changes = {user_id: change for user_id, change in changes.items() if change}
+    if not changes:
+        return
+    by_change = {}
+    for user_id, change in changes.items():
+        by_change.setdefault(change, []).append(user_id)
+    with transaction.atomic():
+        UnreadCounter.objects.bulk_create(
+            [UnreadCounter(user_id=user_id) for user_id in changes], ignore_conflicts=True,
+        )
+        for change, user_ids in by_change.items():
+            UnreadCounter.objects.filter(user_id__in=user_ids).update(
+                count=Greatest(F('count') + change, Value(0))
+            )
+
+
+def _recipient_changes(messages, change):
+    """{user id: change} for every member who hasn't read the messages."""
+    memberships = {}
+    for conversation_id, user_id, last_read in ConversationMembership.objects.filter(
+        conversation_id__in={message.conversation_id for message in messages}
+    ).values_list('conversation_id', 'user_id', 'last_read_message_id'):
+        memberships.setdefault(conversation_id, []).append((user_id, last_read))
+    changes = Counter()
+    for message in messages:
+        for user_id, last_read in memberships.get(message.conversation_id, []):
+            if user_id != message.sender_id and message.id > last_read:
+                changes[user_id] += change
+    return changes
+
+
+def count_new_messages(messages):
+    """Count messages created without their save signals, e.g. by bulk_create."""
+    adjust_unread_counts(_recipient_changes(messages, 1))
+
+
+def count_message_change(message, change):
+    """Add change (1 or -1) to the counters of the members who haven't read a message."""
+    adjust_unread_counts(_recipient_changes([message], change))
+
+
+def mark_conversation_read(conversation, user):
+    """
+    Move a user's read watermark up to the latest message of a conversation.
+    Returns the number of messages that were unread.
+    """
+    with transaction.atomic():
+        last_read = ConversationMembership.objects.filter(
+            conversation=conversation, user=user
+        ).values_list('last_read_message_id', flat=True).first()
+        if last_read is None:
+            return 0
+        past_watermark = Message.objects.filter(conversation=conversation, id__gt=last_read).aggregate(
+            latest=Max('id'),
+            unread=Count('id', filter=~Q(sender=user)),
+        )
+        if past_watermark['latest'] is None:
+            return 0
+        # Only the request that moves the watermark takes the messages off the counter
+        moved = ConversationMembership.objects.filter(
+            conversation=conversation, user=user, last_read_message_id=last_read
+        ).update(last_read_message_id=past_watermark['latest'])
+        if not moved:
+            return 0
+        adjust_unread_counts({user.id: -past_watermark['unread']})
+        # Send the read receipt
+        conversation_changed(conversation.id)
+    return past_watermark['unread']
+
+
+def annotate_unread_counts(conversations, user):
+    """
+    Annotate a queryset of conversations with the number of messages each has
+    past the user's watermark (unread_count), counted through the
+    (conversation, id) index in the same query.
+    """
+    last_read = ConversationMembership.objects.filter(
+        conversation=OuterRef(OuterRef('pk')), user=user
+    ).values('last_read_message_id')[:1]
+    unread = (
+        Message.objects.filter(conversation=OuterRef('pk'), id__gt=Subquery(last_read))
+        .exclude(sender=user)
+        .order_by()
+        .values('conversation')
+        .annotate(unread=Count('id'))
+        .values('unread')
+    )
+    return conversations.annotate(unread_count=Coalesce(Subquery(unread), Value(0)))
+
+
+def annotate_read_state(messages):
+    """Annotate a queryset of messages with whether every recipient has read them (is_read)."""
+    unread_by = ConversationMembership.objects.filter(
+        conversation=OuterRef('conversation'), last_read_message_id__lt=OuterRef('id')
+    ).exclude(user=OuterRef('sender'))
+    return messages.annotate(is_read=~Exists(unread_by))
+
+
+def count_unread_messages():
+    """Count every user's unread messages from scratch, as {user id: count}."""
+    return dict(
+        Message.objects.annotate(
+            recipient=F('conversation__memberships__user'),
+            last_read=F('conversation__memberships__last_read_message_id'),
+        )
+        .filter(~Q(recipient=F('sender')), id__gt=F('last_read'))
+        .values('recipient')
+        .annotate(unread=Count('id'))
+        .values_list('recipient', 'unread')
+    )
+
+
+def repair_unread_counters():
+    """Reset every counter to its recount. Returns the number of counters fixed."""
+    counts = count_unread_messages()
+    with transaction.atomic():
+        counters = {counter.user_id: counter for counter in UnreadCounter.objects.select_for_update()}
+        wrong = []
+        for user_id, counter in counters.items():
+            count = counts.get(user_id, 0)
+            if counter.count != count:
+                counter.count = count
+                wrong.append(counter)
+        UnreadCounter.objects.bulk_update(wrong, ['count'])
+        missing = [
+            UnreadCounter(user_id=user_id, count=count)
+            for user_id, count in counts.items()
+            if user_id not in counters
+        ]
+        UnreadCounter.objects.bulk_create(missing)
+    return len(wrong) + len(missing)
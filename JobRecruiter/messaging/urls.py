@@ -6,7 +6,11 @@ app_name = 'messaging'
 urlpatterns = [
     # Message URLs
     path('', views.inbox, name='inbox'),
+    path('api/inbox/', views.inbox_page, name='inbox_page'),
+    path('search/', views.search, name='search'),
     path('conversation/<int:conversation_id>/', views.conversation_detail, name='conversation_detail'),
+    path('conversation/<int:conversation_id>/events/', views.conversation_events, name='conversation_events'),
+    path('conversation/<int:conversation_id>/older/', views.conversation_history, name='conversation_history'),
     path('start/<int:user_id>/', views.start_conversation, name='start_conversation'),
     path('send/<int:conversation_id>/', views.send_message, name='send_message'),
     path('users/', views.user_list, name='user_list'),
@@ -22,6 +26,7 @@ urlpatterns = [
     path('email/<int:email_id>/delete/', views.delete_email, name='delete_email'),
     path('email/draft/<int:draft_id>/send/', views.send_draft, name='send_draft'),
     path('api/user-search/', views.user_search_api, name='user_search_api'),
+    path('api/user-typeahead/', views.user_typeahead_api, name='user_typeahead_api'),
     path('debug/email-info/<int:user_id>/', views.debug_email_info, name='debug_email_info'),
     path('test-email/', views.test_email_sending, name='test_email_sending'),
 ]
@@ -1,14 +1,42 @@
+import time
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404, redirect
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_POST
-from django.db.models import Q, Max
+from django.db import transaction
+from django.db.models import Min
+from django.template.loader import render_to_string
 from django.utils import timezone
-from .models import Conversation, Message, MessageNotification, EmailMessage
+from .models import Conversation, ConversationMembership, Message, MessageNotification, EmailMessage
+from .events import MAX_STREAM_SECONDS, format_event, get_broker
+from .directory import search_directory
+from .inbox import get_inbox_page
+from .search import EMAIL, MESSAGE, search_messages
+from .typeahead import suggest_users
+from .unread import get_unread_count as get_user_unread_count, mark_conversation_read
 from .forms import EmailComposeForm, EmailDraftForm
-from accounts.models import Profile
+from jobpostings.pagination import InvalidCursor, keyset_page
+
+# Number of conversations per page on the inbox and its infinite scroll endpoint
+INBOX_PAGE_SIZE = 20
+
+# Users per page of the directory, and hits per page of the email recipient search
+USER_LIST_PAGE_SIZE = 30
+USER_SEARCH_PAGE_SIZE = 10
+USER_LIST_ORDERING = ('username', 'user_id')
+
+# Best matches listed by the message and email search
+SEARCH_RESULT_LIMIT = 50
+
+# Messages of a conversation shown on opening it, and loaded each time older ones are asked for
+MESSAGE_HISTORY_PAGE_SIZE = 50
+MESSAGE_HISTORY_ORDERING = ('-timestamp', '-id')
 
 
 @login_required
@@ -19,37 +47,69 @@ def inbox(request):
     # Get search query
     search_query = request.GET.get('search', '').strip()
     
-    # Get all conversations for the current user
-    conversations = Conversation.objects.filter(participants=request.user).annotate(
-        latest_message_time=Max('messages__timestamp')
-    )
-    
-    # Apply search filter if query exists
-    if search_query:
-        conversations = conversations.filter(
-            Q(participants__username__icontains=search_query) |
-            Q(participants__first_name__icontains=search_query) |
-            Q(participants__last_name__icontains=search_query) |
-            Q(messages__content__icontains=search_query)
-        ).distinct()
-    
-    conversations = conversations.order_by('-latest_message_time')
-    
-    # Get unread counts for each conversation
-    for conversation in conversations:
-        unread_count = Message.objects.filter(
-            conversation=conversation,
-            is_read=False
-        ).exclude(sender=request.user).count()
-        conversation.unread_count = unread_count
+    # Get the first page of the user's conversations, the rest is loaded through inbox_page
+    conversations, next_cursor = get_inbox_page(request.user, search_query, page_size=INBOX_PAGE_SIZE)
     
     context = {
         'conversations': conversations,
+        'next_cursor': next_cursor,
         'search_query': search_query,
     }
     return render(request, 'messaging/inbox.html', context)
 
 
+@login_required
+def inbox_page(request):
+    """
+    JSON endpoint returning the next page of the inbox for infinite scroll.
+    Takes the same search as the inbox plus the cursor of the last page.
+    """
+    try:
+        conversations, next_cursor = get_inbox_page(
+            request.user, request.GET.get('search', '').strip(),
+            cursor=request.GET.get('cursor'), page_size=INBOX_PAGE_SIZE,
+        )
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    
+    html = render_to_string('messaging/inbox_items.html', {'conversations': conversations}, request=request)
+    return JsonResponse({
+        'html': html,
+        'next_cursor': next_cursor,
+    })
+
+
+@login_required
+def search(request):
+    """
+    Search the user's chat messages and emails together, best matches first.
+    """
+    search_query = request.GET.get('q', '').strip()
+    
+    results = []
+    if search_query:
+        # 1. One query on the search index
+        hits = search_messages(request.user, search_query, limit=SEARCH_RESULT_LIMIT)
+        
+        # 2. Load the messages and emails the hits point at, one query each
+        found_messages = Message.objects.select_related('sender').in_bulk(
+            [hit.object_id for hit in hits if hit.kind == MESSAGE]
+        )
+        found_emails = EmailMessage.objects.select_related('sender', 'recipient').in_bulk(
+            [hit.object_id for hit in hits if hit.kind == EMAIL]
+        )
+        for hit in hits:
+            found = found_messages if hit.kind == MESSAGE else found_emails
+            if hit.object_id in found:
+                results.append({'kind': hit.kind, 'item': found[hit.object_id], 'snippet': hit.snippet})
+    
+    context = {
+        'results': results,
+        'search_query': search_query,
+    }
+    return render(request, 'messaging/search.html', context)
+
+
 @login_required
 def conversation_detail(request, conversation_id):
     """
@@ -58,25 +118,168 @@ def conversation_detail(request, conversation_id):
     conversation = get_object_or_404(Conversation, id=conversation_id, participants=request.user)
     
     # Mark all messages in this conversation as read (except those sent by the current user)
-    Message.objects.filter(
-        conversation=conversation,
-        is_read=False
-    ).exclude(sender=request.user).update(is_read=True)
+    mark_conversation_read(conversation, request.user)
     
-    # Get all messages in the conversation
-    message_list = conversation.messages.all().order_by('timestamp')
+    # Get the newest messages in the conversation, older ones are loaded through conversation_history
+    newest_messages, older_cursor = keyset_page(
+        conversation.messages.select_related('sender'), MESSAGE_HISTORY_ORDERING, page_size=MESSAGE_HISTORY_PAGE_SIZE,
+    )
     
     # Get the other participant
     other_participant = conversation.get_other_participant(request.user)
     
     context = {
         'conversation': conversation,
-        'message_list': message_list,
+        'message_list': newest_messages[::-1],
+        'older_cursor': older_cursor,
+        'last_message_id': newest_messages[0].id if newest_messages else 0,
         'other_participant': other_participant,
     }
     return render(request, 'messaging/conversation_detail.html', context)
 
 
+@login_required
+def conversation_history(request, conversation_id):
+    """
+    JSON endpoint returning the messages of a conversation older than the
+    cursor, for the "load older messages" button.
+    """
+    conversation = get_object_or_404(Conversation, id=conversation_id, participants=request.user)
+    try:
+        older_messages, older_cursor = keyset_page(
+            conversation.messages.select_related('sender'), MESSAGE_HISTORY_ORDERING,
+            cursor=request.GET.get('cursor'), page_size=MESSAGE_HISTORY_PAGE_SIZE,
+        )
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    
+    html = ''.join(
+        render_to_string('messaging/message_item.html', {'message': message}, request=request)
+        for message in reversed(older_messages)
+    )
+    return JsonResponse({
+        'html': html,
+        'next_cursor': older_cursor,
+    })
+
+
+def _make_event_id(last_message_id, other_last_read):
+    """
+    The id of an event: the last message and read watermark the client has,
+    which EventSource hands back as Last-Event-ID when it reconnects.
+    """
+    if other_last_read is None:
+        return str(last_message_id)
+    return f'{last_message_id}-{other_last_read}'
+
+
+def _parse_event_id(event_id):
+    """Return (last message id, other participant's last read) from an event id."""
+    last_message_id, _, other_last_read = event_id.partition('-')
+    return (
+        int(last_message_id) if last_message_id.isdigit() else 0,
+        int(other_last_read) if other_last_read.isdigit() else None,
+    )
+
+
+def _conversation_events(conversation, user, last_message_id, other_last_read):
+    """
+    The events of a conversation since the last message and read watermark
+    sent. Returns (events, last message id, other participant's last read).
+    """
+    events = []
+    
+    # 1. New messages since the last one sent
+    new_messages = list(
+        conversation.messages.filter(id__gt=last_message_id).select_related('sender').order_by('id')[:100]
+    )
+    
+    # 2. The conversation is open, so messages from the others are read as they arrive
+    if any(message.sender_id != user.id for message in new_messages):
+        mark_conversation_read(conversation, user)
+    
+    for message in new_messages:
+        html = render_to_string('messaging/message_item.html', {'message': message, 'user': user})
+        events.append(format_event(
+            'message', {'id': message.id, 'html': html}, event_id=_make_event_id(message.id, other_last_read),
+        ))
+        last_message_id = message.id
+    
+    # 3. Read receipt: how far the other participant has read
+    last_read = ConversationMembership.objects.filter(
+        conversation=conversation
+    ).exclude(user=user).aggregate(last_read=Min('last_read_message_id'))['last_read']
+    if last_read is not None and last_read != other_last_read:
+        other_last_read = last_read
+        events.append(format_event(
+            'read', {'last_read_message_id': last_read}, event_id=_make_event_id(last_message_id, other_last_read),
+        ))
+    
+    return events, last_message_id, other_last_read
+
+
+async def _conversation_event_stream(conversation, user, last_message_id, other_last_read):
+    broker = get_broker()
+    poll_seconds = getattr(settings, 'MESSAGING_EVENT_POLL_SECONDS', 5)
+    deadline = time.monotonic() + MAX_STREAM_SECONDS
+    
+    # How long EventSource waits before reconnecting, in milliseconds
+    yield 'retry: 1000\n\n'
+    while True:
+        events, last_message_id, other_last_read = await sync_to_async(_conversation_events)(
+            conversation, user, last_message_id, other_last_read,
+        )
+        for event in events:
+            yield event
+        
+        if time.monotonic() >= deadline:
+            return
+        if not events:
+            # Comment line, so dropped connections are noticed
+            yield ': keep-alive\n\n'
+        await broker.wait(conversation.id, poll_seconds)
+
+
+def _conversation_event_poll(conversation, user, last_message_id, other_last_read):
+    """
+    The event stream when served over WSGI, where an open stream would hold
+    a worker thread: it sends what is new and ends, and EventSource polls by
+    reconnecting every MESSAGING_EVENT_POLL_SECONDS.
+    """
+    poll_seconds = getattr(settings, 'MESSAGING_EVENT_POLL_SECONDS', 5)
+    yield f'retry: {poll_seconds * 1000}\n\n'
+    events, _, _ = _conversation_events(conversation, user, last_message_id, other_last_read)
+    yield from events
+
+
+@login_required
+async def conversation_events(request, conversation_id):
+    """
+    Event stream of new messages and read receipts for an open conversation
+    (see messaging/events.py).
+    """
+    user = await request.auser()
+    conversation = await Conversation.objects.filter(id=conversation_id, participants=user).afirst()
+    if conversation is None:
+        raise Http404("Conversation not found")
+    
+    # Resume after the last message and read watermark the client has, from
+    # EventSource's reconnect header or, on opening the page, its last message
+    last_message_id, other_last_read = _parse_event_id(
+        request.headers.get('Last-Event-ID') or request.GET.get('after', '')
+    )
+    
+    if isinstance(request, ASGIRequest):
+        stream = _conversation_event_stream(conversation, user, last_message_id, other_last_read)
+    else:
+        # A WSGI server would have to collect an async stream before sending any of it
+        stream = _conversation_event_poll(conversation, user, last_message_id, other_last_read)
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 def start_conversation(request, user_id):
     """
@@ -84,19 +287,8 @@ def start_conversation(request, user_id):
     """
     target_user = get_object_or_404(User, id=user_id)
     
-    # Check if a conversation already exists between these users
-    existing_conversation = Conversation.objects.filter(
-        participants=request.user
-    ).filter(
-        participants=target_user
-    ).first()
-    
-    if existing_conversation:
-        return redirect('messaging:conversation_detail', conversation_id=existing_conversation.id)
-    
-    # Create a new conversation
-    conversation = Conversation.objects.create()
-    conversation.participants.add(request.user, target_user)
+    # Find the conversation between these users, or create it
+    conversation, _ = Conversation.get_or_create_direct(request.user, target_user)
     
     return redirect('messaging:conversation_detail', conversation_id=conversation.id)
 
@@ -114,16 +306,17 @@ def send_message(request, conversation_id):
         messages.error(request, "Message cannot be empty.")
         return redirect('messaging:conversation_detail', conversation_id=conversation_id)
     
-    # Create the message
-    message = Message.objects.create(
-        conversation=conversation,
-        sender=request.user,
-        content=content
-    )
-    
-    # Update conversation timestamp
-    conversation.updated_at = timezone.now()
-    conversation.save()
+    with transaction.atomic():
+        # Create the message (the recipient's unread counter goes up with it)
+        message = Message.objects.create(
+            conversation=conversation,
+            sender=request.user,
+            content=content
+        )
+        
+        # Update conversation timestamp
+        conversation.updated_at = timezone.now()
+        conversation.save()
     
     return redirect('messaging:conversation_detail', conversation_id=conversation_id)
 
@@ -136,100 +329,34 @@ def user_list(request):
     # Get search query
     search_query = request.GET.get('search', '').strip()
     
-    # Get all users except the current user
-    users = User.objects.exclude(id=request.user.id)
-    
-    # Apply search filter if query exists
-    if search_query:
-        users = users.filter(
-            Q(username__icontains=search_query) |
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query) |
-            Q(email__icontains=search_query)
-        )
-    
-    users = users.order_by('username')
+    # Everyone else in the directory, or those matching the search
+    entries = search_directory(search_query, exclude_user=request.user).select_related(
+        'user__profile__jobseekerprofile', 'user__profile__employerprofile'
+    )
     
-    # Get user profiles for display
-    user_profiles = []
-    for user in users:
-        try:
-            profile = user.profile
-            display_name = get_display_name(profile)
-            
-            # Additional search in profile-specific fields
-            if search_query and profile:
-                search_match = False
-                if profile.account_type == 'jobseeker':
-                    try:
-                        jobseeker_profile = profile.jobseekerprofile
-                        if (search_query.lower() in (jobseeker_profile.full_name or '').lower() or
-                            search_query.lower() in (jobseeker_profile.current_job or '').lower() or
-                            search_query.lower() in (jobseeker_profile.company or '').lower()):
-                            search_match = True
-                    except:
-                        pass
-                elif profile.account_type == 'employer':
-                    try:
-                        employer_profile = profile.employerprofile
-                        if (search_query.lower() in (employer_profile.company_name or '').lower() or
-                            search_query.lower() in (employer_profile.industry or '').lower()):
-                            search_match = True
-                    except:
-                        pass
-                
-                # Only include if it matches the search query
-                if not search_match and search_query:
-                    continue
-                    
-            user_profiles.append({
-                'user': user,
-                'profile': profile,
-                'display_name': display_name
-            })
-        except Profile.DoesNotExist:
-            user_profiles.append({
-                'user': user,
-                'profile': None,
-                'display_name': user.username
-            })
+    # Get one page of them, starting over from the first page on a bad cursor
+    cursor = request.GET.get('cursor')
+    try:
+        entries, next_cursor = keyset_page(entries, USER_LIST_ORDERING, cursor=cursor, page_size=USER_LIST_PAGE_SIZE)
+    except InvalidCursor:
+        cursor = None
+        entries, next_cursor = keyset_page(entries, USER_LIST_ORDERING, page_size=USER_LIST_PAGE_SIZE)
     
     context = {
-        'user_profiles': user_profiles,
+        'entries': entries,
         'search_query': search_query,
+        'is_first_page': not cursor,
+        'next_cursor': next_cursor,
     }
     return render(request, 'messaging/user_list.html', context)
 
 
-def get_display_name(profile):
-    """
-    Get the display name for a user based on their profile type.
-    """
-    if profile.account_type == 'jobseeker':
-        try:
-            jobseeker_profile = profile.jobseekerprofile
-            return jobseeker_profile.full_name or profile.user.username
-        except:
-            return profile.user.username
-    elif profile.account_type == 'employer':
-        try:
-            employer_profile = profile.employerprofile
-            return employer_profile.company_name or profile.user.username
-        except:
-            return profile.user.username
-    else:
-        return profile.user.username
-
-
 @login_required
 def get_unread_count(request):
     """
     API endpoint to get unread message count for the current user.
     """
-    unread_count = Message.objects.filter(
-        conversation__participants=request.user,
-        is_read=False
-    ).exclude(sender=request.user).count()
+    unread_count = get_user_unread_count(request.user)
     
     return JsonResponse({'unread_count': unread_count})
 
@@ -256,10 +383,11 @@ def email_sent(request):
     """
     Display emails sent by the current user.
     """
+    # Queued and undeliverable emails are listed with the sent ones
     sent_emails = EmailMessage.objects.filter(
         sender=request.user,
-        status='sent'
-    ).order_by('-sent_at')
+        status__in=['queued', 'sent', 'failed']
+    ).select_related('recipient').order_by('-created_at')
     
     context = {
         'sent_emails': sent_emails,
@@ -302,11 +430,10 @@ def compose_email(request):
             
             # Check if user wants to send immediately or save as draft
             if 'send' in request.POST:
-                if email.send_email():
-                    messages.success(request, f"Email sent successfully to {email.recipient.username}!")
-                    return redirect('messaging:email_sent')
-                else:
-                    messages.error(request, "Failed to send email. Please check the recipient's email address.")
+                # Delivered in the background by the outbox worker
+                email.queue()
+                messages.success(request, f"Your email to {email.recipient.username} is on its way!")
+                return redirect('messaging:email_sent')
             else:
                 messages.success(request, "Email saved as draft.")
                 return redirect('messaging:email_drafts')
@@ -333,11 +460,10 @@ def edit_draft(request, draft_id):
             
             # Check if user wants to send immediately or save as draft
             if 'send' in request.POST:
-                if email.send_email():
-                    messages.success(request, f"Email sent successfully to {email.recipient.username}!")
-                    return redirect('messaging:email_sent')
-                else:
-                    messages.error(request, "Failed to send email. Please check the recipient's email address.")
+                # Delivered in the background by the outbox worker
+                email.queue()
+                messages.success(request, f"Your email to {email.recipient.username} is on its way!")
+                return redirect('messaging:email_sent')
             else:
                 messages.success(request, "Draft updated successfully.")
                 return redirect('messaging:email_drafts')
@@ -397,10 +523,9 @@ def send_draft(request, draft_id):
     """
     draft = get_object_or_404(EmailMessage, id=draft_id, sender=request.user, status='draft')
     
-    if draft.send_email():
-        messages.success(request, f"Email sent successfully to {draft.recipient.username}!")
-    else:
-        messages.error(request, "Failed to send email. Please check the recipient's email address.")
+    # Delivered in the background by the outbox worker
+    draft.queue()
+    messages.success(request, f"Your email to {draft.recipient.username} is on its way!")
     
     return redirect('messaging:email_drafts')
 
@@ -409,39 +534,51 @@ def send_draft(request, draft_id):
 def user_search_api(request):
     """
     API endpoint for searching users by username for email composition.
+    Takes the cursor of the last page to get the next one.
     """
     query = request.GET.get('q', '').strip()
     if len(query) < 2:
-        return JsonResponse({'users': []})
+        return JsonResponse({'users': [], 'next_cursor': None})
     
-    users = User.objects.filter(
-        Q(username__icontains=query) |
-        Q(first_name__icontains=query) |
-        Q(last_name__icontains=query) |
-        Q(email__icontains=query)
-    ).exclude(id=request.user.id)[:10]
+    try:
+        entries, next_cursor = keyset_page(
+            search_directory(query, exclude_user=request.user).select_related('user'), USER_LIST_ORDERING,
+            cursor=request.GET.get('cursor'), page_size=USER_SEARCH_PAGE_SIZE,
+        )
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
     
     user_data = []
-    for user in users:
-        try:
-            profile = user.profile
-            if profile.account_type == 'jobseeker':
-                jobseeker_profile = profile.jobseekerprofile
-                display_name = jobseeker_profile.full_name or user.username
-            elif profile.account_type == 'employer':
-                employer_profile = profile.employerprofile
-                display_name = employer_profile.company_name or user.username
-            else:
-                display_name = user.username
-        except:
-            display_name = user.username
-        
+    for entry in entries:
+        user_data.append({
+            'id': entry.user_id,
+            'username': entry.username,
+            'display_name': entry.display_name,
+            'email': entry.user.email,  # Use the Django User's email directly
+            'has_email': bool(entry.user.email)
+        })
+    
+    return JsonResponse({'users': user_data, 'next_cursor': next_cursor})
+
+
+@login_required
+def user_typeahead_api(request):
+    """
+    API endpoint suggesting recipients as the user types in the email
+    composer, from the in-memory typeahead index.
+    """
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'users': []})
+    
+    user_data = []
+    for user_id, username, display_name, email in suggest_users(request.user, query):
         user_data.append({
-            'id': user.id,
-            'username': user.username,
+            'id': user_id,
+            'username': username,
             'display_name': display_name,
-            'email': user.email,  # Use the Django User's email directly
-            'has_email': bool(user.email)
+            'email': email,
+            'has_email': bool(email)
         })
     
     return JsonResponse({'users': user_data})